@@ -1,21 +1,57 @@
 from django.contrib import admin
-from .models import Area, Estado, Equipo, Sede, PerfilUsuario
+from .models import Area, Estado, Equipo, Sede, PerfilUsuario, condiciones_garantia, condiciones_mantenimiento
+
+
+class SituacionFilter(admin.SimpleListFilter):
+    """Filtra con las mismas condiciones por fecha que la lista de equipos"""
+    condiciones = None
+
+    def queryset(self, request, queryset):
+        condicion = self.condiciones().get(self.value())
+        if condicion is not None:
+            return queryset.filter(condicion)
+        return queryset
+
+
+class GarantiaFilter(SituacionFilter):
+    title = "garantía"
+    parameter_name = 'garantia'
+    condiciones = staticmethod(condiciones_garantia)
+
+    def lookups(self, request, model_admin):
+        return (
+            ('vigente', "Vigente"),
+            ('vencida', "Vencida"),
+            ('sin_garantia', "No definida"),
+        )
+
+
+class MantenimientoFilter(SituacionFilter):
+    title = "mantenimiento"
+    parameter_name = 'mantenimiento'
+    condiciones = staticmethod(condiciones_mantenimiento)
+
+    def lookups(self, request, model_admin):
+        return (
+            ('vencido', "Vencido"),
+            ('proximo', "Próximo"),
+            ('programado', "Programado"),
+            ('sin_fecha', "No definido"),
+        )
+
 
 @admin.register(Sede)
 class SedeAdmin(admin.ModelAdmin):
-    list_display = ('nombre', 'total_equipos', 'direccion')
+    list_display = ('nombre', 'total_equipos', 'valor_total', 'direccion')
     search_fields = ('nombre', 'direccion')
-    
-    def total_equipos(self, obj):
-        return obj.equipos.count()
-    total_equipos.short_description = "Total Equipos"
+    readonly_fields = ('total_equipos', 'valor_total')
 
 @admin.register(Equipo)
 class EquipoAdmin(admin.ModelAdmin):
     list_display = ('nombre', 'tipo', 'numero_serie', 'marca', 'modelo', 'sede', 'area', 'estado', 'garantia_vigente', 'mantenimiento_status', 'fecha_registro')
     search_fields = ('nombre', 'numero_serie', 'marca', 'modelo', 'proveedor', 'tipo')
-    list_filter = ('estado', 'area', 'sede', 'marca', 'fecha_compra', 'tipo')
-    readonly_fields = ('numero_serie', 'fecha_registro', 'garantia_vigente', 'mantenimiento_proximo', 'mantenimiento_vencido')
+    list_filter = ('estado', 'area', 'sede', GarantiaFilter, MantenimientoFilter, 'marca', 'fecha_compra', 'tipo')
+    readonly_fields = ('numero_serie', 'fecha_registro', 'actualizado_en', 'garantia_vigente', 'mantenimiento_proximo', 'mantenimiento_vencido')
     
     fieldsets = (
         ('Información Básica', {
@@ -31,48 +67,46 @@ class EquipoAdmin(admin.ModelAdmin):
             'fields': ('sede', 'area', 'estado')
         }),
         ('Información del Sistema', {
-            'fields': ('fecha_registro', 'garantia_vigente'),
+            'fields': ('fecha_registro', 'actualizado_en', 'garantia_vigente'),
             'classes': ('collapse',)
         }),
     )
     
+    def get_queryset(self, request):
+        # La situación de garantía y mantenimiento se calcula en SQL
+        return super().get_queryset(request).with_status().select_related('sede', 'area', 'estado')
+    
     def garantia_vigente(self, obj):
-        if obj.garantia_vigente:
-            return "✅ Vigente"
-        elif obj.garantia_hasta:
-            return "❌ Vencida"
-        else:
-            return "❓ No definida"
+        situacion = getattr(obj, 'situacion_garantia', None)
+        if situacion is None:
+            situacion = 'vigente' if obj.garantia_vigente else ('vencida' if obj.garantia_hasta else 'sin_garantia')
+        return {
+            'vigente': "✅ Vigente",
+            'vencida': "❌ Vencida",
+        }.get(situacion, "❓ No definida")
     garantia_vigente.short_description = "Garantía"
+    garantia_vigente.admin_order_field = 'garantia_hasta'
     
     def mantenimiento_status(self, obj):
-        if obj.mantenimiento_vencido:
-            return "🔴 Vencido"
-        elif obj.mantenimiento_proximo:
-            return "🟡 Próximo"
-        elif obj.fecha_mantenimiento:
-            return "🟢 Programado"
-        else:
-            return "❓ No definido"
+        return {
+            'vencido': "🔴 Vencido",
+            'proximo': "🟡 Próximo",
+            'programado': "🟢 Programado",
+        }.get(obj.situacion_mantenimiento, "❓ No definido")
     mantenimiento_status.short_description = "Mantenimiento"
+    mantenimiento_status.admin_order_field = 'fecha_mantenimiento'
 
 @admin.register(Area)
 class AreaAdmin(admin.ModelAdmin):
-    list_display = ('nombre', 'total_equipos', 'descripcion')
+    list_display = ('nombre', 'total_equipos', 'valor_total', 'descripcion')
     search_fields = ('nombre',)
-    
-    def total_equipos(self, obj):
-        return obj.equipos.count()
-    total_equipos.short_description = "Total Equipos"
+    readonly_fields = ('total_equipos', 'valor_total')
 
 @admin.register(Estado)
 class EstadoAdmin(admin.ModelAdmin):
-    list_display = ('nombre', 'total_equipos', 'descripcion')
+    list_display = ('nombre', 'total_equipos', 'valor_total', 'descripcion')
     search_fields = ('nombre',)
-    
-    def total_equipos(self, obj):
-        return obj.equipos.count()
-    total_equipos.short_description = "Total Equipos"
+    readonly_fields = ('total_equipos', 'valor_total')
 
 @admin.register(PerfilUsuario)
 class PerfilUsuarioAdmin(admin.ModelAdmin):
@@ -0,0 +1,134 @@
+"""
+API JSON de solo lectura del inventario: /api/equipos/.
+
+Parámetros (todos opcionales):
+
+- fields: columnas separadas por coma (ver campos_disponibles()). Solo se
+  leen de la base las pedidas, más las que hagan falta para ordenar y
+  para los indicadores calculados.
+- orden: id (por defecto), numero_serie o actualizado_en. Todas tienen
+  índice y se desempatan por id.
+- limite: filas por página (hasta LIMITE_MAXIMO).
+- cursor: el de la respuesta anterior para seguir leyendo.
+- Los filtros de la lista (filtros.PARAMETROS_FILTRO).
+
+La paginación es por clave: cada página continúa después de la clave de
+orden de la última fila (nunca con OFFSET) y no se cuenta el total, así
+que leer la página 1 o la 1000 cuesta lo mismo. Las filas salen de la
+proyección API con values_list; sede, área y estado llegan por nombre con
+JOIN.
+"""
+import base64
+import json
+from datetime import datetime
+from functools import lru_cache
+
+from django.db.models import Q
+
+from .filtros import filtrar_equipos
+from .models import Equipo
+from .proyecciones import API, CALCULADOS
+
+LIMITE_POR_DEFECTO = 100
+LIMITE_MAXIMO = 1000
+
+# Claves de orden admitidas: todas indexadas y sin valores nulos
+ORDENES = ('id', 'numero_serie', 'actualizado_en')
+
+
+def campos_disponibles():
+    return API.atributos + API.calculados
+
+
+def leer_campos(valor):
+    """Lista de columnas pedidas en `fields` (todas si viene vacío)"""
+    disponibles = campos_disponibles()
+    campos = [campo.strip() for campo in (valor or '').split(',') if campo.strip()]
+    if not campos:
+        return disponibles
+    desconocidos = [campo for campo in campos if campo not in disponibles]
+    if desconocidos:
+        raise ValueError(
+            f"Campos desconocidos: {', '.join(desconocidos)}. Disponibles: {', '.join(disponibles)}"
+        )
+    return list(dict.fromkeys(campos))
+
+
+@lru_cache(maxsize=64)
+def _proyeccion(necesarios):
+    return API.subconjunto(necesarios, nombre='api_parcial')
+
+
+def proyeccion_para(campos, orden):
+    """Subconjunto de la proyección API con lo pedido y lo que hace falta leer"""
+    necesarios = set(campos) | {'id', orden}
+    necesarios.update(CALCULADOS[campo][0] for campo in campos if campo in CALCULADOS)
+    return _proyeccion(frozenset(necesarios))
+
+
+def codificar_cursor(orden, registro):
+    valor = getattr(registro, orden)
+    contenido = {
+        'o': orden,
+        'k': [valor.isoformat() if hasattr(valor, 'isoformat') else valor, registro.id],
+    }
+    return base64.urlsafe_b64encode(json.dumps(contenido).encode('utf-8')).decode('ascii')
+
+
+def leer_cursor(cursor, orden):
+    """(valor de la clave de orden, id) de la última fila leída"""
+    try:
+        contenido = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        valor, pk = contenido['k']
+        pk = int(pk)
+        if orden == 'actualizado_en':
+            valor = datetime.fromisoformat(valor)
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError('Cursor inválido') from e
+    if contenido.get('o') != orden:
+        raise ValueError('El cursor corresponde a otro orden')
+    return valor, pk
+
+
+def despues_de(consulta, orden, valor, pk):
+    """Filas posteriores a (valor, id) en el orden dado"""
+    if orden == 'id':
+        return consulta.filter(id__gt=pk)
+    return consulta.filter(
+        Q(**{f'{orden}__gte': valor}),
+        Q(**{f'{orden}__gt': valor}) | Q(**{orden: valor, 'id__gt': pk}),
+    )
+
+
+def listar_equipos(params):
+    """Una página de equipos. Lanza ValueError si algún parámetro es inválido."""
+    campos = leer_campos(params.get('fields'))
+
+    orden = params.get('orden') or 'id'
+    if orden not in ORDENES:
+        raise ValueError(f"Orden no admitido: {orden}. Disponibles: {', '.join(ORDENES)}")
+
+    try:
+        limite = int(params.get('limite') or LIMITE_POR_DEFECTO)
+    except ValueError:
+        raise ValueError('El límite debe ser un número entero')
+    limite = min(max(limite, 1), LIMITE_MAXIMO)
+
+    consulta = filtrar_equipos(Equipo.objects.all(), params)
+    consulta = consulta.order_by(orden, 'id') if orden != 'id' else consulta.order_by('id')
+    cursor = params.get('cursor')
+    if cursor:
+        consulta = despues_de(consulta, orden, *leer_cursor(cursor, orden))
+
+    proyeccion = proyeccion_para(campos, orden)
+    convertir = proyeccion.convertidor()
+    registros = [convertir(fila) for fila in proyeccion.consulta(consulta)[:limite + 1]]
+    hay_mas = len(registros) > limite
+    registros = registros[:limite]
+
+    return {
+        'campos': campos,
+        'equipos': [{campo: getattr(registro, campo) for campo in campos} for registro in registros],
+        'cursor': codificar_cursor(orden, registros[-1]) if hay_mas else '',
+        'hay_mas': hay_mas,
+    }
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class InventarioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventario'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        # Registrar las señales de invalidación de caché
+        from . import signals  # noqa: F401
+        from .busqueda import asegurar_indice_texto
+
+        post_migrate.connect(asegurar_indice_texto, sender=self)
@@ -0,0 +1,187 @@
+"""
+Caché en disco de los archivos exportados (Excel, PDF y Parquet).
+
+Cada archivo se identifica por (formato, filtros, sello de versión del
+inventario, fecha): mientras no cambie ningún equipo ni catálogo, repetir
+una descarga sirve el archivo ya generado. La clave va también como ETag,
+así que un navegador que ya lo tiene recibe un 304 sin leer el disco. Los
+trabajos de exportación en segundo plano (inventario.trabajos) resuelven
+por la misma clave.
+
+La fecha entra en la clave porque el contenido depende del día (fecha del
+reporte y garantías vigentes o vencidas).
+
+Los archivos viven en settings.EXPORTACIONES_CACHE_DIR y se descartan los
+más viejos cuando superan EXPORTACIONES_CACHE_MAX_HORAS o cuando el
+directorio pasa de EXPORTACIONES_CACHE_MAX_MB.
+"""
+import hashlib
+import json
+import os
+import time
+import uuid
+from datetime import date
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .filtros import filtrar_equipos
+from .models import Equipo
+from .versiones import obtener_version
+
+# formato -> (extensión, content type, nombre de descarga)
+FORMATOS = {
+    'excel': (
+        'xlsx',
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        'inventario_activos.xlsx',
+    ),
+    'pdf': ('pdf', 'application/pdf', 'inventario_activos.pdf'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet', 'inventario_activos.parquet'),
+}
+
+
+def _escribir(formato, filtros, destino, progreso=None):
+    if formato == 'excel':
+        from .utils import escribir_excel_equipos
+        escribir_excel_equipos(
+            filtrar_equipos(Equipo.objects.order_by('numero_serie'), filtros), destino, progreso=progreso
+        )
+    elif formato == 'pdf':
+        from .pdf import escribir_pdf_equipos
+        escribir_pdf_equipos(
+            filtrar_equipos(Equipo.objects.order_by('numero_serie'), filtros), destino, progreso=progreso
+        )
+    else:
+        from .exportacion import escribir_parquet_equipos
+        escribir_parquet_equipos(filtrar_equipos(Equipo.objects.all(), filtros), destino)
+
+
+def directorio_exportaciones():
+    ruta = getattr(settings, 'EXPORTACIONES_CACHE_DIR', None) or os.path.join(settings.MEDIA_ROOT, 'exportaciones')
+    os.makedirs(ruta, exist_ok=True)
+    return ruta
+
+
+def clave_artefacto(formato, filtros):
+    """Clave del archivo: cambia con el formato, los filtros, el sello y el día"""
+    datos = json.dumps(
+        [formato, sorted(filtros.items()), obtener_version(), date.today().isoformat()],
+        separators=(',', ':')
+    )
+    return hashlib.sha1(datos.encode()).hexdigest()
+
+
+def _ruta(formato, clave):
+    return os.path.join(directorio_exportaciones(), f'{clave}.{FORMATOS[formato][0]}')
+
+
+def obtener_artefacto(formato, filtros, clave=None, progreso=None):
+    """
+    Devuelve la ruta del archivo exportado, generándolo si no está en disco.
+    Se escribe en un temporal y se renombra, así que nunca se sirve a medias.
+    `progreso(filas, total)` se pasa al escritor de Excel y PDF.
+    """
+    clave = clave or clave_artefacto(formato, filtros)
+    ruta = _ruta(formato, clave)
+    if os.path.exists(ruta):
+        return ruta
+
+    temporal = os.path.join(directorio_exportaciones(), f'.{uuid.uuid4().hex}.tmp')
+    try:
+        _escribir(formato, filtros, temporal, progreso)
+        os.replace(temporal, ruta)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+    podar()
+    return ruta
+
+
+def abrir_artefacto(formato, filtros, clave=None, progreso=None):
+    """
+    Como obtener_artefacto, pero devuelve el archivo ya abierto en binario.
+    Si podar() de otro proceso lo borró entre generarlo y abrirlo, se
+    vuelve a generar una vez. Una vez abierto se puede leer hasta el final
+    aunque lo borren.
+    """
+    clave = clave or clave_artefacto(formato, filtros)
+    for intento in range(2):
+        ruta = obtener_artefacto(formato, filtros, clave, progreso)
+        try:
+            return open(ruta, 'rb')
+        except FileNotFoundError:
+            if intento:
+                raise
+
+
+def respuesta_exportacion(request, formato, filtros):
+    """
+    Respuesta de descarga con ETag y Last-Modified. Responde 304 si el
+    navegador ya tiene esta versión; si no, sirve (o genera) el archivo.
+    """
+    clave = clave_artefacto(formato, filtros)
+    etag = quote_etag(clave)
+
+    # Con el ETag vigente no hace falta ni mirar el disco
+    respuesta = get_conditional_response(request, etag=etag)
+    if isinstance(respuesta, HttpResponseNotModified):
+        return respuesta
+
+    archivo = abrir_artefacto(formato, filtros, clave)
+    modificado = int(os.fstat(archivo.fileno()).st_mtime)
+    respuesta = get_conditional_response(request, etag=etag, last_modified=modificado)
+    if respuesta is None:
+        extension, content_type, nombre = FORMATOS[formato]
+        respuesta = FileResponse(archivo, as_attachment=True, filename=nombre, content_type=content_type)
+    else:
+        archivo.close()
+    respuesta['ETag'] = etag
+    respuesta['Last-Modified'] = http_date(modificado)
+    # Los archivos dependen de los permisos del usuario: que el navegador
+    # los guarde, pero que pregunte siempre antes de reutilizarlos
+    respuesta['Cache-Control'] = 'private, no-cache'
+    return respuesta
+
+
+def podar():
+    """
+    Elimina los archivos más viejos que EXPORTACIONES_CACHE_MAX_HORAS y,
+    si el total sigue pasando de EXPORTACIONES_CACHE_MAX_MB, los más
+    antiguos hasta quedar por debajo. Devuelve cuántos eliminó.
+    """
+    max_segundos = getattr(settings, 'EXPORTACIONES_CACHE_MAX_HORAS', 48) * 3600
+    max_bytes = getattr(settings, 'EXPORTACIONES_CACHE_MAX_MB', 500) * 1024 * 1024
+    ahora = time.time()
+
+    archivos = []
+    for entrada in os.scandir(directorio_exportaciones()):
+        try:
+            estado = entrada.stat()
+        except FileNotFoundError:
+            continue
+        archivos.append((estado.st_mtime, estado.st_size, entrada.path, entrada.name.startswith('.')))
+    archivos.sort()
+
+    total = sum(tamano for _, tamano, _, _ in archivos)
+    eliminados = 0
+    for modificado, tamano, ruta, temporal in archivos:
+        vencido = ahora - modificado > max_segundos
+        # Los temporales solo se tocan si quedaron abandonados
+        if not vencido and (temporal or total <= max_bytes):
+            continue
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+        total -= tamano
+        eliminados += 1
+    return eliminados
+
+
+def precalentar(formatos):
+    """Genera, para el inventario completo, los formatos indicados"""
+    for formato in formatos:
+        obtener_artefacto(formato, {})
@@ -0,0 +1,228 @@
+"""
+Búsquedas del inventario que no recorren la tabla de equipos.
+
+Número de serie: cada equipo tiene en TrigramaSerie los trigramas distintos
+de su número de serie. Para buscar "0042" se intersectan las listas de los
+trigramas "004" y "042" (GROUP BY ... HAVING COUNT = 2) y sobre esos
+candidatos se confirma la subcadena, así el resultado es exacto.
+
+Texto libre: nombre, tipo, marca, modelo, proveedor y observación tienen un
+índice de texto completo, FULLTEXT en MySQL y una tabla FTS5 de contenido
+externo en SQLite. Ambos los mantiene la propia base de datos (el índice de
+InnoDB o los triggers de SQLite), así que guardar o importar equipos no hace
+ninguna consulta adicional para sincronizarlo. El índice encuentra palabras
+y prefijos de palabras ("mot" encuentra "Motor"), no subcadenas dentro de
+una palabra ("otor" no lo encuentra).
+"""
+import re
+
+from django.db import connections
+from django.db.models import Count, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Equipo, TrigramaSerie
+
+CAMPOS_TEXTO = ['nombre', 'tipo', 'marca', 'modelo', 'proveedor', 'observacion']
+
+TABLA_FTS = 'inventario_equipo_fts'
+INDICE_FULLTEXT = 'equipo_texto_ft'
+
+# MySQL ignora palabras más cortas que innodb_ft_min_token_size (3 por defecto)
+LONGITUD_MINIMA_MYSQL = 3
+
+
+def trigramas(texto):
+    texto = (texto or '').lower()
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def indexar_series(equipos, tamano_lote=2000):
+    """
+    Crea los trigramas de equipos recién insertados. Acepta instancias de
+    Equipo; si no tienen pk (bulk_create en MySQL) se buscan por número de serie.
+    """
+    sin_pk = [equipo.numero_serie for equipo in equipos if equipo.pk is None]
+    ids = {}
+    if sin_pk:
+        ids = dict(Equipo.objects.filter(numero_serie__in=sin_pk).values_list('numero_serie', 'id'))
+
+    filas = [
+        TrigramaSerie(equipo_id=equipo.pk or ids[equipo.numero_serie], trigrama=trigrama)
+        for equipo in equipos
+        for trigrama in trigramas(equipo.numero_serie)
+    ]
+    TrigramaSerie.objects.bulk_create(filas, batch_size=tamano_lote)
+
+
+def reindexar_serie(equipo):
+    """Reemplaza los trigramas de un equipo tras crear o cambiar su número de serie"""
+    TrigramaSerie.objects.filter(equipo_id=equipo.pk).delete()
+    indexar_series([equipo])
+
+
+def condicion_codigo(codigo):
+    """
+    Condición Q "el número de serie contiene `codigo`" (sin distinguir
+    mayúsculas). Códigos de menos de 3 caracteres no tienen trigramas y
+    usan el LIKE directo.
+    """
+    codigo = (codigo or '').strip()
+    buscados = trigramas(codigo)
+    if not buscados:
+        return Q(numero_serie__icontains=codigo)
+
+    candidatos = (
+        TrigramaSerie.objects.filter(trigrama__in=buscados)
+        .values('equipo_id')
+        .annotate(coincidencias=Count('trigrama'))
+        .filter(coincidencias=len(buscados))
+        .values('equipo_id')
+    )
+    return Q(id__in=candidatos, numero_serie__icontains=codigo)
+
+
+def filtrar_por_codigo(equipos, codigo):
+    """Filtra el queryset a los equipos cuyo número de serie contiene `codigo`"""
+    return equipos.filter(condicion_codigo(codigo))
+
+
+def crear_indice_texto(connection):
+    """
+    Crea el índice de texto completo según el motor. Es idempotente: en
+    SQLite vuelve a crear los triggers que falten (al rehacer la tabla de
+    equipos en una migración se pierden) y reconstruye el índice.
+    """
+    campos = ', '.join(CAMPOS_TEXTO)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                f'ALTER TABLE inventario_equipo ADD FULLTEXT INDEX {INDICE_FULLTEXT} ({campos})'
+            )
+        elif connection.vendor == 'sqlite':
+            nuevos = ', '.join(f'new.{campo}' for campo in CAMPOS_TEXTO)
+            viejos = ', '.join(f'old.{campo}' for campo in CAMPOS_TEXTO)
+            borrar = (
+                f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, {campos}) "
+                f"VALUES ('delete', old.id, {viejos});"
+            )
+            insertar = f'INSERT INTO {TABLA_FTS}(rowid, {campos}) VALUES (new.id, {nuevos});'
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5('
+                f"{campos}, content='inventario_equipo', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2')"
+            )
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ai AFTER INSERT ON inventario_equipo '
+                f'BEGIN {insertar} END'
+            )
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ad AFTER DELETE ON inventario_equipo '
+                f'BEGIN {borrar} END'
+            )
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_au AFTER UPDATE OF {campos}, id '
+                f'ON inventario_equipo BEGIN {borrar} {insertar} END'
+            )
+            cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')")
+
+
+def eliminar_indice_texto(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(f'ALTER TABLE inventario_equipo DROP INDEX {INDICE_FULLTEXT}')
+        elif connection.vendor == 'sqlite':
+            for sufijo in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {TABLA_FTS}_{sufijo}')
+            cursor.execute(f'DROP TABLE IF EXISTS {TABLA_FTS}')
+
+
+def asegurar_indice_texto(sender, using, **kwargs):
+    """
+    Receptor de post_migrate: si una migración rehízo inventario_equipo en
+    SQLite, sus triggers desaparecieron y hay que volver a crearlos.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name IN (%s, %s)",
+            [TABLA_FTS, f'{TABLA_FTS}_ai'],
+        )
+        existentes = {fila[0] for fila in cursor.fetchall()}
+    if TABLA_FTS in existentes and f'{TABLA_FTS}_ai' not in existentes:
+        crear_indice_texto(connection)
+
+
+def _palabras(texto, longitud_minima=1):
+    return [p for p in re.findall(r'\w+', (texto or '').lower()) if len(p) >= longitud_minima]
+
+
+def _consulta_texto(texto, vendor):
+    """
+    Devuelve (sql que selecciona los ids coincidentes, sql de relevancia,
+    parámetros) para el motor, o None si no hay índice o palabras útiles.
+    Cada palabra es obligatoria y se busca como prefijo.
+    """
+    if vendor == 'mysql':
+        palabras = _palabras(texto, LONGITUD_MINIMA_MYSQL)
+        if not palabras:
+            return None
+        consulta = ' '.join(f'+{palabra}*' for palabra in palabras)
+        match = (
+            f"MATCH(inventario_equipo.{', inventario_equipo.'.join(CAMPOS_TEXTO)}) "
+            "AGAINST (%s IN BOOLEAN MODE)"
+        )
+        return (
+            f'SELECT inventario_equipo.id FROM inventario_equipo WHERE {match}',
+            match,
+            [consulta],
+        )
+    if vendor == 'sqlite':
+        palabras = _palabras(texto)
+        if not palabras:
+            return None
+        consulta = ' '.join(f'"{palabra}"*' for palabra in palabras)
+        return (
+            f'SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s',
+            f'(SELECT -bm25({TABLA_FTS}) FROM {TABLA_FTS} '
+            f'WHERE {TABLA_FTS} MATCH %s AND rowid = inventario_equipo.id)',
+            [consulta],
+        )
+    return None
+
+
+def condicion_texto(texto, using='default'):
+    """
+    Condición Q "el texto aparece en los campos descriptivos". Sin índice de
+    texto completo (otros motores) cae en icontains sobre cada campo.
+    """
+    consulta = _consulta_texto(texto, connections[using].vendor)
+    if consulta is None:
+        condicion = Q()
+        for campo in CAMPOS_TEXTO:
+            condicion |= Q(**{f'{campo}__icontains': texto})
+        return condicion
+    sql_ids, _, parametros = consulta
+    return Q(id__in=RawSQL(sql_ids, parametros))
+
+
+def buscar_texto(equipos, texto):
+    """
+    Búsqueda de texto completo ordenada por relevancia. Devuelve el queryset
+    filtrado y anotado con `relevancia` (mayor es mejor).
+    """
+    texto = (texto or '').strip()
+    if not texto:
+        return equipos.none()
+    consulta = _consulta_texto(texto, connections[equipos.db].vendor)
+    if consulta is None:
+        relevancia = Value(0.0, output_field=FloatField())
+    else:
+        _, sql_relevancia, parametros = consulta
+        relevancia = RawSQL(sql_relevancia, parametros, output_field=FloatField())
+    return (
+        equipos.filter(condicion_texto(texto, equipos.db))
+        .annotate(relevancia=relevancia)
+        .order_by('-relevancia', 'id')
+    )
@@ -0,0 +1,242 @@
+"""
+Backend de caché compartido por todos los procesos de un mismo servidor.
+
+Los workers de gunicorn no comparten memoria, así que con LocMemCache cada
+uno tendría su propia copia del dashboard, de los catálogos y de los sellos
+de versión (y un cambio hecho en un worker no invalidaría a los demás). Este
+backend guarda las entradas en un archivo SQLite en modo WAL: las lecturas
+no bloquean a las escrituras, no necesita ningún servicio externo y todos
+los procesos que abren el mismo archivo ven los mismos datos.
+
+- TTL: cada entrada guarda su instante de expiración.
+- LRU: cada entrada guarda su último acceso (con resolución de unos
+  segundos, para que una lectura no sea siempre una escritura) y al superar
+  MAX_ENTRIES se descartan las menos usadas. Se comprueba una de cada
+  PODAR_CADA escrituras, contadas entre todos los procesos en una fila
+  aparte (contar la tabla en cada set serializaría a todos los escritores
+  detrás de un COUNT), así que entre dos podas puede haber unas pocas
+  entradas de más.
+- incr/add/touch son atómicos entre procesos: se resuelven en una sola
+  sentencia o dentro de BEGIN IMMEDIATE.
+
+Configuración (settings.CACHES):
+
+    'default': {
+        'BACKEND': 'inventario.cache.CacheCompartida',
+        'LOCATION': '/tmp/inventario_cache.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 5000, 'CULL_FREQUENCY': 4},
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Segundos mínimos entre dos actualizaciones del último acceso de una entrada
+RESOLUCION_LRU = 5
+
+# Escrituras (set/add) entre dos podas, como máximo; con MAX_ENTRIES chico
+# se poda más seguido para no excederlo por mucho
+PODAR_CADA = 100
+
+# Segundos que una operación espera si otro proceso tiene el archivo bloqueado
+ESPERA_BLOQUEO = 10
+
+# Rango de los enteros que SQLite guarda tal cual (el resto se serializa)
+ENTERO_MINIMO = -(2 ** 63)
+ENTERO_MAXIMO = 2 ** 63 - 1
+
+ESQUEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS entradas (
+        clave TEXT PRIMARY KEY,
+        valor BLOB,
+        expira REAL,
+        acceso REAL NOT NULL
+    ) WITHOUT ROWID
+    """,
+    'CREATE INDEX IF NOT EXISTS entradas_acceso ON entradas (acceso)',
+    'CREATE INDEX IF NOT EXISTS entradas_expira ON entradas (expira)',
+    'CREATE TABLE IF NOT EXISTS escrituras (id INTEGER PRIMARY KEY CHECK (id = 1), total INTEGER NOT NULL)',
+    'INSERT OR IGNORE INTO escrituras (id, total) VALUES (1, 0)',
+]
+
+
+class CacheCompartida(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._ruta = str(location)
+        self._local = threading.local()
+        self._podar_cada = max(1, min(PODAR_CADA, self._max_entries // 10))
+
+    # Conexión por hilo y por proceso (un worker creado con fork no debe
+    # reutilizar la conexión del proceso padre)
+    def _conexion(self):
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None or self._local.pid != os.getpid():
+            directorio = os.path.dirname(self._ruta)
+            if directorio:
+                os.makedirs(directorio, exist_ok=True)
+            conexion = sqlite3.connect(
+                self._ruta, timeout=ESPERA_BLOQUEO, isolation_level=None, check_same_thread=False
+            )
+            conexion.execute('PRAGMA journal_mode=WAL')
+            conexion.execute('PRAGMA synchronous=NORMAL')
+            for sentencia in ESQUEMA:
+                conexion.execute(sentencia)
+            self._local.conexion = conexion
+            self._local.pid = os.getpid()
+        return conexion
+
+    def _transaccion(self, funcion):
+        """Ejecuta `funcion(conexion)` con el bloqueo de escritura tomado"""
+        conexion = self._conexion()
+        conexion.execute('BEGIN IMMEDIATE')
+        try:
+            resultado = funcion(conexion)
+        except BaseException:
+            conexion.execute('ROLLBACK')
+            raise
+        conexion.execute('COMMIT')
+        return resultado
+
+    @staticmethod
+    def _codificar(valor):
+        # Los enteros se guardan sin serializar para poder incrementarlos en SQL
+        if type(valor) is int and ENTERO_MINIMO <= valor <= ENTERO_MAXIMO:
+            return valor
+        return pickle.dumps(valor, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decodificar(valor):
+        if isinstance(valor, int):
+            return valor
+        return pickle.loads(valor)
+
+    @staticmethod
+    def _contar_escritura(conexion):
+        """Escrituras hechas por todos los procesos, contando esta"""
+        conexion.execute('UPDATE escrituras SET total = total + 1 WHERE id = 1')
+        return conexion.execute('SELECT total FROM escrituras WHERE id = 1').fetchone()[0]
+
+    def _podar(self, conexion, ahora):
+        """Elimina las entradas vencidas y, si aún sobran, las menos usadas"""
+        conexion.execute('DELETE FROM entradas WHERE expira <= ?', (ahora,))
+        total = conexion.execute('SELECT COUNT(*) FROM entradas').fetchone()[0]
+        if total < self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            conexion.execute('DELETE FROM entradas')
+            return
+        # Al menos lo que sobra: entre dos podas se pudo pasar del máximo
+        conexion.execute(
+            'DELETE FROM entradas WHERE clave IN '
+            '(SELECT clave FROM entradas ORDER BY acceso LIMIT ?)',
+            (max(total // self._cull_frequency, total - self._max_entries + 1),)
+        )
+
+    def _guardar(self, clave, valor, timeout, solo_si_no_existe):
+        ahora = time.time()
+        expira = self.get_backend_timeout(timeout)
+        sentencia = (
+            'INSERT INTO entradas (clave, valor, expira, acceso) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (clave) DO UPDATE SET '
+            'valor = excluded.valor, expira = excluded.expira, acceso = excluded.acceso'
+        )
+        parametros = [clave, self._codificar(valor), expira, ahora]
+        if solo_si_no_existe:
+            # add(): solo reemplaza una entrada existente si ya venció
+            sentencia += ' WHERE entradas.expira <= ?'
+            parametros.append(ahora)
+
+        def guardar(conexion):
+            if self._contar_escritura(conexion) % self._podar_cada == 0:
+                self._podar(conexion, ahora)
+            return conexion.execute(sentencia, parametros).rowcount == 1
+
+        return self._transaccion(guardar)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        return self._guardar(clave, value, timeout, solo_si_no_existe=True)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        self._guardar(clave, value, timeout, solo_si_no_existe=False)
+
+    def get(self, key, default=None, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        conexion = self._conexion()
+        ahora = time.time()
+        fila = conexion.execute(
+            'SELECT valor, expira, acceso FROM entradas WHERE clave = ?', (clave,)
+        ).fetchone()
+        if fila is None:
+            return default
+        valor, expira, acceso = fila
+        if expira is not None and expira <= ahora:
+            conexion.execute('DELETE FROM entradas WHERE clave = ? AND expira <= ?', (clave, ahora))
+            return default
+        if ahora - acceso > RESOLUCION_LRU:
+            conexion.execute('UPDATE entradas SET acceso = ? WHERE clave = ?', (ahora, clave))
+        return self._decodificar(valor)
+
+    def get_many(self, keys, version=None):
+        claves = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not claves:
+            return {}
+        marcas = ', '.join('?' * len(claves))
+        filas = self._conexion().execute(
+            f'SELECT clave, valor FROM entradas WHERE clave IN ({marcas}) '
+            'AND (expira IS NULL OR expira > ?)',
+            [*claves, time.time()]
+        ).fetchall()
+        return {claves[clave]: self._decodificar(valor) for clave, valor in filas}
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        ahora = time.time()
+        return self._conexion().execute(
+            'UPDATE entradas SET expira = ?, acceso = ? '
+            'WHERE clave = ? AND (expira IS NULL OR expira > ?)',
+            (self.get_backend_timeout(timeout), ahora, clave, ahora)
+        ).rowcount == 1
+
+    def delete(self, key, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        return self._conexion().execute(
+            'DELETE FROM entradas WHERE clave = ?', (clave,)
+        ).rowcount == 1
+
+    def has_key(self, key, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        return self._conexion().execute(
+            'SELECT 1 FROM entradas WHERE clave = ? AND (expira IS NULL OR expira > ?)',
+            (clave, time.time())
+        ).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None):
+        clave = self.make_and_validate_key(key, version=version)
+        ahora = time.time()
+
+        def incrementar(conexion):
+            fila = conexion.execute(
+                'SELECT valor FROM entradas WHERE clave = ? AND (expira IS NULL OR expira > ?)',
+                (clave, ahora)
+            ).fetchone()
+            if fila is None:
+                raise ValueError("Key '%s' not found" % key)
+            nuevo = self._decodificar(fila[0]) + delta
+            conexion.execute(
+                'UPDATE entradas SET valor = ?, acceso = ? WHERE clave = ?',
+                (self._codificar(nuevo), ahora, clave)
+            )
+            return nuevo
+
+        return self._transaccion(incrementar)
+
+    def clear(self):
+        self._conexion().execute('DELETE FROM entradas')
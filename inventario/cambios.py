@@ -0,0 +1,140 @@
+"""
+Feed de cambios de equipos para que los clientes sincronicen de forma
+incremental.
+
+El cliente guarda el cursor de cada respuesta y pide
+/equipos/cambios/?desde=<cursor>. Recibe los equipos creados o modificados
+(por actualizado_en, id) y las marcas de los eliminados (por eliminado_en,
+id) posteriores al cursor, hasta `limite` de cada tipo; mientras hay_mas
+sea verdadero vuelve a pedir con el cursor nuevo. Sin cursor se empieza
+desde el principio: todos los equipos y las bajas a partir de ese momento.
+
+Cada lote es una consulta acotada sobre los índices (actualizado_en, id) y
+(eliminado_en, id), así que el tráfico depende de cuántos equipos cambiaron
+y no del tamaño del inventario.
+
+- Solo se entregan cambios con más de CAMBIOS_MARGEN_SEGUNDOS de
+  antigüedad. actualizado_en se asigna al escribir, no al confirmar: una
+  transacción lenta puede hacer visible una fila con fecha anterior a otras
+  ya entregadas, y el margen evita que el cursor la deje atrás.
+- Las marcas de eliminación se conservan CAMBIOS_RETENCION_DIAS días. Un
+  cursor más antiguo recibe resincronizar=True y el cliente debe empezar
+  de nuevo sin cursor.
+"""
+import base64
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Equipo, EquipoEliminado
+from .proyecciones import API
+
+LIMITE_POR_DEFECTO = 500
+LIMITE_MAXIMO = 2000
+
+
+def _margen():
+    return timedelta(seconds=getattr(settings, 'CAMBIOS_MARGEN_SEGUNDOS', 5))
+
+
+def _retencion():
+    return timedelta(days=getattr(settings, 'CAMBIOS_RETENCION_DIAS', 90))
+
+
+def codificar_cursor(posiciones):
+    contenido = {clave: [fecha.isoformat(), pk] for clave, (fecha, pk) in posiciones.items()}
+    return base64.urlsafe_b64encode(json.dumps(contenido).encode('utf-8')).decode('ascii')
+
+
+def leer_cursor(cursor):
+    """
+    Posiciones {'e': (fecha, id) de equipos, 'b': (fecha, id) de bajas}.
+    Lanza ValueError si el cursor no es válido.
+    """
+    try:
+        contenido = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return {
+            clave: (datetime.fromisoformat(contenido[clave][0]), int(contenido[clave][1]))
+            for clave in ('e', 'b')
+        }
+    except (ValueError, KeyError, TypeError, IndexError) as e:
+        raise ValueError('Cursor inválido') from e
+
+
+def _despues(consulta, campo, posicion):
+    """(campo, id) > posición; el >= sobre el campo deja al índice acotar el rango"""
+    if posicion is None:
+        return consulta
+    fecha, pk = posicion
+    return consulta.filter(
+        Q(**{f'{campo}__gte': fecha}),
+        Q(**{f'{campo}__gt': fecha}) | Q(**{campo: fecha, 'id__gt': pk}),
+    )
+
+
+def consulta_equipos(posicion, tope):
+    """Equipos modificados después de la posición y hasta el tope, en orden"""
+    consulta = Equipo.objects.filter(actualizado_en__lte=tope).order_by('actualizado_en', 'id')
+    return _despues(consulta, 'actualizado_en', posicion)
+
+
+def consulta_eliminados(posicion, tope):
+    consulta = EquipoEliminado.objects.filter(eliminado_en__lte=tope).order_by('eliminado_en', 'id')
+    return _despues(consulta, 'eliminado_en', posicion)
+
+
+def _siguiente(posicion, ultima, completo, tope):
+    """
+    Posición tras un lote. Si se leyó todo hasta el tope se avanza hasta él,
+    para que el cursor no envejezca mientras no haya cambios.
+    """
+    if not completo:
+        return ultima
+    return max(p for p in (posicion, ultima, (tope, 0)) if p is not None)
+
+
+def leer_cambios(cursor='', limite=LIMITE_POR_DEFECTO):
+    ahora = timezone.now()
+    tope = ahora - _margen()
+    if cursor:
+        posiciones = leer_cursor(cursor)
+        if posiciones['b'][0] < ahora - _retencion():
+            return {'resincronizar': True, 'equipos': [], 'eliminados': [], 'cursor': '', 'hay_mas': False}
+    else:
+        posiciones = {'e': None, 'b': (tope, 0)}
+
+    convertir = API.convertidor()
+    equipos = [convertir(fila) for fila in API.consulta(consulta_equipos(posiciones['e'], tope))[:limite + 1]]
+    mas_equipos = len(equipos) > limite
+    equipos = equipos[:limite]
+    posiciones['e'] = _siguiente(
+        posiciones['e'], (equipos[-1].actualizado_en, equipos[-1].id) if equipos else None, not mas_equipos, tope
+    )
+
+    bajas = list(consulta_eliminados(posiciones['b'], tope).values_list(
+        'id', 'equipo_id', 'numero_serie', 'eliminado_en'
+    )[:limite + 1])
+    mas_bajas = len(bajas) > limite
+    bajas = bajas[:limite]
+    posiciones['b'] = _siguiente(
+        posiciones['b'], (bajas[-1][3], bajas[-1][0]) if bajas else None, not mas_bajas, tope
+    )
+
+    return {
+        'resincronizar': False,
+        'equipos': [equipo._asdict() for equipo in equipos],
+        'eliminados': [
+            {'id': equipo_id, 'numero_serie': numero_serie, 'eliminado_en': eliminado_en}
+            for _, equipo_id, numero_serie, eliminado_en in bajas
+        ],
+        'cursor': codificar_cursor(posiciones),
+        'hay_mas': mas_equipos or mas_bajas,
+    }
+
+
+def purgar_eliminados():
+    """Borra las marcas de eliminación más viejas que la retención"""
+    return EquipoEliminado.objects.filter(eliminado_en__lt=timezone.now() - _retencion()).delete()[0]
@@ -0,0 +1,143 @@
+"""
+Caché en memoria del proceso para los catálogos Sede, Área y Estado.
+
+Los catálogos cambian muy poco y se leen en casi todas las vistas, las
+exportaciones y la importación. Se cargan una vez por proceso y se vuelven a
+cargar solo cuando cambia el sello de versión de catálogos (ver
+inventario.versiones), que se incrementa al guardar o eliminar cualquiera de
+ellos. Leerlos cuesta entonces una consulta al caché, no a la base de datos.
+
+Los objetos cacheados se comparten entre peticiones e hilos: son de solo
+lectura. Los contadores (total_equipos, valor_total) no se cargan; quien los
+necesite actualizados debe consultarlos directamente.
+"""
+import threading
+
+from .models import Area, Estado, Sede
+from .versiones import VERSION_CATALOGOS, obtener_version
+
+# Colores (clases de Bootstrap) e iconos (Font Awesome) por nombre de estado
+COLORES_ESTADO = {
+    'Operativo': 'success',      # Verde
+    'Bueno': 'success',          # Verde
+    'Nuevo': 'info',             # Azul
+    'Regular': 'warning',        # Amarillo
+    'Mantenimiento': 'warning',  # Amarillo
+    'En Reparación': 'warning',  # Amarillo
+    'Malo': 'danger',            # Rojo
+    'Inoperativo': 'danger',     # Rojo
+    'Fuera de Servicio': 'danger', # Rojo
+    'Dado de Baja': 'secondary', # Gris
+    'En Almacén': 'info',        # Azul
+}
+COLOR_POR_DEFECTO = 'primary'
+
+ICONOS_ESTADO = {
+    'Operativo': 'fa-check-circle',
+    'Bueno': 'fa-check-circle',
+    'Nuevo': 'fa-star',
+    'Regular': 'fa-exclamation-triangle',
+    'Mantenimiento': 'fa-tools',
+    'En Reparación': 'fa-wrench',
+    'Malo': 'fa-times-circle',
+    'Inoperativo': 'fa-times-circle',
+    'Fuera de Servicio': 'fa-ban',
+    'Dado de Baja': 'fa-trash',
+    'En Almacén': 'fa-box',
+}
+ICONO_POR_DEFECTO = 'fa-question-circle'
+
+MODELOS_CATALOGO = {'sede': Sede, 'area': Area, 'estado': Estado}
+
+
+def color_estado(nombre):
+    return COLORES_ESTADO.get(nombre, COLOR_POR_DEFECTO)
+
+
+def icono_estado(nombre):
+    return ICONOS_ESTADO.get(nombre, ICONO_POR_DEFECTO)
+
+
+class Catalogo:
+    """Objetos de un catálogo con índices id -> objeto y nombre en minúsculas -> id"""
+
+    def __init__(self, objetos):
+        self.lista = list(objetos)
+        self.por_id = {objeto.pk: objeto for objeto in self.lista}
+        self.por_nombre = {objeto.nombre.lower(): objeto.pk for objeto in self.lista}
+
+    def __iter__(self):
+        return iter(self.lista)
+
+    def __len__(self):
+        return len(self.lista)
+
+    def nombre(self, pk, defecto=''):
+        objeto = self.por_id.get(pk)
+        return objeto.nombre if objeto else defecto
+
+
+_estado = {'version': None, 'catalogos': None}
+_bloqueo = threading.Lock()
+
+
+def _cargar():
+    catalogos = {}
+    for campo, modelo in MODELOS_CATALOGO.items():
+        objetos = list(modelo.objects.defer('total_equipos', 'valor_total').order_by('id'))
+        if modelo is Estado:
+            for estado in objetos:
+                estado.color = color_estado(estado.nombre)
+                estado.icono = icono_estado(estado.nombre)
+        catalogos[campo] = Catalogo(objetos)
+    return catalogos
+
+
+def obtener_catalogos(forzar=False):
+    """
+    Devuelve {'sede': Catalogo, 'area': Catalogo, 'estado': Catalogo},
+    recargándolos si el sello de versión cambió desde la última carga.
+    """
+    version = obtener_version(VERSION_CATALOGOS)
+    if not forzar and _estado['version'] == version:
+        return _estado['catalogos']
+    with _bloqueo:
+        if forzar or _estado['version'] != version:
+            # La versión se lee antes de cargar: si algo cambia mientras
+            # tanto, el sello ya no coincidirá y se volverá a cargar
+            _estado['catalogos'] = _cargar()
+            _estado['version'] = version
+        return _estado['catalogos']
+
+
+def obtener_catalogo(campo):
+    return obtener_catalogos()[campo]
+
+
+def buscar_en_catalogo(campo, pk):
+    """
+    Objeto del catálogo con ese id, o None. Un id desconocido fuerza una
+    recarga por si el catálogo se modificó en otro proceso.
+    """
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    objeto = obtener_catalogo(campo).por_id.get(pk)
+    if objeto is None:
+        objeto = obtener_catalogos(forzar=True)[campo].por_id.get(pk)
+    return objeto
+
+
+def catalogos_para_cliente():
+    """Id y nombre de cada sede, área y estado (con color e icono) para el navegador"""
+    catalogos = obtener_catalogos()
+    datos = {
+        campo: [{'id': objeto.pk, 'nombre': objeto.nombre} for objeto in catalogos[campo]]
+        for campo in ('sede', 'area')
+    }
+    datos['estado'] = [
+        {'id': estado.pk, 'nombre': estado.nombre, 'color': estado.color, 'icono': estado.icono}
+        for estado in catalogos['estado']
+    ]
+    return datos
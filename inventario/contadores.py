@@ -0,0 +1,107 @@
+"""
+Contadores desnormalizados de equipos (cantidad y valor total) por Sede,
+Área y Estado.
+
+Cada ruta que crea, modifica o elimina equipos acumula los cambios como
+deltas y los aplica con UPDATE ... SET campo = campo + delta, de modo que
+los contadores se mantienen exactos sin volver a contar inventario_equipo.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Subquery, Sum, F, Value
+from django.db.models.functions import Coalesce
+
+from .models import Area, Equipo, Estado, Sede
+
+# Campo del equipo -> catálogo con contadores
+CATALOGOS = (
+    ('sede_id', Sede),
+    ('area_id', Area),
+    ('estado_id', Estado),
+)
+
+CERO = Decimal('0.00')
+
+
+def a_decimal(precio):
+    if precio is None or precio == '':
+        return CERO
+    return Decimal(str(precio)).quantize(CERO)
+
+
+def valores_equipo(equipo):
+    """Valores de un equipo que afectan a los contadores"""
+    return {
+        'sede_id': equipo.sede_id,
+        'area_id': equipo.area_id,
+        'estado_id': equipo.estado_id,
+        'precio': a_decimal(equipo.precio),
+    }
+
+
+def nuevos_deltas():
+    return defaultdict(lambda: [0, CERO])
+
+
+def acumular(deltas, valores, signo):
+    """Suma (signo=1) o resta (signo=-1) un equipo de los contadores"""
+    for campo, modelo in CATALOGOS:
+        pk = valores[campo]
+        if pk is not None:
+            delta = deltas[(modelo, pk)]
+            delta[0] += signo
+            delta[1] += signo * valores['precio']
+
+
+def aplicar(deltas):
+    """Aplica los deltas acumulados con un UPDATE por catálogo afectado"""
+    for (modelo, pk), (cantidad, valor) in deltas.items():
+        if cantidad or valor:
+            modelo.objects.filter(pk=pk).update(
+                total_equipos=F('total_equipos') + cantidad,
+                valor_total=F('valor_total') + valor,
+            )
+
+
+def registrar_altas(equipos):
+    deltas = nuevos_deltas()
+    for equipo in equipos:
+        acumular(deltas, valores_equipo(equipo), 1)
+    aplicar(deltas)
+
+
+def registrar_baja(valores):
+    deltas = nuevos_deltas()
+    acumular(deltas, valores, -1)
+    aplicar(deltas)
+
+
+def registrar_cambio(anteriores, actuales):
+    if anteriores == actuales:
+        return
+    deltas = nuevos_deltas()
+    acumular(deltas, anteriores, -1)
+    acumular(deltas, actuales, 1)
+    aplicar(deltas)
+
+
+def recalcular():
+    """
+    Reconstruye todos los contadores a partir de inventario_equipo, con un
+    UPDATE con subconsultas correlacionadas por catálogo.
+    """
+    for campo, modelo in CATALOGOS:
+        relacion = campo[:-3]
+        equipos = Equipo.objects.filter(**{relacion: OuterRef('pk')}).order_by().values(relacion)
+        modelo.objects.update(
+            total_equipos=Coalesce(
+                Subquery(equipos.annotate(c=Count('id')).values('c'), output_field=IntegerField()),
+                Value(0),
+            ),
+            valor_total=Coalesce(
+                Subquery(equipos.annotate(s=Sum('precio')).values('s'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+                Value(CERO),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ),
+        )
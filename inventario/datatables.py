@@ -0,0 +1,155 @@
+"""
+Soporte del protocolo server-side de DataTables para la lista de equipos.
+
+DataTables pide cada página con start/length. Para no pagar un OFFSET que
+crece con la página, cada respuesta incluye un cursor con los valores de
+orden de la última fila; si la siguiente petición continúa justo donde
+terminó la anterior (mismo orden, búsqueda y filtros) se pagina por
+búsqueda de clave (keyset) en lugar de OFFSET.
+"""
+import base64
+import hashlib
+import json
+
+from django.db.models import Q
+
+# Índice de columna de la tabla -> campo de ordenamiento
+COLUMNAS_ORDEN = {
+    0: 'nombre',
+    1: 'tipo',
+    2: 'numero_serie',
+    3: 'marca',
+    4: 'precio',
+    5: 'sede__nombre',
+    6: 'area__nombre',
+    7: 'estado__nombre',
+    8: 'garantia_hasta',
+    9: 'fecha_registro',
+}
+
+# Columnas con filtro propio (columns[i][search][value]) -> parámetro de filtro
+COLUMNAS_FILTRO = {
+    1: 'tipo',
+    5: 'sede',
+    6: 'area',
+    7: 'estado',
+}
+
+# Campos NOT NULL: solo con ellos la comparación por tuplas del keyset es exacta
+CAMPOS_KEYSET = {
+    'nombre', 'tipo', 'numero_serie', 'marca',
+    'area__nombre', 'estado__nombre', 'fecha_registro',
+}
+
+LONGITUD_MAXIMA = 100
+
+
+def _entero(valor, defecto):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return defecto
+
+
+def leer_parametros(params):
+    """
+    Extrae de request.GET los parámetros del protocolo que usamos.
+    """
+    inicio = max(_entero(params.get('start'), 0), 0)
+    longitud = _entero(params.get('length'), 25)
+    if longitud <= 0 or longitud > LONGITUD_MAXIMA:
+        longitud = LONGITUD_MAXIMA
+
+    orden = []
+    i = 0
+    while f'order[{i}][column]' in params:
+        columna = _entero(params.get(f'order[{i}][column]'), -1)
+        campo = COLUMNAS_ORDEN.get(columna)
+        if campo and campo not in [c for c, _ in orden]:
+            orden.append((campo, params.get(f'order[{i}][dir]') != 'desc'))
+        i += 1
+    if not orden:
+        orden = [('fecha_registro', False)]
+
+    filtros = {}
+    for columna, nombre in COLUMNAS_FILTRO.items():
+        valor = (params.get(f'columns[{columna}][search][value]') or '').strip()
+        if valor:
+            filtros[nombre] = valor
+    # Filtros que la lista envía como parámetros propios
+    for nombre in ('codigo', 'mantenimiento', 'garantia'):
+        valor = (params.get(nombre) or '').strip()
+        if valor:
+            filtros[nombre] = valor
+
+    return {
+        'draw': _entero(params.get('draw'), 0),
+        'inicio': inicio,
+        'longitud': longitud,
+        'orden': orden,
+        'busqueda': (params.get('search[value]') or '').strip(),
+        'filtros': filtros,
+        'cursor': params.get('cursor') or '',
+    }
+
+
+def ordenar(equipos, orden):
+    campos = [campo if ascendente else f'-{campo}' for campo, ascendente in orden]
+    return equipos.order_by(*campos, 'id')
+
+
+def admite_keyset(orden):
+    return all(campo in CAMPOS_KEYSET for campo, _ in orden)
+
+
+def _firma(parametros):
+    contenido = json.dumps(
+        [parametros['orden'], parametros['busqueda'], sorted(parametros['filtros'].items())],
+        sort_keys=True,
+    )
+    return hashlib.sha1(contenido.encode('utf-8')).hexdigest()[:16]
+
+
+def generar_cursor(parametros, ultima_fila, siguiente_inicio):
+    """
+    Cursor opaco con la posición y los valores de orden de la última fila.
+    """
+    if ultima_fila is None or not admite_keyset(parametros['orden']):
+        return ''
+    valores = [ultima_fila[campo] for campo, _ in parametros['orden']]
+    valores.append(ultima_fila['id'])
+    contenido = {
+        's': siguiente_inicio,
+        'f': _firma(parametros),
+        'k': [v.isoformat() if hasattr(v, 'isoformat') else v for v in valores],
+    }
+    return base64.urlsafe_b64encode(json.dumps(contenido).encode('utf-8')).decode('ascii')
+
+
+def filtro_keyset(parametros):
+    """
+    Devuelve la condición Q que continúa después del cursor, o None si el
+    cursor no corresponde a esta petición y hay que paginar con OFFSET.
+    """
+    if not parametros['cursor'] or not admite_keyset(parametros['orden']):
+        return None
+    try:
+        contenido = json.loads(base64.urlsafe_b64decode(parametros['cursor'].encode('ascii')))
+        valores = contenido['k']
+    except (ValueError, KeyError, TypeError):
+        return None
+    if contenido.get('s') != parametros['inicio'] or contenido.get('f') != _firma(parametros):
+        return None
+
+    columnas = list(parametros['orden']) + [('id', True)]
+    if len(valores) != len(columnas):
+        return None
+
+    # (a > x) OR (a = x AND b > y) OR ... respetando la dirección de cada columna
+    condicion = Q()
+    for i, (campo, ascendente) in enumerate(columnas):
+        paso = Q(**{f'{campo}__gt' if ascendente else f'{campo}__lt': valores[i]})
+        for (campo_previo, _), valor_previo in zip(columnas[:i], valores[:i]):
+            paso &= Q(**{campo_previo: valor_previo})
+        condicion |= paso
+    return condicion
@@ -0,0 +1,93 @@
+"""
+Exportaciones con las filas crudas del inventario: CSV y NDJSON en flujo, y
+Parquet (columnar y tipado, para análisis con pandas/pyarrow).
+
+Las filas salen de la proyección VOLCADO en lotes paginados por clave
+(id > último id leído). No se usa OFFSET ni un cursor del servidor: el
+cliente de MySQL carga completo el resultado de cada consulta, así que cada
+lote es una consulta acotada. La memoria no depende del tamaño del
+inventario, y la primera línea se envía antes de leer la primera fila.
+"""
+import csv
+import importlib.util
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .proyecciones import VOLCADO
+
+TAMANO_LOTE = 2000
+
+# Filas por row group del Parquet (cada grupo se lee en una consulta)
+TAMANO_GRUPO_PARQUET = 50000
+
+# Columnas exportadas, en orden; sede, área y estado van por nombre
+COLUMNAS = VOLCADO.atributos
+
+
+def lotes_exportacion(equipos, tamano_lote=TAMANO_LOTE):
+    """Lotes de registros VOLCADO (None en sede si no tiene)"""
+    return VOLCADO.lotes(equipos, tamano_lote)
+
+
+class _Eco:
+    """Archivo falso para csv.writer: write() devuelve la línea escrita"""
+    def write(self, valor):
+        return valor
+
+
+def generar_csv(equipos, tamano_lote=TAMANO_LOTE):
+    """Genera el CSV por partes: el encabezado y luego un bloque por lote"""
+    writer = csv.writer(_Eco())
+    yield writer.writerow(COLUMNAS)
+    for filas in lotes_exportacion(equipos, tamano_lote):
+        yield ''.join(writer.writerow(fila) for fila in filas)
+
+
+def generar_ndjson(equipos, tamano_lote=TAMANO_LOTE):
+    """Genera un objeto JSON por línea, un bloque por lote"""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for filas in lotes_exportacion(equipos, tamano_lote):
+        yield ''.join(encoder.encode(dict(zip(COLUMNAS, fila))) + '\n' for fila in filas)
+
+
+def pyarrow_disponible():
+    """pyarrow es una dependencia opcional (requirements-analitica.txt)"""
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def _esquema_parquet(pa):
+    texto = pa.string()
+    fecha = pa.date32()
+    # Los catálogos tienen pocos valores distintos: se codifican como diccionario
+    catalogo = pa.dictionary(pa.int32(), pa.string())
+    tipos = {
+        'id': pa.int64(),
+        'precio': pa.decimal128(10, 2),
+        'fecha_compra': fecha,
+        'garantia_hasta': fecha,
+        'fecha_mantenimiento': fecha,
+        'fecha_registro': fecha,
+        'vida_util': pa.int32(),
+        'sede': catalogo,
+        'area': catalogo,
+        'estado': catalogo,
+    }
+    return pa.schema([(columna, tipos.get(columna, texto)) for columna in COLUMNAS])
+
+
+def escribir_parquet_equipos(equipos, destino, tamano_lote=TAMANO_GRUPO_PARQUET):
+    """
+    Escribe los equipos en `destino` (ruta o archivo binario) como Parquet,
+    un row group por lote. Requiere pyarrow.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    esquema = _esquema_parquet(pa)
+    with pq.ParquetWriter(destino, esquema) as writer:
+        for filas in lotes_exportacion(equipos, tamano_lote):
+            columnas = zip(*filas)
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(valores, type=campo.type) for valores, campo in zip(columnas, esquema)],
+                schema=esquema,
+            ))
@@ -0,0 +1,90 @@
+from datetime import date
+
+from .busqueda import condicion_codigo, condicion_texto, filtrar_por_codigo
+from .catalogos import obtener_catalogos
+from .models import condiciones_garantia, condiciones_mantenimiento
+
+# Parámetros que entiende filtrar_equipos
+PARAMETROS_FILTRO = (
+    'codigo', 'sede', 'area', 'estado', 'tipo', 'mantenimiento', 'garantia', 'busqueda',
+)
+
+
+def aplicar_filtros(equipos, params):
+    """
+    Aplica sobre el queryset los filtros de la lista de equipos.
+
+    `params` es cualquier objeto tipo diccionario (request.GET o un dict) con
+    las claves opcionales: codigo, sede, area, estado, tipo, mantenimiento
+    (vencido, proximo, programado, sin_fecha) y garantia (vigente, vencida,
+    sin_garantia). Sede, área y estado llegan por nombre, igual que en los
+    selectores de la lista, y se traducen a id con el caché de catálogos
+    para filtrar por la clave foránea indexada sin JOIN.
+    """
+    codigo = (params.get('codigo') or '').strip()
+    if codigo:
+        equipos = filtrar_por_codigo(equipos, codigo)
+
+    catalogos = None
+    for campo in ('sede', 'area', 'estado'):
+        nombre = (params.get(campo) or '').strip()
+        if nombre:
+            catalogos = catalogos or obtener_catalogos()
+            pk = catalogos[campo].por_nombre.get(nombre.lower())
+            if pk is None:
+                return equipos.none()
+            equipos = equipos.filter(**{f'{campo}_id': pk})
+
+    tipo = (params.get('tipo') or '').strip()
+    if tipo:
+        equipos = equipos.filter(tipo=tipo)
+
+    hoy = date.today()
+    mantenimiento = (params.get('mantenimiento') or '').strip()
+    condicion = condiciones_mantenimiento(hoy).get(mantenimiento)
+    if condicion is not None:
+        equipos = equipos.filter(condicion)
+
+    garantia = (params.get('garantia') or '').strip()
+    condicion = condiciones_garantia(hoy).get(garantia)
+    if condicion is not None:
+        equipos = equipos.filter(condicion)
+
+    return equipos
+
+
+def aplicar_busqueda_global(equipos, texto):
+    """
+    Búsqueda libre de la lista: texto completo sobre los campos descriptivos
+    y el tipo, más el número de serie (por trigramas). En el texto cada
+    palabra se busca como prefijo ("mot" encuentra "Motor", "otor" no); en
+    el número de serie vale cualquier subcadena. Ninguna de las dos recorre
+    la tabla.
+    """
+    texto = (texto or '').strip()
+    if not texto:
+        return equipos
+
+    return equipos.filter(condicion_texto(texto, equipos.db) | condicion_codigo(texto))
+
+
+def filtrar_equipos(equipos, params):
+    """
+    Filtros de la lista más la búsqueda global (clave `busqueda`), para los
+    endpoints que reciben los filtros como parámetros planos (exportaciones).
+    """
+    equipos = aplicar_filtros(equipos, params)
+    return aplicar_busqueda_global(equipos, params.get('busqueda'))
+
+
+def parametros_filtro(params):
+    """
+    Los filtros presentes en `params` como dict sin valores vacíos, para
+    usarlos como clave (caché de exportaciones) o guardarlos (trabajos).
+    """
+    filtros = {}
+    for nombre in PARAMETROS_FILTRO:
+        valor = (params.get(nombre) or '').strip()
+        if valor:
+            filtros[nombre] = valor
+    return filtros
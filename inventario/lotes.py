@@ -0,0 +1,331 @@
+"""
+Operaciones en lote sobre equipos: crear, editar y eliminar muchos equipos
+en una sola petición.
+
+El cuerpo es un objeto JSON con hasta tres listas:
+
+    {"crear": [{...}, ...], "editar": [{"id": 7, ...}, ...], "eliminar": [3, 4]}
+
+Cada equipo lleva los mismos campos que en crear_equipo y editar_equipo
+(sede, área y estado por id), y cada operación exige el mismo permiso que
+su vista de un equipo.
+
+Primero se validan juntas todas las operaciones: catálogos contra el caché,
+ids inexistentes o repetidos y números de serie ya usados, en la base o
+dentro del mismo lote. Si alguna falla no se aplica ninguna y se devuelve el
+error de cada una. Si todas son válidas se aplican en una transacción con un
+delete() del queryset, un bulk_update y un bulk_create. Los contadores, los
+trigramas del número de serie y el sello de versión se actualizan una vez
+por lote; las bajas pasan por las señales post_delete, agrupadas con
+signals.eliminacion_en_lote.
+"""
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .busqueda import indexar_series
+from .catalogos import buscar_en_catalogo
+from .contadores import a_decimal, acumular, aplicar, nuevos_deltas, valores_equipo
+from .models import Equipo, SecuenciaSerie, TrigramaSerie
+from .signals import eliminacion_en_lote
+from .utils import asignar_numeros_serie
+from .versiones import incrementar_version
+
+# Operaciones del lote; cada una exige el permiso del mismo nombre
+OPERACIONES = ('crear', 'editar', 'eliminar')
+
+# Máximo de operaciones (sumando las tres listas) por petición
+MAXIMO_OPERACIONES = 1000
+
+TAMANO_LOTE = 500
+
+CAMPOS_REQUERIDOS = ['nombre', 'tipo', 'sede', 'area', 'estado']
+
+# Campos propios del equipo (sin sede, área ni estado), en el orden del formulario
+CAMPOS_EQUIPO = [
+    'nombre', 'tipo', 'numero_serie', 'marca', 'modelo', 'precio', 'proveedor',
+    'fecha_compra', 'garantia_hasta', 'fecha_mantenimiento', 'vida_util', 'observacion',
+]
+
+CAMPOS_FECHA = ['fecha_compra', 'garantia_hasta', 'fecha_mantenimiento']
+
+# Campos que reescribe una edición (igual que editar_equipo)
+CAMPOS_EDITABLES = CAMPOS_EQUIPO + ['sede', 'area', 'estado']
+
+MENSAJES_CATALOGO = {
+    'sede': 'La sede seleccionada no existe',
+    'area': 'El área seleccionada no existe',
+    'estado': 'El estado seleccionado no existe',
+}
+
+
+def leer_lote(datos):
+    """
+    Normaliza el cuerpo de la petición a {operación: lista}. Lanza
+    ValueError si no tiene la forma esperada.
+    """
+    if not isinstance(datos, dict):
+        raise ValueError('El lote debe ser un objeto con las listas crear, editar y eliminar')
+    operaciones = {}
+    for operacion in OPERACIONES:
+        lista = datos.get(operacion) or []
+        if not isinstance(lista, list):
+            raise ValueError(f'"{operacion}" debe ser una lista')
+        operaciones[operacion] = lista
+    total = sum(len(lista) for lista in operaciones.values())
+    if not total:
+        raise ValueError('El lote no contiene operaciones')
+    if total > MAXIMO_OPERACIONES:
+        raise ValueError(f'El lote supera el máximo de {MAXIMO_OPERACIONES} operaciones')
+    return operaciones
+
+
+def _id(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _numero(valor, tipo):
+    # Igual que las vistas de un equipo: vacío o inválido se guarda como None
+    if valor == '' or valor is None:
+        return None
+    try:
+        return tipo(valor)
+    except (ValueError, TypeError):
+        return None
+
+
+def _fecha(valor, campo):
+    if valor == '' or valor is None:
+        return None
+    try:
+        fecha = parse_date(str(valor))
+    except ValueError:
+        fecha = None
+    if fecha is None:
+        raise ValueError(f'Fecha inválida en {campo}: {valor}')
+    return fecha
+
+
+def _leer_campo(campo, valor):
+    if campo in CAMPOS_FECHA:
+        return _fecha(valor, campo)
+    if campo == 'precio':
+        precio = _numero(valor, float)
+        return None if precio is None else a_decimal(precio)
+    if campo == 'vida_util':
+        return _numero(valor, int)
+    return '' if valor is None else valor
+
+
+def leer_equipo(datos, parcial=False):
+    """
+    Valida los campos de un equipo. Devuelve (campos del modelo, nombres de
+    sede/área/estado) o lanza ValueError con el mensaje para el cliente.
+
+    Con parcial=True solo se leen los campos presentes en `datos` (los
+    requeridos, si vienen, no pueden estar vacíos); si no, los opcionales
+    que falten quedan vacíos, igual que en editar_equipo.
+    """
+    if not isinstance(datos, dict):
+        raise ValueError('Cada equipo debe ser un objeto JSON')
+    for campo in CAMPOS_REQUERIDOS:
+        if (campo in datos or not parcial) and not datos.get(campo):
+            raise ValueError(f'El campo {campo} es requerido')
+
+    campos = {
+        campo: _leer_campo(campo, datos.get(campo))
+        for campo in CAMPOS_EQUIPO
+        if campo in datos or not parcial
+    }
+    nombres = {}
+    for campo, mensaje in MENSAJES_CATALOGO.items():
+        if parcial and campo not in datos:
+            continue
+        objeto = buscar_en_catalogo(campo, datos[campo])
+        if objeto is None:
+            raise ValueError(mensaje)
+        campos[f'{campo}_id'] = objeto.id
+        nombres[campo] = objeto.nombre
+    return campos, nombres
+
+
+def _valores(fila):
+    """Valores para los contadores a partir de una fila de values()"""
+    return {
+        'sede_id': fila['sede_id'],
+        'area_id': fila['area_id'],
+        'estado_id': fila['estado_id'],
+        'precio': a_decimal(fila['precio']),
+    }
+
+
+def _resumen(equipo, nombres):
+    return {
+        'id': equipo.id,
+        'nombre': equipo.nombre,
+        'numero_serie': equipo.numero_serie,
+        'tipo': equipo.tipo,
+        'sede': nombres['sede'],
+        'area': nombres['area'],
+        'estado': nombres['estado'],
+    }
+
+
+def aplicar_lote(operaciones):
+    """
+    Valida y aplica las operaciones de leer_lote. Devuelve (resultados,
+    errores); si hay errores no se aplicó ningún cambio. Cada resultado o
+    error indica la operación y la posición del elemento en su lista.
+    """
+    errores = []
+
+    def error(operacion, indice, mensaje):
+        errores.append({'operacion': operacion, 'indice': indice, 'error': mensaje})
+
+    ids_eliminar = [_id(valor) for valor in operaciones['eliminar']]
+    ids_editar = [_id(datos.get('id')) if isinstance(datos, dict) else None for datos in operaciones['editar']]
+    # Una sola lectura de los equipos afectados: existencia, nombre y los
+    # valores anteriores para los contadores
+    existentes = {
+        fila['id']: fila
+        for fila in Equipo.objects.filter(
+            id__in={pk for pk in ids_eliminar + ids_editar if pk is not None}
+        ).values('id', 'nombre', 'numero_serie', 'sede_id', 'area_id', 'estado_id', 'precio')
+    }
+
+    vistos = set()
+    bajas = []
+    for indice, pk in enumerate(ids_eliminar):
+        if pk is None:
+            error('eliminar', indice, 'Id de equipo inválido')
+        elif pk not in existentes:
+            error('eliminar', indice, 'El equipo no existe')
+        elif pk in vistos:
+            error('eliminar', indice, 'El equipo aparece más de una vez en el lote')
+        else:
+            vistos.add(pk)
+            bajas.append((indice, pk))
+
+    ediciones = []
+    for indice, (datos, pk) in enumerate(zip(operaciones['editar'], ids_editar)):
+        if pk is None:
+            error('editar', indice, 'Falta el id del equipo')
+            continue
+        if pk not in existentes:
+            error('editar', indice, 'El equipo no existe')
+            continue
+        if pk in vistos:
+            error('editar', indice, 'El equipo aparece más de una vez en el lote')
+            continue
+        vistos.add(pk)
+        try:
+            campos, nombres = leer_equipo(datos)
+        except ValueError as e:
+            error('editar', indice, str(e))
+            continue
+        # Como en editar_equipo: sin número de serie se conserva el actual
+        campos['numero_serie'] = campos['numero_serie'] or existentes[pk]['numero_serie']
+        ediciones.append((indice, pk, campos, nombres))
+
+    altas = []
+    for indice, datos in enumerate(operaciones['crear']):
+        try:
+            campos, nombres = leer_equipo(datos)
+        except ValueError as e:
+            error('crear', indice, str(e))
+            continue
+        altas.append((indice, campos, nombres))
+
+    # Números de serie nuevos: no pueden repetirse en el lote ni pertenecer a
+    # otro equipo (salvo a uno que se elimina en este mismo lote)
+    series = [('crear', indice, campos['numero_serie']) for indice, campos, _ in altas if campos['numero_serie']]
+    series += [
+        ('editar', indice, campos['numero_serie']) for indice, pk, campos, _ in ediciones
+        if campos['numero_serie'] != existentes[pk]['numero_serie']
+    ]
+    eliminados = {pk for _, pk in bajas}
+    en_uso = {
+        serie: pk for serie, pk in Equipo.objects.filter(
+            numero_serie__in=[serie for _, _, serie in series]
+        ).values_list('numero_serie', 'id')
+        if pk not in eliminados
+    }
+    repetidas = set()
+    vistas = set()
+    for _, _, serie in series:
+        (repetidas if serie in vistas else vistas).add(serie)
+    for operacion, indice, serie in series:
+        if serie in en_uso:
+            error(operacion, indice, 'El número de serie ya existe')
+        elif serie in repetidas:
+            error(operacion, indice, 'El número de serie está repetido en el lote')
+
+    if errores:
+        errores.sort(key=lambda e: (OPERACIONES.index(e['operacion']), e['indice']))
+        return [], errores
+
+    resultados = []
+    deltas = nuevos_deltas()
+    with transaction.atomic():
+        # Bajas: un delete() del queryset. Las señales post_delete (contadores,
+        # marcas del feed de cambios) se agrupan en eliminacion_en_lote y los
+        # trigramas se borran en cascada
+        if bajas:
+            for indice, pk in bajas:
+                fila = existentes[pk]
+                resultados.append({
+                    'operacion': 'eliminar', 'indice': indice,
+                    'equipo': {'id': pk, 'nombre': fila['nombre'], 'numero_serie': fila['numero_serie']},
+                })
+            with eliminacion_en_lote():
+                Equipo.objects.filter(id__in=eliminados).delete()
+
+        # Ediciones: un bulk_update con todos los campos editables (bulk_update
+        # no aplica auto_now: actualizado_en se asigna aquí)
+        if ediciones:
+            equipos = []
+            renombrados = []
+            ahora = timezone.now()
+            for indice, pk, campos, nombres in ediciones:
+                equipo = Equipo(id=pk, actualizado_en=ahora, **campos)
+                acumular(deltas, _valores(existentes[pk]), -1)
+                acumular(deltas, valores_equipo(equipo), 1)
+                if equipo.numero_serie != existentes[pk]['numero_serie']:
+                    renombrados.append(equipo)
+                equipos.append(equipo)
+                resultados.append({'operacion': 'editar', 'indice': indice, 'equipo': _resumen(equipo, nombres)})
+            Equipo.objects.bulk_update(equipos, CAMPOS_EDITABLES + ['actualizado_en'], batch_size=TAMANO_LOTE)
+            if renombrados:
+                SecuenciaSerie.sincronizar_varios(equipo.numero_serie for equipo in renombrados)
+                TrigramaSerie.objects.filter(equipo_id__in=[equipo.pk for equipo in renombrados]).delete()
+                indexar_series(renombrados)
+
+        # Altas: números de serie reservados por prefijo y un bulk_create
+        if altas:
+            asignar_numeros_serie([(indice, campos) for indice, campos, _ in altas])
+            equipos = Equipo.objects.bulk_create(
+                [Equipo(**campos) for _, campos, _ in altas], batch_size=TAMANO_LOTE
+            )
+            # MySQL no devuelve los ids de bulk_create: se buscan por número de serie
+            sin_pk = [equipo.numero_serie for equipo in equipos if equipo.pk is None]
+            if sin_pk:
+                pks = dict(Equipo.objects.filter(numero_serie__in=sin_pk).values_list('numero_serie', 'id'))
+                for equipo in equipos:
+                    if equipo.pk is None:
+                        equipo.pk = pks[equipo.numero_serie]
+            for equipo in equipos:
+                acumular(deltas, valores_equipo(equipo), 1)
+            indexar_series(equipos)
+            for (indice, _, nombres), equipo in zip(altas, equipos):
+                resultados.append({'operacion': 'crear', 'indice': indice, 'equipo': _resumen(equipo, nombres)})
+
+        aplicar(deltas)
+        # Sin señales: el sello cambia aquí, en el acto y al confirmar
+        incrementar_version()
+        transaction.on_commit(incrementar_version)
+
+    resultados.sort(key=lambda r: (OPERACIONES.index(r['operacion']), r['indice']))
+    return resultados, []
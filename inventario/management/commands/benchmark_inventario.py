@@ -0,0 +1,219 @@
+import resource
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from inventario.models import Area, Equipo, Estado, Sede
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide tiempo y memoria de las operaciones pesadas del inventario sobre '
+        'datos sintéticos. Los datos se crean dentro de una transacción que se '
+        'revierte al terminar, por lo que la base de datos queda intacta.'
+    )
+
+    # Escenario -> (método, tamaños por defecto)
+    ESCENARIOS = {
+        'excel': ('benchmark_excel', [10000, 100000, 500000]),
+        'codigo': ('benchmark_codigo', [100000, 1000000]),
+        'pdf': ('benchmark_pdf', [5000, 50000]),
+        'proyeccion': ('benchmark_proyeccion', [10000, 100000]),
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('escenario', choices=sorted(self.ESCENARIOS))
+        parser.add_argument(
+            '--filas', nargs='+', type=int,
+            help='Tamaños de inventario a medir (por defecto depende del escenario)'
+        )
+        parser.add_argument(
+            '--procesos', type=int,
+            help='Procesos del PDF en paralelo (por defecto settings.PDF_PROCESOS)'
+        )
+        parser.add_argument(
+            '--lote', type=int, default=5000,
+            help='Tamaño de lote para crear los datos sintéticos'
+        )
+
+    def handle(self, *args, **options):
+        nombre_metodo, tamanos = self.ESCENARIOS[options['escenario']]
+        filas = sorted(options['filas'] or tamanos)
+        if filas[0] <= 0:
+            raise CommandError('Los tamaños de --filas deben ser positivos')
+
+        metodo = getattr(self, nombre_metodo)
+        with transaction.atomic():
+            try:
+                metodo(filas, options)
+            finally:
+                transaction.set_rollback(True)
+
+    # Utilidades
+
+    def crear_catalogos(self):
+        sedes = [Sede.objects.create(nombre=f'Benchmark Sede {i}') for i in range(5)]
+        areas = [Area.objects.create(nombre=f'Benchmark Área {i}') for i in range(10)]
+        estados = [Estado.objects.create(nombre=f'Benchmark Estado {i}') for i in range(4)]
+        return sedes, areas, estados
+
+    def poblar(self, desde, hasta, catalogos, lote, al_crear=None):
+        """
+        Crea los equipos [desde, hasta) con bulk_create, un lote a la vez.
+        `al_crear` recibe cada lote creado (p. ej. para indexarlo).
+        """
+        sedes, areas, estados = catalogos
+        tipos = [
+            ('Compresora', 'COM'), ('Motor', 'MOT'), ('Bomba', 'BOM'),
+            ('Generador', 'GEN'), ('Aire Acondicionado', 'AAX'),
+        ]
+        for inicio in range(desde, hasta, lote):
+            creados = Equipo.objects.bulk_create([
+                Equipo(
+                    nombre=f'Equipo benchmark {i}',
+                    tipo=tipos[i % len(tipos)][0],
+                    numero_serie=f'{tipos[i % len(tipos)][1]}-{i:07d}',
+                    marca='Marca %d' % (i % 37),
+                    modelo='Modelo %d' % (i % 101),
+                    precio=(i % 5000) + 0.5,
+                    proveedor='Proveedor %d' % (i % 13),
+                    observacion='Observación de prueba %d' % i,
+                    sede=sedes[i % len(sedes)],
+                    area=areas[i % len(areas)],
+                    estado=estados[i % len(estados)],
+                )
+                for i in range(inicio, min(inicio + lote, hasta))
+            ])
+            if al_crear:
+                al_crear(creados)
+
+    def medir(self, funcion):
+        """
+        Ejecuta `funcion` y devuelve (segundos, RSS pico del proceso en MB).
+        El RSS pico es acumulado: si no crece entre tamaños, la memoria es plana.
+        """
+        inicio = time.perf_counter()
+        funcion()
+        segundos = time.perf_counter() - inicio
+        rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return segundos, rss_mb
+
+    def reportar(self, etiqueta, filas, segundos, rss_mb):
+        self.stdout.write(
+            f'{etiqueta:<12} {filas:>9} filas  {segundos:>8.2f} s  RSS pico {rss_mb:>8.1f} MB'
+        )
+
+    def recorrer_tamanos(self, filas, options, etiqueta, funcion, al_crear=None):
+        catalogos = self.crear_catalogos()
+        creadas = 0
+        for objetivo in filas:
+            self.poblar(creadas, objetivo, catalogos, options['lote'], al_crear)
+            creadas = objetivo
+            segundos, rss_mb = self.medir(funcion)
+            self.reportar(etiqueta, objetivo, segundos, rss_mb)
+
+    # Escenarios
+
+    def benchmark_excel(self, filas, options):
+        from inventario.utils import escribir_excel_equipos
+
+        def exportar():
+            with tempfile.TemporaryFile() as archivo:
+                escribir_excel_equipos(Equipo.objects.order_by('numero_serie'), archivo)
+
+        self.recorrer_tamanos(filas, options, 'excel', exportar)
+
+    def benchmark_codigo(self, filas, options):
+        from inventario.busqueda import filtrar_por_codigo, indexar_series
+
+        codigos = ['0042', 'MOT-', 'BOM-00012', '99999']
+        repeticiones = 5
+
+        def buscar(filtrar):
+            def ejecutar():
+                for _ in range(repeticiones):
+                    for codigo in codigos:
+                        list(filtrar(codigo).values_list('id', flat=True)[:100])
+            return ejecutar
+
+        def icontains(codigo):
+            return Equipo.objects.filter(numero_serie__icontains=codigo)
+
+        def trigramas(codigo):
+            return filtrar_por_codigo(Equipo.objects.all(), codigo)
+
+        catalogos = self.crear_catalogos()
+        creadas = 0
+        for objetivo in filas:
+            self.poblar(creadas, objetivo, catalogos, options['lote'], indexar_series)
+            creadas = objetivo
+            for etiqueta, filtrar in (('icontains', icontains), ('trigramas', trigramas)):
+                segundos, rss_mb = self.medir(buscar(filtrar))
+                self.reportar(etiqueta, objetivo, segundos / (repeticiones * len(codigos)), rss_mb)
+        self.stdout.write('(tiempos por búsqueda, promedio de %d códigos x %d repeticiones)' % (len(codigos), repeticiones))
+
+    def benchmark_pdf(self, filas, options):
+        from django.conf import settings
+        from inventario.pdf import escribir_pdf_equipos
+
+        procesos = options['procesos'] or settings.PDF_PROCESOS
+        variantes = [('secuencial', 1)]
+        if procesos > 1:
+            variantes.append((f'{procesos} procesos', procesos))
+
+        def exportar(cantidad):
+            def ejecutar():
+                with tempfile.TemporaryFile() as archivo:
+                    escribir_pdf_equipos(Equipo.objects.order_by('numero_serie'), archivo, procesos=cantidad)
+            return ejecutar
+
+        # Los procesos del pool reciben las filas ya leídas, así que ven los
+        # datos sintéticos aunque la transacción no se confirme
+        catalogos = self.crear_catalogos()
+        creadas = 0
+        for objetivo in filas:
+            self.poblar(creadas, objetivo, catalogos, options['lote'])
+            creadas = objetivo
+            for etiqueta, cantidad in variantes:
+                segundos, rss_mb = self.medir(exportar(cantidad))
+                self.reportar(etiqueta, objetivo, segundos, rss_mb)
+
+    def benchmark_proyeccion(self, filas, options):
+        from inventario.proyecciones import API, PDF
+
+        def instancias():
+            # Ruta anterior: instancias de Equipo con sus tres relaciones
+            equipos = Equipo.objects.select_related('sede', 'area', 'estado').order_by('id')
+            return [
+                (e, e.garantia_vigente, e.mantenimiento_proximo, e.mantenimiento_vencido, e.area.nombre)
+                for e in equipos
+            ]
+
+        def proyeccion(proyeccion_):
+            def leer():
+                return list(proyeccion_.registros(Equipo.objects.order_by('id')))
+            return leer
+
+        variantes = [('instancias', instancias), ('proy. api', proyeccion(API)), ('proy. pdf', proyeccion(PDF))]
+        catalogos = self.crear_catalogos()
+        creadas = 0
+        for objetivo in filas:
+            self.poblar(creadas, objetivo, catalogos, options['lote'])
+            creadas = objetivo
+            for etiqueta, leer in variantes:
+                inicio = time.perf_counter()
+                leer()
+                segundos = time.perf_counter() - inicio
+                # Memoria medida aparte: tracemalloc hace más lenta la lectura
+                tracemalloc.start()
+                resultado = leer()
+                pico_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+                tracemalloc.stop()
+                del resultado
+                self.stdout.write(
+                    f'{etiqueta:<12} {objetivo:>9} filas  {segundos:>8.2f} s  pico {pico_mb:>8.1f} MB'
+                )
+        self.stdout.write('(lectura completa de todas las filas en memoria, como una página o un lote grande)')
@@ -0,0 +1,117 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.cache import CacheCompartida
+
+
+def _abrir(ruta, max_entradas):
+    return CacheCompartida(ruta, {'TIMEOUT': None, 'OPTIONS': {'MAX_ENTRIES': max_entradas}})
+
+
+def _rendimiento(ruta, max_entradas, numero, operaciones, barrera, resultados):
+    """Proceso del benchmark: segundos para `operaciones` get, set e incr"""
+    import django
+    django.setup()
+
+    cache = _abrir(ruta, max_entradas)
+    resultados.put((numero, _medir(cache, numero, operaciones, barrera)))
+
+
+def _medir(cache, numero, operaciones, barrera=None):
+    cache.set(f'lectura:{numero}', {'valor': list(range(20))})
+    cache.add('contador', 0)
+    if barrera is not None:
+        barrera.wait()
+    tiempos = {}
+
+    inicio = time.perf_counter()
+    for _ in range(operaciones):
+        cache.get(f'lectura:{numero}')
+    tiempos['get'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for i in range(operaciones):
+        cache.set(f'escritura:{numero}:{i % 100}', {'i': i})
+    tiempos['set'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for _ in range(operaciones):
+        cache.incr('contador')
+    tiempos['incr'] = time.perf_counter() - inicio
+    return tiempos
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el rendimiento de la caché compartida (inventario.cache.CacheCompartida) '
+        'con uno y varios procesos sobre un archivo temporal, frente a LocMemCache. '
+        'La consistencia entre procesos (incr, TTL, LRU) la cubren las pruebas de '
+        'inventario.tests.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=4)
+        parser.add_argument('--operaciones', type=int, default=2000,
+                            help='Operaciones de cada tipo por proceso')
+
+    def handle(self, *args, **options):
+        procesos = options['procesos']
+        operaciones = options['operaciones']
+        if procesos <= 0 or operaciones <= 0:
+            raise CommandError('--procesos y --operaciones deben ser positivos')
+
+        # spawn: cada proceso abre su propia conexión, como un worker nuevo
+        self.contexto = multiprocessing.get_context('spawn')
+        self.directorio = tempfile.mkdtemp(prefix='probar_cache_')
+        try:
+            self.benchmark(procesos, operaciones)
+        finally:
+            shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def ruta(self, nombre):
+        return os.path.join(self.directorio, f'{nombre}.sqlite3')
+
+    def ejecutar(self, objetivo, ruta, max_entradas, procesos, operaciones):
+        barrera = self.contexto.Barrier(procesos)
+        resultados = self.contexto.Queue()
+        hijos = [
+            self.contexto.Process(
+                target=objetivo,
+                args=(ruta, max_entradas, numero, operaciones, barrera, resultados)
+            )
+            for numero in range(procesos)
+        ]
+        for hijo in hijos:
+            hijo.start()
+        salida = dict(resultados.get() for _ in hijos)
+        for hijo in hijos:
+            hijo.join()
+            if hijo.exitcode != 0:
+                raise CommandError(f'Un proceso terminó con código {hijo.exitcode}')
+        return salida
+
+    def benchmark(self, procesos, operaciones):
+        self.stdout.write('')
+        self.stdout.write(f'{"backend":<24}{"procesos":>9}{"get/s":>12}{"set/s":>12}{"incr/s":>12}')
+
+        def reportar(etiqueta, cantidad, tiempos_por_proceso):
+            # Throughput agregado: operaciones totales / tiempo del proceso más lento
+            columnas = []
+            for operacion in ('get', 'set', 'incr'):
+                segundos = max(tiempos[operacion] for tiempos in tiempos_por_proceso)
+                columnas.append(f'{cantidad * operaciones / segundos:>12,.0f}')
+            self.stdout.write(f'{etiqueta:<24}{cantidad:>9}' + ''.join(columnas))
+
+        locmem = LocMemCache('benchmark', {'TIMEOUT': None, 'OPTIONS': {'MAX_ENTRIES': 5000}})
+        reportar('LocMemCache', 1, [_medir(locmem, 0, operaciones)])
+
+        for cantidad in sorted({1, procesos}):
+            ruta = self.ruta(f'rendimiento_{cantidad}')
+            tiempos = self.ejecutar(_rendimiento, ruta, 5000, cantidad, operaciones)
+            reportar('CacheCompartida', cantidad, list(tiempos.values()))
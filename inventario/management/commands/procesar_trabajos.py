@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventario import artefactos, cambios, trabajos
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta los trabajos en segundo plano pendientes (exportaciones e '
+        'importaciones). Sin --una-vez queda atendiendo la cola; puede correr '
+        'junto al pool de hilos de los workers web sin ejecutar nada dos veces.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Vaciar la cola una vez y terminar')
+        parser.add_argument('--intervalo', type=float, default=2,
+                            help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--interrumpido-minutos', type=int, default=60,
+                            help='Minutos tras los que un trabajo en proceso se da por interrumpido')
+        parser.add_argument('--retencion-dias', type=int, default=7,
+                            help='Días que se conservan los trabajos terminados y sus archivos')
+
+    def handle(self, *args, **options):
+        while True:
+            interrumpidos = trabajos.marcar_interrumpidos(options['interrumpido_minutos'])
+            purgados = trabajos.purgar(options['retencion_dias'])
+            # Exportaciones cacheadas vencidas o que exceden el tamaño máximo
+            artefactos.podar()
+            # Marcas de equipos eliminados que ya salieron de la retención del feed
+            cambios.purgar_eliminados()
+            ejecutados = trabajos.ejecutar_pendientes()
+
+            if interrumpidos or purgados or ejecutados:
+                self.stdout.write(
+                    f'{ejecutados} ejecutados, {interrumpidos} interrumpidos, {purgados} purgados'
+                )
+            if options['una_vez']:
+                break
+            if not ejecutados:
+                time.sleep(options['intervalo'])
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventario.contadores import recalcular
+from inventario.models import Area, Estado, Sede
+from inventario.versiones import incrementar_version
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los contadores de equipos (cantidad y valor) de sedes, áreas y estados'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recalcular()
+        incrementar_version()
+
+        for modelo in (Sede, Area, Estado):
+            for nombre, total, valor in modelo.objects.order_by('nombre').values_list('nombre', 'total_equipos', 'valor_total'):
+                self.stdout.write(f'{modelo._meta.verbose_name}: {nombre} -> {total} equipos, ${valor:,.2f}')
+        self.stdout.write(self.style.SUCCESS('Contadores recalculados'))
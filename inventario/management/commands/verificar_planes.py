@@ -0,0 +1,149 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from inventario.busqueda import buscar_texto, filtrar_por_codigo
+from inventario.api import despues_de
+from inventario.cambios import consulta_equipos
+from inventario.models import Equipo
+
+TABLA_EQUIPOS = Equipo._meta.db_table
+
+
+def _mantenimiento_proximo():
+    hoy = date.today()
+    return Equipo.objects.filter(
+        fecha_mantenimiento__gte=hoy,
+        fecha_mantenimiento__lte=hoy + timedelta(days=30)
+    ).order_by('fecha_mantenimiento')[:10]
+
+
+def _mantenimiento_vencido():
+    return Equipo.objects.filter(fecha_mantenimiento__lt=date.today()).order_by('fecha_mantenimiento')[:5]
+
+
+def _lista_por_registro():
+    return Equipo.objects.order_by('-fecha_registro', 'id')[:25]
+
+
+def _exportacion_por_serie():
+    return Equipo.objects.order_by('numero_serie')[:2000]
+
+
+def _busqueda_por_serie():
+    return Equipo.objects.filter(numero_serie='MOT-00001')
+
+
+def _filtro_sede_area_estado():
+    return Equipo.objects.filter(sede_id=1, area_id=1, estado_id=1)
+
+
+def _filtro_estado_area():
+    return Equipo.objects.filter(estado_id=1, area_id=1)
+
+
+def _filtro_garantia_vencida():
+    return Equipo.objects.filter(garantia_hasta__lt=date.today()).order_by()
+
+
+def _feed_de_cambios():
+    ahora = timezone.now()
+    return consulta_equipos((ahora - timedelta(hours=1), 1), ahora)[:500]
+
+
+def _api_por_serie():
+    return despues_de(Equipo.objects.order_by('numero_serie', 'id'), 'numero_serie', 'MOT-00001', 1)[:100]
+
+
+def _busqueda_por_codigo():
+    return filtrar_por_codigo(Equipo.objects.all(), '0042')
+
+
+def _busqueda_texto():
+    return buscar_texto(Equipo.objects.all(), 'compresor')[:20]
+
+
+# Consultas críticas: ninguna debe recorrer inventario_equipo completo
+CONSULTAS_CRITICAS = [
+    ('dashboard: mantenimiento próximo', _mantenimiento_proximo),
+    ('dashboard: mantenimiento vencido', _mantenimiento_vencido),
+    ('lista: orden por fecha de registro', _lista_por_registro),
+    ('exportación: orden por número de serie', _exportacion_por_serie),
+    ('búsqueda exacta por número de serie', _busqueda_por_serie),
+    ('filtro sede + área + estado', _filtro_sede_area_estado),
+    ('filtro estado + área', _filtro_estado_area),
+    ('filtro garantía vencida', _filtro_garantia_vencida),
+    ('feed de cambios desde un cursor', _feed_de_cambios),
+    ('api: página por número de serie', _api_por_serie),
+    ('búsqueda por código (trigramas)', _busqueda_por_codigo),
+    ('búsqueda de texto completo', _busqueda_texto),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta EXPLAIN sobre las consultas críticas de equipos y falla si '
+        'alguna recorre la tabla completa. Soporta SQLite y MySQL. En MySQL '
+        'conviene ejecutarlo con un volumen de datos realista: con tablas casi '
+        'vacías el optimizador puede preferir un recorrido completo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor == 'sqlite':
+            explicar = self.explicar_sqlite
+        elif connection.vendor == 'mysql':
+            explicar = self.explicar_mysql
+        else:
+            raise CommandError(f'Motor no soportado: {connection.vendor}')
+
+        fallidas = []
+        for nombre, consulta in CONSULTAS_CRITICAS:
+            queryset = consulta()
+            sql, params = queryset.query.sql_with_params()
+            # Recorrer un índice en orden solo es aceptable si la consulta tiene LIMIT
+            limitada = queryset.query.high_mark is not None
+            with connection.cursor() as cursor:
+                recorrido_completo, plan = explicar(cursor, sql, params, limitada)
+            if recorrido_completo:
+                fallidas.append(nombre)
+                self.stdout.write(self.style.ERROR(f'✗ {nombre}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'✓ {nombre}'))
+            for linea in plan:
+                self.stdout.write(f'    {linea}')
+
+        if fallidas:
+            raise CommandError(
+                f'{len(fallidas)} consulta(s) recorren {TABLA_EQUIPOS} completa: ' + ', '.join(fallidas)
+            )
+
+    def explicar_sqlite(self, cursor, sql, params, limitada):
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        plan = [fila[-1] for fila in cursor.fetchall()]
+        recorrido_completo = any(
+            detalle.replace('SCAN TABLE ', 'SCAN ').split(' ')[:2] == ['SCAN', TABLA_EQUIPOS]
+            and not (limitada and 'USING' in detalle)
+            for detalle in plan
+        )
+        return recorrido_completo, plan
+
+    def explicar_mysql(self, cursor, sql, params, limitada):
+        cursor.execute(f'EXPLAIN {sql}', params)
+        columnas = [col[0] for col in cursor.description]
+        filas = [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+        plan = [
+            f"{fila.get('table')}: type={fila.get('type')} key={fila.get('key')} extra={fila.get('Extra')}"
+            for fila in filas
+        ]
+        recorrido_completo = any(
+            fila.get('table') == TABLA_EQUIPOS
+            and (fila.get('type') == 'ALL' or (fila.get('type') == 'index' and not limitada))
+            for fila in filas
+        )
+        return recorrido_completo, plan
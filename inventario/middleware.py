@@ -1,33 +1,20 @@
-from django.shortcuts import redirect
-from .models import PerfilUsuario
+from .permisos import obtener_permisos
 
 class PerfilUsuarioMiddleware:
     """
     Middleware para asegurar que todos los usuarios autenticados tengan un perfil
     """
-    
+
     def __init__(self, get_response):
         self.get_response = get_response
-    
+
     def __call__(self, request):
         # Procesar la solicitud
         response = self.get_response(request)
-        
-        # Verificar si el usuario está autenticado
+
+        # Resolver los permisos crea el perfil por defecto si no existe; si
+        # ya se resolvieron en esta petición o están en caché no hay consulta
         if request.user.is_authenticated:
-            try:
-                # Intentar obtener el perfil del usuario
-                perfil = request.user.perfil
-            except PerfilUsuario.DoesNotExist:
-                # Si no existe perfil, crear uno por defecto
-                perfil = PerfilUsuario.objects.create(
-                    usuario=request.user,
-                    rol='usuario',  # Rol por defecto
-                    puede_eliminar=False,  # Por defecto no puede eliminar
-                    puede_editar=True,
-                    puede_crear=True,
-                    puede_exportar=True,
-                    puede_importar=False,
-                )
-        
+            obtener_permisos(request)
+
         return response
@@ -0,0 +1,44 @@
+import re
+
+from django.db import migrations, models
+
+
+def poblar_secuencias(apps, schema_editor):
+    """Inicializa cada secuencia con el mayor número existente del prefijo"""
+    Equipo = apps.get_model('inventario', 'Equipo')
+    SecuenciaSerie = apps.get_model('inventario', 'SecuenciaSerie')
+    patron = re.compile(r'^([A-Z]{3})-(\d+)$')
+
+    mayores = {}
+    for numero_serie in Equipo.objects.values_list('numero_serie', flat=True).iterator():
+        coincidencia = patron.match(numero_serie or '')
+        if coincidencia:
+            prefijo, numero = coincidencia.group(1), int(coincidencia.group(2))
+            mayores[prefijo] = max(mayores.get(prefijo, 0), numero)
+
+    SecuenciaSerie.objects.bulk_create([
+        SecuenciaSerie(prefijo=prefijo, ultimo=ultimo) for prefijo, ultimo in mayores.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0008_perfilusuario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaSerie',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefijo', models.CharField(max_length=10, unique=True)),
+                ('ultimo', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Secuencia de Número de Serie',
+                'verbose_name_plural': 'Secuencias de Números de Serie',
+            },
+        ),
+        migrations.RunPython(poblar_secuencias, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.2.15 on 2026-10-18 10:51
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def calcular_contadores(apps, schema_editor):
+    Equipo = apps.get_model('inventario', 'Equipo')
+    for nombre_modelo, relacion in (('Sede', 'sede'), ('Area', 'area'), ('Estado', 'estado')):
+        modelo = apps.get_model('inventario', nombre_modelo)
+        equipos = Equipo.objects.filter(**{relacion: OuterRef('pk')}).order_by().values(relacion)
+        modelo.objects.update(
+            total_equipos=Coalesce(
+                Subquery(equipos.annotate(c=Count('id')).values('c'), output_field=models.IntegerField()),
+                Value(0),
+            ),
+            valor_total=Coalesce(
+                Subquery(equipos.annotate(s=Sum('precio')).values('s'), output_field=models.DecimalField(max_digits=14, decimal_places=2)),
+                Value(Decimal('0.00')),
+                output_field=models.DecimalField(max_digits=14, decimal_places=2),
+            ),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0009_secuenciaserie'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='area',
+            name='total_equipos',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Total Equipos'),
+        ),
+        migrations.AddField(
+            model_name='area',
+            name='valor_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14, verbose_name='Valor Total'),
+        ),
+        migrations.AddField(
+            model_name='estado',
+            name='total_equipos',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Total Equipos'),
+        ),
+        migrations.AddField(
+            model_name='estado',
+            name='valor_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14, verbose_name='Valor Total'),
+        ),
+        migrations.AddField(
+            model_name='sede',
+            name='total_equipos',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Total Equipos'),
+        ),
+        migrations.AddField(
+            model_name='sede',
+            name='valor_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14, verbose_name='Valor Total'),
+        ),
+        migrations.RunPython(calcular_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.15 on 2026-10-18 10:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0010_contadores_catalogos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='equipo',
+            index=models.Index(fields=['fecha_mantenimiento'], name='equipo_mantenimiento_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipo',
+            index=models.Index(fields=['-fecha_registro', 'id'], name='equipo_registro_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipo',
+            index=models.Index(fields=['sede', 'area', 'estado'], name='equipo_sede_area_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipo',
+            index=models.Index(fields=['estado', 'area'], name='equipo_estado_area_idx'),
+        ),
+    ]
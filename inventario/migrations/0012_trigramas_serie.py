@@ -0,0 +1,43 @@
+# Generated by Django 4.2.15 on 2026-10-18 10:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def indexar_series_existentes(apps, schema_editor):
+    Equipo = apps.get_model('inventario', 'Equipo')
+    TrigramaSerie = apps.get_model('inventario', 'TrigramaSerie')
+
+    lote = []
+    for equipo_id, numero_serie in Equipo.objects.values_list('id', 'numero_serie').iterator():
+        texto = (numero_serie or '').lower()
+        for trigrama in {texto[i:i + 3] for i in range(len(texto) - 2)}:
+            lote.append(TrigramaSerie(equipo_id=equipo_id, trigrama=trigrama))
+        if len(lote) >= 5000:
+            TrigramaSerie.objects.bulk_create(lote)
+            lote = []
+    TrigramaSerie.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0011_indices_equipo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrigramaSerie',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigrama', models.CharField(max_length=3)),
+                ('equipo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigramas', to='inventario.equipo')),
+            ],
+            options={
+                'verbose_name': 'Trigrama de Número de Serie',
+                'verbose_name_plural': 'Trigramas de Números de Serie',
+                'indexes': [models.Index(fields=['trigrama', 'equipo'], name='trigrama_equipo_idx')],
+            },
+        ),
+        migrations.RunPython(indexar_series_existentes, migrations.RunPython.noop),
+    ]
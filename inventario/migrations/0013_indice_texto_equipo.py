@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# Copia fija de los campos indexados en esta migración: si el índice cambia
+# después, lo hace una migración nueva y esta sigue creando el mismo índice
+CAMPOS = 'nombre, marca, modelo, proveedor, observacion'
+TABLA_FTS = 'inventario_equipo_fts'
+INDICE_FULLTEXT = 'equipo_texto_ft'
+
+
+def _campos_con(prefijo):
+    return ', '.join(f'{prefijo}.{campo}' for campo in CAMPOS.split(', '))
+
+
+def crear_indice(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(f'ALTER TABLE inventario_equipo ADD FULLTEXT INDEX {INDICE_FULLTEXT} ({CAMPOS})')
+        elif connection.vendor == 'sqlite':
+            borrar = (
+                f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, {CAMPOS}) "
+                f"VALUES ('delete', old.id, {_campos_con('old')});"
+            )
+            insertar = f"INSERT INTO {TABLA_FTS}(rowid, {CAMPOS}) VALUES (new.id, {_campos_con('new')});"
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5('
+                f"{CAMPOS}, content='inventario_equipo', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2')"
+            )
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ai AFTER INSERT ON inventario_equipo '
+                f'BEGIN {insertar} END'
+            )
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ad AFTER DELETE ON inventario_equipo '
+                f'BEGIN {borrar} END'
+            )
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_au AFTER UPDATE OF {CAMPOS}, id '
+                f'ON inventario_equipo BEGIN {borrar} {insertar} END'
+            )
+            cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')")
+
+
+def eliminar_indice(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(f'ALTER TABLE inventario_equipo DROP INDEX {INDICE_FULLTEXT}')
+        elif connection.vendor == 'sqlite':
+            for sufijo in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {TABLA_FTS}_{sufijo}')
+            cursor.execute(f'DROP TABLE IF EXISTS {TABLA_FTS}')
+
+
+class Migration(migrations.Migration):
+    """
+    Índice de texto completo sobre nombre, marca, modelo, proveedor y
+    observación: FULLTEXT en MySQL, tabla FTS5 con triggers en SQLite.
+    """
+
+    dependencies = [
+        ('inventario', '0012_trigramas_serie'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
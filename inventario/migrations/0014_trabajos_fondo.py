@@ -0,0 +1,40 @@
+# Generated by Django 4.2.15 on 2026-10-18 11:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventario', '0013_indice_texto_equipo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoFondo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('exportar_excel', 'Exportar a Excel'), ('exportar_pdf', 'Exportar a PDF'), ('importar_excel', 'Importar desde Excel')], max_length=20)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En proceso'), ('completado', 'Completado'), ('fallido', 'Fallido')], default='pendiente', max_length=20)),
+                ('parametros', models.JSONField(blank=True, default=dict)),
+                ('progreso', models.PositiveSmallIntegerField(default=0, help_text='Porcentaje completado (0-100)')),
+                ('mensaje', models.CharField(blank=True, max_length=255)),
+                ('resultado', models.JSONField(blank=True, default=dict)),
+                ('archivo', models.CharField(blank=True, help_text='Ruta del archivo generado, relativa al directorio de trabajos', max_length=255)),
+                ('nombre_archivo', models.CharField(blank=True, max_length=100)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('iniciado', models.DateTimeField(blank=True, null=True)),
+                ('terminado', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo en Segundo Plano',
+                'verbose_name_plural': 'Trabajos en Segundo Plano',
+                'ordering': ['-creado'],
+                'indexes': [models.Index(fields=['estado', 'creado'], name='trabajo_estado_creado_idx')],
+            },
+        ),
+    ]
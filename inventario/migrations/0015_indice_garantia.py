@@ -0,0 +1,17 @@
+# Generated by Django 4.2.15 on 2026-10-18 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0014_trabajos_fondo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='equipo',
+            index=models.Index(fields=['garantia_hasta'], name='equipo_garantia_idx'),
+        ),
+    ]
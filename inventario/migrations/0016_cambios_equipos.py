@@ -0,0 +1,40 @@
+# Generated by Django 4.2.15 on 2026-10-18 12:07
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0015_indice_garantia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipoEliminado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('equipo_id', models.BigIntegerField()),
+                ('numero_serie', models.CharField(max_length=20)),
+                ('eliminado_en', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Equipo Eliminado',
+                'verbose_name_plural': 'Equipos Eliminados',
+            },
+        ),
+        migrations.AddField(
+            model_name='equipo',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True, verbose_name='Actualizado en'),
+        ),
+        migrations.AddIndex(
+            model_name='equipo',
+            index=models.Index(fields=['actualizado_en', 'id'], name='equipo_actualizado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipoeliminado',
+            index=models.Index(fields=['eliminado_en', 'id'], name='eliminado_fecha_idx'),
+        ),
+    ]
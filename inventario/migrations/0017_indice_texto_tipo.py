@@ -0,0 +1,68 @@
+from django.db import migrations
+
+# Copias fijas de los campos indexados antes y después de esta migración
+CAMPOS_ANTERIORES = 'nombre, marca, modelo, proveedor, observacion'
+CAMPOS = 'nombre, tipo, marca, modelo, proveedor, observacion'
+TABLA_FTS = 'inventario_equipo_fts'
+INDICE_FULLTEXT = 'equipo_texto_ft'
+
+
+def _rehacer_indice(connection, campos):
+    """Vuelve a crear el índice de texto completo sobre `campos`"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                f'ALTER TABLE inventario_equipo DROP INDEX {INDICE_FULLTEXT}, '
+                f'ADD FULLTEXT INDEX {INDICE_FULLTEXT} ({campos})'
+            )
+        elif connection.vendor == 'sqlite':
+            for sufijo in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {TABLA_FTS}_{sufijo}')
+            cursor.execute(f'DROP TABLE IF EXISTS {TABLA_FTS}')
+
+            viejos = ', '.join(f'old.{campo}' for campo in campos.split(', '))
+            nuevos = ', '.join(f'new.{campo}' for campo in campos.split(', '))
+            borrar = (
+                f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, {campos}) "
+                f"VALUES ('delete', old.id, {viejos});"
+            )
+            insertar = f'INSERT INTO {TABLA_FTS}(rowid, {campos}) VALUES (new.id, {nuevos});'
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE {TABLA_FTS} USING fts5('
+                f"{campos}, content='inventario_equipo', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2')"
+            )
+            cursor.execute(
+                f'CREATE TRIGGER {TABLA_FTS}_ai AFTER INSERT ON inventario_equipo BEGIN {insertar} END'
+            )
+            cursor.execute(
+                f'CREATE TRIGGER {TABLA_FTS}_ad AFTER DELETE ON inventario_equipo BEGIN {borrar} END'
+            )
+            cursor.execute(
+                f'CREATE TRIGGER {TABLA_FTS}_au AFTER UPDATE OF {campos}, id '
+                f'ON inventario_equipo BEGIN {borrar} {insertar} END'
+            )
+            cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')")
+
+
+def agregar_tipo(apps, schema_editor):
+    _rehacer_indice(schema_editor.connection, CAMPOS)
+
+
+def quitar_tipo(apps, schema_editor):
+    _rehacer_indice(schema_editor.connection, CAMPOS_ANTERIORES)
+
+
+class Migration(migrations.Migration):
+    """
+    Agrega el tipo al índice de texto completo, para que la búsqueda global
+    no tenga que recorrer la tabla con LIKE para encontrarlo.
+    """
+
+    dependencies = [
+        ('inventario', '0016_cambios_equipos'),
+    ]
+
+    operations = [
+        migrations.RunPython(agregar_tipo, quitar_tipo),
+    ]
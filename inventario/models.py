@@ -1,7 +1,8 @@
-from django.db import models
-from django.db.models import Max
+from django.db import models, transaction, IntegrityError
+from django.db.models import Max, F, Q, Case, When, Value, Count, Func
 from django.contrib.auth.models import User
-from datetime import date
+from django.utils import timezone
+from datetime import date, timedelta
 import re
 
 # Create your models here.
@@ -28,7 +29,30 @@ class PerfilUsuario(models.Model):
         verbose_name = "Perfil de Usuario"
         verbose_name_plural = "Perfiles de Usuario"
 
-class Sede(models.Model):
+class CatalogoConContadores(models.Model):
+    """
+    Catálogo con contadores desnormalizados de sus equipos. Los contadores
+    solo se modifican con UPDATE incrementales (ver inventario.contadores).
+    """
+    total_equipos = models.IntegerField(default=0, editable=False, verbose_name="Total Equipos")
+    valor_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False, verbose_name="Valor Total")
+
+    CAMPOS_CONTADORES = ('total_equipos', 'valor_total')
+
+    def save(self, *args, **kwargs):
+        # Al editar un catálogo no se escriben los contadores: el valor en
+        # memoria puede estar desactualizado respecto a la base de datos
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.CAMPOS_CONTADORES
+            ]
+        super().save(*args, **kwargs)
+
+    class Meta:
+        abstract = True
+
+class Sede(CatalogoConContadores):
     nombre = models.CharField(max_length=100, unique=True)
     direccion = models.TextField(blank=True)
     descripcion = models.TextField(blank=True)
@@ -40,7 +64,7 @@ class Sede(models.Model):
         verbose_name = "Sede"
         verbose_name_plural = "Sedes"
 
-class Area(models.Model):
+class Area(CatalogoConContadores):
     nombre = models.CharField(max_length=100, unique=True)
     descripcion = models.TextField(blank=True)
 
@@ -51,13 +75,198 @@ class Area(models.Model):
         verbose_name = "Área"
         verbose_name_plural = "Áreas"
 
-class Estado(models.Model):
+class Estado(CatalogoConContadores):
     nombre = models.CharField(max_length=50, unique=True)
     descripcion = models.TextField(blank=True)
 
     def __str__(self):
         return self.nombre
 
+class SecuenciaSerie(models.Model):
+    """
+    Último número de serie asignado por prefijo (ej: MOT -> 42 para MOT-00042).
+    Reemplaza el MAX() sobre inventario_equipo en cada alta.
+    """
+    prefijo = models.CharField(max_length=10, unique=True)
+    ultimo = models.PositiveIntegerField(default=0)
+
+    PATRON = re.compile(r'^([A-Z]{3})-(\d+)$')
+
+    def __str__(self):
+        return f"{self.prefijo}: {self.ultimo}"
+
+    @staticmethod
+    def formatear(prefijo, numero):
+        return f"{prefijo}-{numero:05d}"
+
+    @classmethod
+    def reservar(cls, prefijo, cantidad=1):
+        """
+        Reserva `cantidad` números consecutivos para el prefijo y devuelve el
+        primero. El incremento se hace con un UPDATE atómico, así que altas
+        concurrentes nunca reciben el mismo número.
+        """
+        with transaction.atomic():
+            actualizadas = cls.objects.filter(prefijo=prefijo).update(ultimo=F('ultimo') + cantidad)
+            if not actualizadas:
+                try:
+                    with transaction.atomic():
+                        # Primera vez que se usa el prefijo: partir del mayor existente
+                        cls.objects.create(prefijo=prefijo, ultimo=cls._mayor_existente(prefijo) + cantidad)
+                except IntegrityError:
+                    # Otro proceso creó la secuencia al mismo tiempo
+                    cls.objects.filter(prefijo=prefijo).update(ultimo=F('ultimo') + cantidad)
+            ultimo = cls.objects.filter(prefijo=prefijo).values_list('ultimo', flat=True).get()
+        return ultimo - cantidad + 1
+
+    @classmethod
+    def sincronizar(cls, numero_serie):
+        """
+        Si se registra manualmente un número con formato XXX-00000 mayor que la
+        secuencia, la adelanta para que no se vuelva a generar.
+        """
+        cls.sincronizar_varios([numero_serie])
+
+    @classmethod
+    def sincronizar_varios(cls, numeros_serie):
+        """
+        Como sincronizar, para muchos números a la vez (importaciones y
+        lotes): un solo UPDATE por prefijo, con el mayor número de cada uno.
+        """
+        mayores = {}
+        for numero_serie in numeros_serie:
+            coincidencia = cls.PATRON.match(numero_serie or '')
+            if coincidencia:
+                prefijo, numero = coincidencia.group(1), int(coincidencia.group(2))
+                mayores[prefijo] = max(numero, mayores.get(prefijo, 0))
+        for prefijo, numero in mayores.items():
+            cls.objects.filter(prefijo=prefijo, ultimo__lt=numero).update(ultimo=numero)
+
+    @staticmethod
+    def _mayor_existente(prefijo):
+        ultimo = Equipo.objects.filter(numero_serie__startswith=prefijo + '-').aggregate(
+            Max('numero_serie'))['numero_serie__max']
+        if ultimo:
+            try:
+                # Extraer el número del formato "XXX-00001"
+                return int(ultimo.split('-')[1])
+            except (IndexError, ValueError):
+                return 0
+        return 0
+
+    class Meta:
+        verbose_name = "Secuencia de Número de Serie"
+        verbose_name_plural = "Secuencias de Números de Serie"
+
+# Días en que un mantenimiento cuenta como próximo
+DIAS_MANTENIMIENTO_PROXIMO = 30
+
+
+def condiciones_mantenimiento(hoy=None):
+    """Situación del mantenimiento -> condición sobre fecha_mantenimiento"""
+    hoy = hoy or date.today()
+    limite = hoy + timedelta(days=DIAS_MANTENIMIENTO_PROXIMO)
+    return {
+        'vencido': Q(fecha_mantenimiento__lt=hoy),
+        'proximo': Q(fecha_mantenimiento__gte=hoy, fecha_mantenimiento__lte=limite),
+        'programado': Q(fecha_mantenimiento__gt=limite),
+        'sin_fecha': Q(fecha_mantenimiento__isnull=True),
+    }
+
+
+def condiciones_garantia(hoy=None):
+    """Situación de la garantía -> condición sobre garantia_hasta"""
+    hoy = hoy or date.today()
+    return {
+        'vigente': Q(garantia_hasta__gte=hoy),
+        'vencida': Q(garantia_hasta__lt=hoy),
+        'sin_garantia': Q(garantia_hasta__isnull=True),
+    }
+
+
+class DiasHasta(Func):
+    """
+    Días enteros desde `hoy` hasta la fecha de la columna (negativos si ya
+    pasó; NULL si no hay fecha), calculados en la base de datos.
+    """
+    output_field = models.IntegerField()
+
+    def __init__(self, columna, hoy, **extra):
+        super().__init__(columna, Value(hoy, output_field=models.DateField()), **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # PostgreSQL: la resta de dos date ya es un entero de días
+        return super().as_sql(compiler, connection, template='(%(expressions)s)', arg_joiner=' - ', **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function='DATEDIFF', **extra_context)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) AS INTEGER)', arg_joiner=') - julianday(',
+            **extra_context
+        )
+
+
+def _indicador(condicion):
+    return Case(When(condicion, then=Value(True)), default=Value(False), output_field=models.BooleanField())
+
+
+def _situacion(condiciones):
+    return Case(
+        *[When(condicion, then=Value(nombre)) for nombre, condicion in condiciones.items()],
+        output_field=models.CharField(),
+    )
+
+
+class EquipoQuerySet(models.QuerySet):
+    def with_status(self, hoy=None):
+        """
+        Anota en SQL la situación de garantía y mantenimiento de cada equipo,
+        para filtrar, ordenar o agrupar por ella sin cargar filas:
+
+        - con_garantia_vigente, con_mantenimiento_proximo,
+          con_mantenimiento_vencido: lo mismo que las propiedades del modelo.
+        - dias_garantia, dias_mantenimiento: días que faltan (negativos si
+          ya pasaron, None sin fecha).
+        - situacion_garantia (vigente, vencida, sin_garantia) y
+          situacion_mantenimiento (vencido, proximo, programado, sin_fecha):
+          los mismos valores que los filtros de la lista.
+
+        Los nombres no coinciden con las propiedades, que no admiten asignación.
+        """
+        hoy = hoy or date.today()
+        garantia = condiciones_garantia(hoy)
+        mantenimiento = condiciones_mantenimiento(hoy)
+        return self.annotate(
+            con_garantia_vigente=_indicador(garantia['vigente']),
+            con_mantenimiento_proximo=_indicador(mantenimiento['proximo']),
+            con_mantenimiento_vencido=_indicador(mantenimiento['vencido']),
+            dias_garantia=DiasHasta('garantia_hasta', hoy),
+            dias_mantenimiento=DiasHasta('fecha_mantenimiento', hoy),
+            situacion_garantia=_situacion(garantia),
+            situacion_mantenimiento=_situacion(mantenimiento),
+        )
+
+    def resumen_situacion(self, hoy=None):
+        """
+        Cantidad de equipos por situación de garantía y de mantenimiento, en
+        una sola consulta: {'garantia': {'vigente': n, ...}, 'mantenimiento': {...}}
+        """
+        hoy = hoy or date.today()
+        grupos = {'garantia': condiciones_garantia(hoy), 'mantenimiento': condiciones_mantenimiento(hoy)}
+        totales = self.order_by().aggregate(**{
+            f'{grupo}__{nombre}': Count('id', filter=condicion)
+            for grupo, condiciones in grupos.items()
+            for nombre, condicion in condiciones.items()
+        })
+        return {
+            grupo: {nombre: totales[f'{grupo}__{nombre}'] for nombre in condiciones}
+            for grupo, condiciones in grupos.items()
+        }
+
+
 class Equipo(models.Model):
     # Información básica
     nombre = models.CharField(max_length=100)
@@ -82,6 +291,12 @@ class Equipo(models.Model):
     area = models.ForeignKey(Area, on_delete=models.CASCADE, related_name='equipos')
     estado = models.ForeignKey(Estado, on_delete=models.CASCADE, related_name='equipos')
     fecha_registro = models.DateField(auto_now_add=True)
+    # Última modificación, para el feed de cambios (ver inventario/cambios.py).
+    # save() y bulk_create la ponen solos; bulk_update y update() deben
+    # incluirla explícitamente
+    actualizado_en = models.DateTimeField(auto_now=True, verbose_name="Actualizado en")
+
+    objects = EquipoQuerySet.as_manager()
 
     def _generar_prefijo(self):
         """Genera un prefijo de 3 letras basado en el tipo de equipo"""
@@ -101,25 +316,53 @@ class Equipo(models.Model):
         # Asegurar que tenga exactamente 3 caracteres
         return prefijo.ljust(3, 'X')[:3]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Guardar los valores cargados para calcular, al guardar, los deltas de
+        # contadores y si hay que reindexar el número de serie
+        campos = instancia.__dict__
+        if 'numero_serie' in campos:
+            instancia._numero_serie_original = instancia.numero_serie
+        if all(campo in campos for campo in ('sede_id', 'area_id', 'estado_id', 'precio')):
+            from .contadores import valores_equipo
+            instancia._valores_contadores = valores_equipo(instancia)
+        return instancia
+
     def save(self, *args, **kwargs):
+        from .contadores import valores_equipo, registrar_altas, registrar_cambio
+        from .busqueda import reindexar_serie
+
         if not self.numero_serie:
             prefijo = self._generar_prefijo()
-            
-            # Buscar el último número para este prefijo
-            ultimo = Equipo.objects.filter(numero_serie__startswith=prefijo + '-').aggregate(
-                Max('numero_serie'))['numero_serie__max']
-            
-            if ultimo:
-                try:
-                    # Extraer el número del formato "XXX-00001"
-                    num = int(ultimo.split('-')[1]) + 1
-                except (IndexError, ValueError):
-                    num = 1
+            self.numero_serie = SecuenciaSerie.formatear(prefijo, SecuenciaSerie.reservar(prefijo))
+        elif self._state.adding:
+            SecuenciaSerie.sincronizar(self.numero_serie)
+
+        creando = self._state.adding
+        anteriores = getattr(self, '_valores_contadores', None)
+        if not creando and anteriores is None and self.pk:
+            original = Equipo.objects.filter(pk=self.pk).values('sede_id', 'area_id', 'estado_id', 'precio').first()
+            if original:
+                anteriores = valores_equipo(Equipo(**original))
+
+        serie_original = getattr(self, '_numero_serie_original', None)
+
+        # auto_now solo se escribe si está en update_fields
+        update_fields = kwargs.get('update_fields')
+        if update_fields and 'actualizado_en' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'actualizado_en']
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if creando or anteriores is None:
+                registrar_altas([self])
             else:
-                num = 1
-            
-            self.numero_serie = f"{prefijo}-{num:05d}"
-        super().save(*args, **kwargs)
+                registrar_cambio(anteriores, valores_equipo(self))
+            if creando or self.numero_serie != serie_original:
+                reindexar_serie(self)
+        self._valores_contadores = valores_equipo(self)
+        self._numero_serie_original = self.numero_serie
 
     @property
     def garantia_vigente(self):
@@ -132,7 +375,7 @@ class Equipo(models.Model):
         """Retorna True si el mantenimiento está programado para los próximos 30 días"""
         if self.fecha_mantenimiento:
             dias_restantes = (self.fecha_mantenimiento - date.today()).days
-            return 0 <= dias_restantes <= 30
+            return 0 <= dias_restantes <= DIAS_MANTENIMIENTO_PROXIMO
         return False
     
     @property
@@ -149,3 +392,96 @@ class Equipo(models.Model):
         ordering = ['-fecha_registro']
         verbose_name = "Equipo"
         verbose_name_plural = "Equipos"
+        indexes = [
+            # Dashboard: rangos y orden por fecha de mantenimiento
+            models.Index(fields=['fecha_mantenimiento'], name='equipo_mantenimiento_idx'),
+            # Filtro de garantía vigente/vencida de la lista y las exportaciones
+            models.Index(fields=['garantia_hasta'], name='equipo_garantia_idx'),
+            # Feed de cambios: keyset por (actualizado_en, id)
+            models.Index(fields=['actualizado_en', 'id'], name='equipo_actualizado_idx'),
+            # Lista: orden por defecto (-fecha_registro) con desempate por id
+            models.Index(fields=['-fecha_registro', 'id'], name='equipo_registro_idx'),
+            # Filtros combinados de la lista y las exportaciones
+            models.Index(fields=['sede', 'area', 'estado'], name='equipo_sede_area_estado_idx'),
+            models.Index(fields=['estado', 'area'], name='equipo_estado_area_idx'),
+        ]
+
+class EquipoEliminado(models.Model):
+    """
+    Marca de un equipo eliminado para el feed de cambios: los clientes que
+    sincronizan de forma incremental lo quitan de su copia. Se conservan
+    settings.CAMBIOS_RETENCION_DIAS días.
+    """
+    equipo_id = models.BigIntegerField()
+    numero_serie = models.CharField(max_length=20)
+    eliminado_en = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.numero_serie} ({self.equipo_id})"
+
+    class Meta:
+        verbose_name = "Equipo Eliminado"
+        verbose_name_plural = "Equipos Eliminados"
+        indexes = [
+            models.Index(fields=['eliminado_en', 'id'], name='eliminado_fecha_idx'),
+        ]
+
+class TrigramaSerie(models.Model):
+    """
+    Índice de trigramas (en minúsculas) del número de serie. Permite buscar
+    subcadenas del código sin un LIKE '%...%' sobre toda la tabla.
+    """
+    equipo = models.ForeignKey(Equipo, on_delete=models.CASCADE, related_name='trigramas')
+    trigrama = models.CharField(max_length=3)
+
+    def __str__(self):
+        return f"{self.trigrama} -> {self.equipo_id}"
+
+    class Meta:
+        verbose_name = "Trigrama de Número de Serie"
+        verbose_name_plural = "Trigramas de Números de Serie"
+        indexes = [
+            models.Index(fields=['trigrama', 'equipo'], name='trigrama_equipo_idx'),
+        ]
+
+class TrabajoFondo(models.Model):
+    """
+    Trabajo largo (exportación o importación) que se ejecuta fuera de la
+    petición. Ver inventario.trabajos.
+    """
+    TIPOS_CHOICES = [
+        ('exportar_excel', 'Exportar a Excel'),
+        ('exportar_pdf', 'Exportar a PDF'),
+        ('importar_excel', 'Importar desde Excel'),
+    ]
+    ESTADOS_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En proceso'),
+        ('completado', 'Completado'),
+        ('fallido', 'Fallido'),
+    ]
+
+    tipo = models.CharField(max_length=20, choices=TIPOS_CHOICES)
+    estado = models.CharField(max_length=20, choices=ESTADOS_CHOICES, default='pendiente')
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='trabajos')
+    parametros = models.JSONField(default=dict, blank=True)
+    progreso = models.PositiveSmallIntegerField(default=0, help_text="Porcentaje completado (0-100)")
+    mensaje = models.CharField(max_length=255, blank=True)
+    resultado = models.JSONField(default=dict, blank=True)
+    archivo = models.CharField(max_length=255, blank=True, help_text="Ruta del archivo generado, relativa al directorio de trabajos")
+    nombre_archivo = models.CharField(max_length=100, blank=True)
+    creado = models.DateTimeField(auto_now_add=True)
+    iniciado = models.DateTimeField(null=True, blank=True)
+    terminado = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.pk} - {self.get_estado_display()}"
+
+    class Meta:
+        ordering = ['-creado']
+        verbose_name = "Trabajo en Segundo Plano"
+        verbose_name_plural = "Trabajos en Segundo Plano"
+        indexes = [
+            # El worker toma los pendientes por orden de llegada
+            models.Index(fields=['estado', 'creado'], name='trabajo_estado_creado_idx'),
+        ]
@@ -0,0 +1,253 @@
+"""
+Exportación de equipos a PDF por bloques.
+
+Una sola Table de reportlab con todo el inventario tarda de forma
+superlineal en maquetarse (en cada salto de página se vuelve a partir toda
+la tabla restante) y mantiene cada celda en memoria. Aquí las filas se leen
+del queryset por lotes y se agrupan en bloques de FILAS_POR_BLOQUE; cada
+bloque es una tabla independiente.
+
+- Con pypdf instalado, settings.PDF_PROCESOS > 1 y más de un bloque, cada
+  bloque se maqueta como un PDF aparte en un pool de procesos y al final
+  las partes se unen en el destino.
+- En otro caso los bloques se maquetan en secuencia dentro de un único
+  documento.
+
+Las filas salen de la proyección PDF (área y estado del caché de
+catálogos) y las estadísticas (por estado y por situación de garantía y
+mantenimiento) se calculan en SQL. Este módulo no importa modelos al
+cargarse: los procesos del pool (creados con spawn) solo necesitan reportlab.
+"""
+import importlib.util
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import multiprocessing
+
+from django.conf import settings
+
+# Filas por tabla / por PDF parcial
+FILAS_POR_BLOQUE = 1000
+
+# Bloques enviados al pool por proceso antes de esperar resultados
+BLOQUES_EN_VUELO = 2
+
+ENCABEZADOS = ['Nombre', 'Tipo', 'N° Serie', 'Marca/Modelo', 'Precio', 'Área', 'Estado', 'Garantía']
+
+# Anchos de columna en pulgadas
+ANCHOS = [1.5, 0.8, 1, 1.2, 0.8, 0.8, 0.8, 0.8]
+
+
+def _filas(equipos, tamano_lote):
+    """Filas de la tabla ya formateadas (solo texto, se pueden enviar al pool)"""
+    from .proyecciones import PDF
+
+    for equipo in PDF.registros(equipos, tamano_lote):
+        marca_modelo = f"{equipo.marca or ''} {equipo.modelo or ''}".strip() or "N/A"
+        if equipo.garantia_hasta:
+            garantia = "Vigente" if equipo.garantia_vigente else "Vencida"
+        else:
+            garantia = "N/A"
+        yield [
+            equipo.nombre,
+            equipo.tipo,
+            equipo.numero_serie,
+            marca_modelo,
+            f"${equipo.precio:,.2f}" if equipo.precio else "N/A",
+            equipo.area or "",
+            equipo.estado or "",
+            garantia,
+        ]
+
+
+def _bloques(filas, tamano):
+    bloque = []
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) == tamano:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def _portada(fecha):
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.platypus import Paragraph, Spacer
+
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        textColor=colors.darkblue
+    )
+    subtitle_style = ParagraphStyle(
+        'CustomSubtitle',
+        parent=styles['Normal'],
+        fontSize=12,
+        spaceAfter=20,
+        alignment=TA_CENTER,
+        textColor=colors.grey
+    )
+    return [
+        Paragraph("INVENTARIO DE ACTIVOS", title_style),
+        Paragraph(f"Reporte generado el {fecha}", subtitle_style),
+        Spacer(1, 20),
+    ]
+
+
+def _tabla_equipos(filas):
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Table, TableStyle
+
+    table = Table([ENCABEZADOS] + filas, colWidths=[ancho * inch for ancho in ANCHOS], repeatRows=1)
+    table.setStyle(TableStyle([
+        # Encabezados
+        ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+
+        # Datos
+        ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+
+        # Alineación específica para columnas
+        ('ALIGN', (4, 1), (4, -1), 'RIGHT'),  # Precio
+        ('ALIGN', (2, 1), (2, -1), 'CENTER'),  # N° Serie
+        ('ALIGN', (6, 1), (6, -1), 'CENTER'),  # Estado
+        ('ALIGN', (7, 1), (7, -1), 'CENTER'),  # Garantía
+    ]))
+    return table
+
+
+def _estadisticas(conteo, situacion=()):
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Spacer, Table, TableStyle
+
+    stats_data = [['Estadísticas del Inventario'], ['Estado', 'Cantidad']]
+    stats_data.extend([estado, str(cantidad)] for estado, cantidad in conteo)
+    if situacion:
+        stats_data.append(['Situación', 'Cantidad'])
+        stats_data.extend([etiqueta, str(cantidad)] for etiqueta, cantidad in situacion)
+    stats_table = Table(stats_data, colWidths=[2.5*inch, 1*inch])
+    stats_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.darkgreen),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgreen]),
+        ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+    ]))
+    return [Spacer(1, 30), stats_table]
+
+
+def _documento(destino, elementos):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate
+
+    SimpleDocTemplate(destino, pagesize=A4).build(elementos)
+
+
+def _renderizar_bloque(ruta, filas, fecha=None):
+    """
+    Maqueta un bloque como PDF independiente (se ejecuta en el pool). El
+    primer bloque lleva la portada.
+    """
+    elementos = _portada(fecha) if fecha else []
+    elementos.append(_tabla_equipos(filas))
+    _documento(ruta, elementos)
+    return len(filas)
+
+
+def _pypdf_disponible():
+    return importlib.util.find_spec('pypdf') is not None
+
+
+def escribir_pdf_equipos(equipos, destino, progreso=None, procesos=None,
+                         tamano_bloque=FILAS_POR_BLOQUE):
+    """
+    Escribe el PDF de equipos en `destino` (ruta o archivo binario).
+
+    `progreso(filas_maquetadas, total)` se llama al terminar cada bloque del
+    pool (o una sola vez al final, sin pool). `procesos` reemplaza a
+    settings.PDF_PROCESOS (0 o 1: sin pool).
+    """
+    from .utils import contar_por_estado, contar_por_situacion, TAMANO_LOTE_EXPORTACION
+
+    total = equipos.count()
+    conteo = contar_por_estado(equipos)
+    situacion = contar_por_situacion(equipos)
+    fecha = datetime.now().strftime("%d/%m/%Y %H:%M")
+    bloques = _bloques(_filas(equipos, TAMANO_LOTE_EXPORTACION), tamano_bloque)
+    if procesos is None:
+        procesos = getattr(settings, 'PDF_PROCESOS', 1)
+
+    if procesos > 1 and total > tamano_bloque and _pypdf_disponible():
+        _escribir_en_paralelo(bloques, destino, procesos, fecha, conteo, situacion, total, progreso)
+        return
+
+    elementos = _portada(fecha)
+    for bloque in bloques:
+        elementos.append(_tabla_equipos(bloque))
+    elementos.extend(_estadisticas(conteo, situacion))
+    _documento(destino, elementos)
+    if progreso:
+        progreso(total, total)
+
+
+def _escribir_en_paralelo(bloques, destino, procesos, fecha, conteo, situacion, total, progreso):
+    from pypdf import PdfWriter
+
+    with tempfile.TemporaryDirectory(prefix='inventario_pdf_') as directorio:
+        partes = []
+        pendientes = deque()
+        hechas = 0
+
+        def esperar_uno():
+            nonlocal hechas
+            hechas += pendientes.popleft().result()
+            if progreso:
+                progreso(hechas, total)
+
+        # spawn: los procesos no heredan conexiones ni hilos del worker web
+        contexto = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as pool:
+            for indice, bloque in enumerate(bloques):
+                ruta = os.path.join(directorio, f'{indice:06d}.pdf')
+                partes.append(ruta)
+                pendientes.append(pool.submit(
+                    _renderizar_bloque, ruta, bloque, fecha if indice == 0 else None
+                ))
+                # Acotar los bloques en memoria a los que el pool puede atender
+                while len(pendientes) >= procesos * BLOQUES_EN_VUELO:
+                    esperar_uno()
+            while pendientes:
+                esperar_uno()
+
+        # Las estadísticas van en una última parte, en su propia página
+        ruta = os.path.join(directorio, 'estadisticas.pdf')
+        _documento(ruta, _estadisticas(conteo, situacion))
+        partes.append(ruta)
+
+        writer = PdfWriter()
+        for ruta in partes:
+            writer.append(ruta)
+        writer.write(destino)
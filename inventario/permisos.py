@@ -0,0 +1,60 @@
+"""
+Resolución de permisos de PerfilUsuario.
+
+La matriz de permisos de cada usuario (rol y banderas puede_*) se guarda en
+la caché y se invalida al guardar o eliminar su perfil. Dentro de una misma
+petición se resuelve una sola vez y queda en el request, así que los
+decoradores, las vistas y el middleware no vuelven a consultar el perfil.
+"""
+from django.core.cache import cache
+
+from .models import PerfilUsuario
+
+CAMPOS_PERMISOS = ('puede_crear', 'puede_editar', 'puede_eliminar', 'puede_exportar', 'puede_importar')
+
+PERMISOS_CACHE_TIMEOUT = 3600
+
+
+def clave_permisos(usuario_id):
+    return f'permisos:usuario:{usuario_id}'
+
+
+def _matriz(perfil):
+    matriz = {campo: getattr(perfil, campo) for campo in CAMPOS_PERMISOS}
+    matriz['rol'] = perfil.rol
+    matriz['rol_display'] = perfil.get_rol_display()
+    return matriz
+
+
+def cargar_permisos(usuario):
+    """
+    Matriz de permisos del usuario desde la caché o, si no está, desde su
+    perfil. Un usuario sin perfil recibe uno con los valores por defecto.
+    """
+    clave = clave_permisos(usuario.pk)
+    matriz = cache.get(clave)
+    if matriz is None:
+        perfil, _ = PerfilUsuario.objects.get_or_create(usuario=usuario)
+        matriz = _matriz(perfil)
+        cache.set(clave, matriz, PERMISOS_CACHE_TIMEOUT)
+    return matriz
+
+
+def obtener_permisos(request):
+    """
+    Matriz de permisos del usuario de la petición, resuelta como máximo una
+    vez por petición. Devuelve None para usuarios anónimos.
+    """
+    if not hasattr(request, '_permisos'):
+        usuario = request.user
+        request._permisos = cargar_permisos(usuario) if usuario.is_authenticated else None
+    return request._permisos
+
+
+def invalidar_permisos(usuario_id):
+    cache.delete(clave_permisos(usuario_id))
+
+
+def contexto_permisos(request):
+    """Context processor: expone la matriz como `permisos_usuario` en las plantillas"""
+    return {'permisos_usuario': obtener_permisos(request)}
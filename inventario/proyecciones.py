@@ -0,0 +1,208 @@
+"""
+Proyecciones de filas de equipos para las rutas de lectura.
+
+Cada consumidor (lista, Excel, PDF, volcados crudos, API) declara aquí las
+columnas que necesita. Las filas se leen con values_list, sin instanciar
+Equipo ni sus relaciones, y se devuelven como registros namedtuple (tuplas
+sin __dict__). Los indicadores calculados (garantía vigente, mantenimiento
+próximo o vencido) se evalúan una sola vez por fila al construir el
+registro.
+
+Los nombres de sede, área y estado se obtienen de dos formas:
+
+- catalogo('area'): se lee area_id y el nombre sale del caché de
+  catálogos, sin JOIN. Es la opción de las exportaciones.
+- unido('area'): se lee area__nombre con JOIN. La lista lo necesita porque
+  ordena y pagina por esos nombres en SQL.
+"""
+from collections import namedtuple
+from datetime import date
+
+from django.db.models.functions import Substr
+
+from .catalogos import obtener_catalogos
+from .models import DIAS_MANTENIMIENTO_PROXIMO
+
+TAMANO_LOTE = 2000
+
+
+class Columna:
+    """Atributo del registro y de dónde sale su valor"""
+    __slots__ = ('atributo', 'ruta', 'catalogo', 'expresion')
+
+    def __init__(self, atributo, ruta, catalogo=None, expresion=None):
+        self.atributo = atributo
+        self.ruta = ruta
+        self.catalogo = catalogo
+        self.expresion = expresion
+
+
+def campo(nombre):
+    return Columna(nombre, nombre)
+
+
+def catalogo(nombre):
+    return Columna(nombre, f'{nombre}_id', catalogo=nombre)
+
+
+def unido(nombre):
+    return Columna(nombre, f'{nombre}__nombre')
+
+
+def anotado(nombre, expresion):
+    return Columna(nombre, nombre, expresion=expresion)
+
+
+# Indicadores calculados: nombre -> (atributo de origen, función(fecha, hoy))
+
+def _garantia_vigente(fecha, hoy):
+    return fecha is not None and fecha >= hoy
+
+
+def _mantenimiento_proximo(fecha, hoy):
+    return fecha is not None and 0 <= (fecha - hoy).days <= DIAS_MANTENIMIENTO_PROXIMO
+
+
+def _mantenimiento_vencido(fecha, hoy):
+    return fecha is not None and fecha < hoy
+
+
+CALCULADOS = {
+    'garantia_vigente': ('garantia_hasta', _garantia_vigente),
+    'mantenimiento_proximo': ('fecha_mantenimiento', _mantenimiento_proximo),
+    'mantenimiento_vencido': ('fecha_mantenimiento', _mantenimiento_vencido),
+}
+
+
+class Proyeccion:
+    def __init__(self, nombre, columnas, calculados=()):
+        self.nombre = nombre
+        self.columnas = list(columnas)
+        self.calculados = list(calculados)
+        self.atributos = [columna.atributo for columna in self.columnas]
+        for calculado in self.calculados:
+            origen = CALCULADOS[calculado][0]
+            if origen not in self.atributos:
+                raise ValueError(f'La proyección {nombre} necesita {origen} para calcular {calculado}')
+        self.Registro = namedtuple(f'Registro_{nombre}', self.atributos + self.calculados)
+        self._rutas = [columna.ruta for columna in self.columnas]
+        self._anotaciones = {
+            columna.ruta: columna.expresion for columna in self.columnas if columna.expresion is not None
+        }
+        self._catalogos = [
+            (i, columna.catalogo) for i, columna in enumerate(self.columnas) if columna.catalogo
+        ]
+        self._origenes = [
+            (self.atributos.index(CALCULADOS[calculado][0]), CALCULADOS[calculado][1])
+            for calculado in self.calculados
+        ]
+
+    def subconjunto(self, atributos, nombre=None):
+        """Proyección con solo algunas columnas (y los calculados que admitan)"""
+        columnas = [columna for columna in self.columnas if columna.atributo in atributos]
+        presentes = {columna.atributo for columna in columnas}
+        calculados = [
+            calculado for calculado in self.calculados
+            if calculado in atributos and CALCULADOS[calculado][0] in presentes
+        ]
+        return Proyeccion(nombre or self.nombre, columnas, calculados)
+
+    def consulta(self, equipos):
+        """values_list con las columnas de la proyección, en su orden"""
+        if self._anotaciones:
+            equipos = equipos.annotate(**self._anotaciones)
+        return equipos.values_list(*self._rutas)
+
+    def convertidor(self):
+        """
+        Función fila -> registro. Toma los catálogos y la fecha una sola vez,
+        así que conviene pedirla por consulta y no por fila.
+        """
+        registro = self.Registro._make
+        catalogos = obtener_catalogos() if self._catalogos else None
+        resolver = [(i, catalogos[nombre]) for i, nombre in self._catalogos] if catalogos else []
+        origenes = self._origenes
+        hoy = date.today()
+
+        if not resolver and not origenes:
+            return registro
+
+        def convertir(fila):
+            valores = list(fila)
+            for i, catalogo_objetos in resolver:
+                valores[i] = catalogo_objetos.nombre(valores[i], None)
+            for i, funcion in origenes:
+                valores.append(funcion(fila[i], hoy))
+            return registro(valores)
+        return convertir
+
+    def registros(self, equipos, tamano_lote=TAMANO_LOTE):
+        """Itera los registros del queryset leyendo por lotes"""
+        convertir = self.convertidor()
+        for fila in self.consulta(equipos).iterator(chunk_size=tamano_lote):
+            yield convertir(fila)
+
+    def lotes(self, equipos, tamano_lote=TAMANO_LOTE):
+        """
+        Lotes de registros en orden de id, una consulta acotada por lote
+        (id > último id leído). La proyección debe empezar por 'id'.
+        """
+        if self.atributos[0] != 'id':
+            raise ValueError(f'La proyección {self.nombre} no empieza por id')
+        convertir = self.convertidor()
+        consulta = self.consulta(equipos.order_by('id'))
+        ultimo = None
+        while True:
+            pagina = consulta if ultimo is None else consulta.filter(id__gt=ultimo)
+            lote = list(pagina[:tamano_lote])
+            if not lote:
+                return
+            yield [convertir(fila) for fila in lote]
+            if len(lote) < tamano_lote:
+                return
+            ultimo = lote[-1][0]
+
+    def por_rutas(self, registro):
+        """Valores del registro por ruta ORM (p. ej. para armar un cursor)"""
+        return dict(zip(self._rutas, registro))
+
+
+LISTA = Proyeccion('lista', [
+    campo('id'), campo('nombre'), campo('tipo'), campo('numero_serie'),
+    campo('marca'), campo('modelo'), campo('precio'),
+    unido('sede'), unido('area'), unido('estado'),
+    campo('garantia_hasta'), campo('fecha_registro'),
+    # Solo lo que se muestra de la observación: nunca se lee el TextField completo
+    anotado('observacion_corta', Substr('observacion', 1, 51)),
+], calculados=['garantia_vigente'])
+
+EXCEL = Proyeccion('excel', [
+    campo('nombre'), campo('tipo'), campo('numero_serie'), campo('marca'),
+    campo('modelo'), campo('precio'), campo('proveedor'), campo('fecha_compra'),
+    campo('garantia_hasta'), catalogo('area'), catalogo('estado'), campo('observacion'),
+])
+
+PDF = Proyeccion('pdf', [
+    campo('nombre'), campo('tipo'), campo('numero_serie'), campo('marca'),
+    campo('modelo'), campo('precio'), catalogo('area'), catalogo('estado'),
+    campo('garantia_hasta'),
+], calculados=['garantia_vigente'])
+
+# Filas crudas de las exportaciones CSV, NDJSON y Parquet
+VOLCADO = Proyeccion('volcado', [
+    campo('id'), campo('nombre'), campo('tipo'), campo('numero_serie'), campo('marca'),
+    campo('modelo'), campo('precio'), campo('proveedor'), campo('fecha_compra'),
+    campo('garantia_hasta'), campo('fecha_mantenimiento'), campo('vida_util'),
+    catalogo('sede'), catalogo('area'), catalogo('estado'), campo('fecha_registro'),
+    campo('observacion'),
+])
+
+API = Proyeccion('api', [
+    campo('id'), campo('nombre'), campo('tipo'), campo('numero_serie'), campo('marca'),
+    campo('modelo'), campo('precio'), campo('proveedor'), campo('fecha_compra'),
+    campo('garantia_hasta'), campo('fecha_mantenimiento'), campo('vida_util'),
+    unido('sede'), unido('area'), unido('estado'), campo('fecha_registro'),
+    campo('observacion'), campo('actualizado_en'),
+], calculados=['garantia_vigente', 'mantenimiento_proximo', 'mantenimiento_vencido'])
+
+PROYECCIONES = {proyeccion.nombre: proyeccion for proyeccion in (LISTA, EXCEL, PDF, VOLCADO, API)}
@@ -0,0 +1,129 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Equipo, EquipoEliminado, Estado, Area, Sede, PerfilUsuario
+from .versiones import VERSION_CATALOGOS, incrementar_version
+from .contadores import acumular, aplicar, nuevos_deltas, registrar_baja, valores_equipo
+from .permisos import invalidar_permisos
+
+# Bajas pendientes de eliminacion_en_lote() en este hilo
+_lote = threading.local()
+
+
+def _bajas_en_lote():
+    return getattr(_lote, 'bajas', None)
+
+
+@contextmanager
+def eliminacion_en_lote():
+    """
+    Agrupa los efectos de post_delete de equipos dentro del bloque (p. ej.
+    un Equipo.objects.filter(...).delete()): los manejadores acumulan los
+    descuentos de contadores y las marcas del feed de cambios, y al salir
+    se aplican con un UPDATE por catálogo, un INSERT y un cambio de sello.
+    """
+    if _bajas_en_lote() is not None:
+        yield
+        return
+    _lote.bajas = bajas = {'deltas': nuevos_deltas(), 'marcas': []}
+    try:
+        yield
+    finally:
+        _lote.bajas = None
+    aplicar(bajas['deltas'])
+    EquipoEliminado.objects.bulk_create(bajas['marcas'])
+    if bajas['marcas']:
+        incrementar_version()
+        transaction.on_commit(incrementar_version)
+
+
+@receiver(post_save, sender=Equipo)
+@receiver(post_delete, sender=Equipo)
+@receiver(post_save, sender=Estado)
+@receiver(post_delete, sender=Estado)
+@receiver(post_save, sender=Area)
+@receiver(post_delete, sender=Area)
+@receiver(post_save, sender=Sede)
+@receiver(post_delete, sender=Sede)
+def invalidar_inventario(sender, **kwargs):
+    """
+    Cualquier cambio en equipos o catálogos invalida lo cacheado del
+    inventario. El sello cambia en el acto y otra vez al confirmar: lo que
+    otro proceso cachee entre ambos momentos (aún sin ver el cambio) queda
+    con un sello que ya no se usa.
+    """
+    if kwargs['signal'] is post_delete and sender is Equipo and _bajas_en_lote() is not None:
+        return
+    incrementar_version()
+    transaction.on_commit(incrementar_version)
+
+
+@receiver(post_save, sender=Estado)
+@receiver(post_delete, sender=Estado)
+@receiver(post_save, sender=Area)
+@receiver(post_delete, sender=Area)
+@receiver(post_save, sender=Sede)
+@receiver(post_delete, sender=Sede)
+def invalidar_catalogos(sender, **kwargs):
+    """
+    Los catálogos cacheados en cada proceso se recargan al cambiar el sello.
+    Se cambia al confirmar la transacción para que nadie recargue antes de
+    poder ver el cambio.
+    """
+    transaction.on_commit(lambda: incrementar_version(VERSION_CATALOGOS))
+
+
+@receiver(post_delete, sender=Equipo)
+def descontar_equipo(sender, instance, **kwargs):
+    """Resta el equipo eliminado de los contadores de su sede, área y estado"""
+    bajas = _bajas_en_lote()
+    if bajas is not None:
+        acumular(bajas['deltas'], valores_equipo(instance), -1)
+    else:
+        registrar_baja(valores_equipo(instance))
+
+
+@receiver(post_delete, sender=Equipo)
+def registrar_eliminacion(sender, instance, **kwargs):
+    """Deja la marca del equipo eliminado para el feed de cambios"""
+    marca = EquipoEliminado(equipo_id=instance.pk, numero_serie=instance.numero_serie)
+    bajas = _bajas_en_lote()
+    if bajas is not None:
+        bajas['marcas'].append(marca)
+    else:
+        marca.save()
+
+
+@receiver(pre_save, sender=Estado)
+@receiver(pre_save, sender=Area)
+@receiver(pre_save, sender=Sede)
+def recordar_nombre_catalogo(sender, instance, **kwargs):
+    if instance.pk and not instance._state.adding:
+        instance._nombre_anterior = sender.objects.filter(pk=instance.pk).values_list('nombre', flat=True).first()
+
+
+@receiver(post_save, sender=Estado)
+@receiver(post_save, sender=Area)
+@receiver(post_save, sender=Sede)
+def actualizar_equipos_catalogo(sender, instance, created, **kwargs):
+    """
+    Las filas del feed de cambios llevan el nombre de sede, área y estado: al
+    renombrar un catálogo sus equipos cuentan como modificados.
+    """
+    anterior = getattr(instance, '_nombre_anterior', None)
+    if created or anterior is None or anterior == instance.nombre:
+        return
+    Equipo.objects.filter(**{sender._meta.model_name: instance}).update(actualizado_en=timezone.now())
+    instance._nombre_anterior = instance.nombre
+
+
+@receiver(post_save, sender=PerfilUsuario)
+@receiver(post_delete, sender=PerfilUsuario)
+def invalidar_permisos_perfil(sender, instance, **kwargs):
+    """Al cambiar un perfil se descarta su matriz de permisos cacheada"""
+    invalidar_permisos(instance.usuario_id)
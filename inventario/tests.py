@@ -1,3 +1,1186 @@
-from django.test import TestCase
+import csv
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import api, artefactos, cambios, trabajos, views
+from . import cache as cache_compartida
+from .cache import CacheCompartida
+from .catalogos import buscar_en_catalogo, obtener_catalogos
+from .contadores import recalcular
+from .datatables import COLUMNAS_ORDEN
+from .exportacion import COLUMNAS, generar_csv
+from .filtros import aplicar_busqueda_global
+from .models import Area, Equipo, EquipoEliminado, Estado, PerfilUsuario, SecuenciaSerie, Sede, TrabajoFondo, TrigramaSerie
+from .pdf import escribir_pdf_equipos
+from .permisos import cargar_permisos, obtener_permisos
+from .utils import asignar_numeros_serie, escribir_excel_equipos, procesar_importacion_excel
+from .versiones import VERSION_CATALOGOS, incrementar_version
+
+
+class InventarioTestCase(TestCase):
+    """
+    Base de las pruebas: catálogos, algunos equipos y un cliente con sesión
+    de administrador.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # Caché propia en un directorio temporal: cache.clear() no debe vaciar
+        # el archivo que comparten los procesos del servidor en este nodo
+        directorio = tempfile.mkdtemp(prefix='inventario_pruebas_')
+        cls.addClassCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ajustes = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'inventario.cache.CacheCompartida',
+                'LOCATION': os.path.join(directorio, 'cache.sqlite3'),
+            }
+        })
+        ajustes.enable()
+        cls.addClassCleanup(ajustes.disable)
+        super().setUpClass()
+
+    def setUp(self):
+        # La caché (sellos de versión, permisos) no se deshace con el
+        # rollback de cada prueba
+        cache.clear()
+        self.sede = Sede.objects.create(nombre='Lima')
+        self.otra_sede = Sede.objects.create(nombre='Cusco')
+        self.area = Area.objects.create(nombre='Sistemas')
+        self.estado = Estado.objects.create(nombre='Operativo')
+        self.otro_estado = Estado.objects.create(nombre='Malo')
+        # TestCase no confirma la transacción: el sello de catálogos no
+        # cambia solo y el caché del proceso se recarga a mano
+        obtener_catalogos(forzar=True)
+        self.usuario = self.crear_usuario(
+            'admin', rol='admin', puede_eliminar=True, puede_importar=True
+        )
+        self.client.force_login(self.usuario)
+
+    def crear_usuario(self, nombre, **permisos):
+        usuario = User.objects.create_user(nombre, password='clave')
+        PerfilUsuario.objects.update_or_create(usuario=usuario, defaults=permisos)
+        return usuario
+
+    def crear_equipo(self, **campos):
+        datos = {
+            'nombre': 'Equipo', 'tipo': 'Motor', 'sede': self.sede,
+            'area': self.area, 'estado': self.estado, 'precio': '100.00',
+        }
+        datos.update(campos)
+        return Equipo.objects.create(**datos)
+
+    def datos_equipo(self, **campos):
+        """Campos de un equipo como los envía el navegador (catálogos por id)"""
+        datos = {
+            'nombre': 'Nuevo', 'tipo': 'Motor', 'sede': self.sede.id,
+            'area': self.area.id, 'estado': self.estado.id, 'precio': '50.00',
+        }
+        datos.update(campos)
+        return datos
+
+    def crear_equipos_variados(self):
+        """Equipos con valores repetidos en cada columna para probar los desempates por id"""
+        area = Area.objects.create(nombre='Ventas')
+        obtener_catalogos(forzar=True)
+        for i in range(23):
+            self.crear_equipo(
+                nombre=f'Equipo {i % 4}', tipo=['Motor', 'Bomba'][i % 2], marca=['', 'ACME', 'Zeta'][i % 3],
+                precio=[None, '10.00', '99.90'][i % 3], sede=[self.sede, self.otra_sede, None][i % 3],
+                area=[self.area, area][i % 2], estado=[self.estado, self.otro_estado][i % 3 == 0],
+                garantia_hasta=[None, date(2030, 1, 1)][i % 2],
+            )
+
+    def usar_directorios_temporales(self):
+        """Exportaciones cacheadas y archivos de trabajos en un directorio propio, sin pool de hilos"""
+        directorio = tempfile.mkdtemp(prefix='inventario_pruebas_')
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ajustes = override_settings(
+            EXPORTACIONES_CACHE_DIR=os.path.join(directorio, 'exportaciones'),
+            TRABAJOS_DIR=os.path.join(directorio, 'trabajos'), TRABAJOS_HILOS=0,
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def archivo_excel(self, filas, encabezados=('Nombre', 'Tipo', 'Sede', 'Área', 'Estado', 'Precio')):
+        """Libro de importación en memoria"""
+        libro = openpyxl.Workbook()
+        hoja = libro.active
+        hoja.append(list(encabezados))
+        for fila in filas:
+            hoja.append(fila)
+        contenido = io.BytesIO()
+        libro.save(contenido)
+        contenido.seek(0)
+        return contenido
+
+    def contadores(self):
+        return [
+            (modelo.__name__, fila.pk, fila.total_equipos, fila.valor_total)
+            for modelo in (Sede, Area, Estado)
+            for fila in modelo.objects.order_by('pk')
+        ]
+
+    def assertContadoresExactos(self):
+        """Los contadores incrementales coinciden con un recálculo completo"""
+        incrementales = self.contadores()
+        recalcular()
+        self.assertEqual(incrementales, self.contadores())
+
+
+class OperacionesEnLoteTests(InventarioTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.equipos = [self.crear_equipo(nombre=f'Equipo {i}') for i in range(4)]
+
+    def enviar(self, cuerpo, cliente=None):
+        return (cliente or self.client).post(
+            reverse('operar_equipos_lote'), json.dumps(cuerpo),
+            content_type='application/json', HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+
+    def test_lote_valido_se_aplica_completo(self):
+        primero, segundo, tercero, _ = self.equipos
+        respuesta = self.enviar({
+            'crear': [self.datos_equipo(nombre=f'Alta {i}') for i in range(3)],
+            'editar': [self.datos_equipo(id=primero.id, nombre='Editado', estado=self.otro_estado.id)],
+            'eliminar': [segundo.id, tercero.id],
+        })
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.json()['resultados']), 6)
+        self.assertEqual(Equipo.objects.count(), 5)
+        primero.refresh_from_db()
+        self.assertEqual((primero.nombre, primero.estado_id), ('Editado', self.otro_estado.id))
+        self.assertFalse(Equipo.objects.filter(id__in=[segundo.id, tercero.id]).exists())
+        self.assertFalse(TrigramaSerie.objects.filter(equipo_id__in=[segundo.id, tercero.id]).exists())
+        self.assertEqual(
+            set(EquipoEliminado.objects.values_list('equipo_id', flat=True)), {segundo.id, tercero.id}
+        )
+        self.assertContadoresExactos()
+
+    def test_lote_con_errores_no_aplica_nada(self):
+        antes = self.contadores()
+        respuesta = self.enviar({
+            'crear': [self.datos_equipo(), self.datos_equipo(estado=9999)],
+            'editar': [self.datos_equipo(id=self.equipos[0].id, nombre='No debe guardarse')],
+            'eliminar': [self.equipos[1].id, 999999],
+        })
+
+        self.assertEqual(respuesta.status_code, 400)
+        errores = {(error['operacion'], error['indice']) for error in respuesta.json()['errores']}
+        self.assertEqual(errores, {('crear', 1), ('eliminar', 1)})
+        self.assertEqual(Equipo.objects.count(), 4)
+        self.assertEqual(Equipo.objects.get(id=self.equipos[0].id).nombre, 'Equipo 0')
+        self.assertFalse(EquipoEliminado.objects.exists())
+        self.assertEqual(self.contadores(), antes)
+
+    def test_fallo_al_aplicar_revierte_el_lote(self):
+        antes = self.contadores()
+        with mock.patch('inventario.lotes.indexar_series', side_effect=IntegrityError('serie tomada')):
+            respuesta = self.enviar({
+                'crear': [self.datos_equipo()],
+                'editar': [self.datos_equipo(id=self.equipos[0].id, nombre='Revertido')],
+                'eliminar': [self.equipos[1].id],
+            })
+
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(Equipo.objects.count(), 4)
+        self.assertEqual(Equipo.objects.get(id=self.equipos[0].id).nombre, 'Equipo 0')
+        self.assertFalse(EquipoEliminado.objects.exists())
+        self.assertEqual(self.contadores(), antes)
+
+    def test_permisos_iguales_a_las_vistas_de_un_equipo(self):
+        cliente = self.client_class()
+        cliente.force_login(self.crear_usuario('operador', puede_eliminar=False, puede_crear=True))
+        equipo = self.equipos[0]
+
+        individual = cliente.post(
+            reverse('eliminar_equipo', args=[equipo.id]), HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        en_lote = self.enviar({'crear': [self.datos_equipo()], 'eliminar': [equipo.id]}, cliente)
+        self.assertEqual((individual.status_code, en_lote.status_code), (403, 403))
+        self.assertEqual(individual.json()['error'], en_lote.json()['error'])
+        self.assertEqual(Equipo.objects.count(), 4)
+
+        self.assertEqual(self.enviar({'crear': [self.datos_equipo()]}, cliente).status_code, 200)
+
+    def test_series_editadas_sincronizan_una_vez_por_prefijo(self):
+        SecuenciaSerie.reservar('ABC', 1)
+        editar = [
+            self.datos_equipo(id=equipo.id, numero_serie=f'ABC-{10 + i:05d}')
+            for i, equipo in enumerate(self.equipos)
+        ]
+        with CaptureQueriesContext(connection) as capturadas:
+            respuesta = self.enviar({'editar': editar})
+
+        self.assertEqual(respuesta.status_code, 200)
+        actualizaciones = [
+            consulta for consulta in capturadas.captured_queries
+            if consulta['sql'].startswith('UPDATE "inventario_secuenciaserie"')
+        ]
+        self.assertEqual(len(actualizaciones), 1)
+        self.assertEqual(SecuenciaSerie.objects.get(prefijo='ABC').ultimo, 13)
+
+
+class SecuenciaSerieTests(InventarioTestCase):
+
+    def test_reservar_bloques_consecutivos(self):
+        self.assertEqual(SecuenciaSerie.reservar('ABC', 5), 1)
+        self.assertEqual(SecuenciaSerie.reservar('ABC', 3), 6)
+        self.assertEqual(SecuenciaSerie.reservar('ABC'), 9)
+        self.assertEqual(SecuenciaSerie.objects.get(prefijo='ABC').ultimo, 9)
+
+    def test_primera_reserva_parte_del_mayor_existente(self):
+        self.crear_equipo(tipo='Bomba', numero_serie='BOM-00040')
+        self.assertEqual(SecuenciaSerie.reservar('BOM', 2), 41)
+
+    def test_series_generadas_no_se_repiten(self):
+        self.crear_equipo(numero_serie='MOT-00003')
+        individuales = [self.crear_equipo().numero_serie for _ in range(3)]
+        respuesta = self.client.post(
+            reverse('operar_equipos_lote'),
+            json.dumps({'crear': [self.datos_equipo() for _ in range(4)]}),
+            content_type='application/json',
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.crear_equipo(numero_serie='MOT-00020')
+        individuales.append(self.crear_equipo().numero_serie)
+
+        series = list(Equipo.objects.values_list('numero_serie', flat=True))
+        self.assertEqual(len(series), len(set(series)))
+        self.assertEqual(individuales[:3], ['MOT-00004', 'MOT-00005', 'MOT-00006'])
+        self.assertEqual(individuales[-1], 'MOT-00021')
+
+
+class DashboardCacheTests(InventarioTestCase):
+
+    def contexto(self):
+        return self.client.get(reverse('dashboard')).context
+
+    def totales(self):
+        contexto = self.contexto()
+        por_estado = {estado['nombre']: estado['total'] for estado in contexto['total_por_estado']}
+        return contexto['total_equipos'], por_estado['Malo']
+
+    def test_se_calcula_una_vez_por_version(self):
+        with mock.patch('inventario.views._contexto_dashboard', wraps=views._contexto_dashboard) as calcular:
+            self.contexto()
+            self.contexto()
+            self.assertEqual(calcular.call_count, 1)
+            self.crear_equipo()
+            self.contexto()
+            self.assertEqual(calcular.call_count, 2)
+
+    def test_altas_ediciones_bajas_e_importaciones_lo_invalidan(self):
+        self.assertEqual(self.totales(), (0, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('crear_equipo'), json.dumps(self.datos_equipo()), content_type='application/json')
+        self.assertEqual(self.totales(), (1, 0))
+
+        equipo = Equipo.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.generic(
+                'PATCH', reverse('editar_equipo', args=[equipo.id]),
+                json.dumps({'estado': self.otro_estado.id}), content_type='application/json',
+            )
+        self.assertEqual(self.totales(), (1, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('eliminar_equipo', args=[equipo.id]))
+        self.assertEqual(self.totales(), (0, 0))
+
+        filas = [[f'Importado {i}', 'Bomba', 'Lima', 'Sistemas', 'Malo', 10] for i in range(3)]
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post(reverse('importar_equipos_excel'), {
+                'archivo': SimpleUploadedFile('equipos.xlsx', self.archivo_excel(filas).getvalue()),
+            })
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(self.totales(), (3, 3))
+
+
+class PermisosCacheTests(InventarioTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.operador = self.crear_usuario('operador', puede_eliminar=False)
+        self.cliente = self.client_class()
+        self.cliente.force_login(self.operador)
+
+    def consultas_al_perfil(self, capturadas):
+        return [c for c in capturadas.captured_queries if 'inventario_perfilusuario' in c['sql']]
+
+    def test_cambiar_o_borrar_el_perfil_invalida_la_cache(self):
+        equipo = self.crear_equipo()
+        url = reverse('eliminar_equipo', args=[equipo.id])
+        ajax = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+        self.assertEqual(self.cliente.post(url, **ajax).status_code, 403)
+
+        perfil = self.operador.perfil
+        perfil.puede_eliminar = True
+        perfil.save()
+        self.assertEqual(self.cliente.post(url, **ajax).status_code, 200)
+
+        perfil.delete()
+        # Sin perfil se crea uno con los valores por defecto
+        self.assertFalse(cargar_permisos(self.operador)['puede_eliminar'])
+
+    def test_una_consulta_por_peticion_y_ninguna_con_cache(self):
+        request = RequestFactory().get('/')
+        request.user = self.operador
+        with self.assertNumQueries(1):
+            for _ in range(5):
+                obtener_permisos(request)
+
+        # Otra petición: la matriz sale de la caché
+        request = RequestFactory().get('/')
+        request.user = self.operador
+        with self.assertNumQueries(0):
+            obtener_permisos(request)
+
+    def test_una_pagina_completa_no_consulta_el_perfil(self):
+        # Decorador, vista, context processor y plantilla usan la misma matriz
+        self.cliente.get(reverse('equipos_lista'))
+        with CaptureQueriesContext(connection) as capturadas:
+            self.assertEqual(self.cliente.get(reverse('equipos_lista')).status_code, 200)
+        self.assertEqual(self.consultas_al_perfil(capturadas), [])
+
+
+class CatalogosCacheTests(InventarioTestCase):
+
+    def nombres_de_sedes(self):
+        return {sede.nombre for sede in obtener_catalogos()['sede']}
+
+    def test_se_recarga_cuando_cambia_el_sello(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.nombres_de_sedes(), {'Lima', 'Cusco'})
+
+        # Sin confirmar la transacción el sello no cambia: sigue el caché
+        Sede.objects.create(nombre='Arequipa')
+        self.assertNotIn('Arequipa', self.nombres_de_sedes())
+
+        incrementar_version(VERSION_CATALOGOS)
+        self.assertIn('Arequipa', self.nombres_de_sedes())
+
+    def test_guardar_un_catalogo_cambia_el_sello(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            area = Area.objects.create(nombre='Ventas')
+        self.assertIn(area.pk, obtener_catalogos()['area'].por_id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            area.delete()
+        self.assertNotIn(area.pk, obtener_catalogos()['area'].por_id)
+
+    def test_buscar_un_id_desconocido_recarga(self):
+        sede = Sede.objects.create(nombre='Arequipa')
+        self.assertNotIn(sede.pk, obtener_catalogos()['sede'].por_id)
+
+        self.assertEqual(buscar_en_catalogo('sede', str(sede.pk)).nombre, 'Arequipa')
+        self.assertIn(sede.pk, obtener_catalogos()['sede'].por_id)
+        self.assertIsNone(buscar_en_catalogo('sede', 999999))
+        self.assertIsNone(buscar_en_catalogo('sede', 'Lima'))
+
+
+class ContadoresTests(InventarioTestCase):
+
+    def test_alta_edicion_y_baja_desde_las_vistas(self):
+        respuesta = self.client.post(
+            reverse('crear_equipo'), json.dumps(self.datos_equipo(precio='75.50')), content_type='application/json'
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContadoresExactos()
+
+        equipo = Equipo.objects.get()
+        respuesta = self.client.generic(
+            'PATCH', reverse('editar_equipo', args=[equipo.id]),
+            json.dumps({'sede': self.otra_sede.id, 'estado': self.otro_estado.id, 'precio': '10.00'}),
+            content_type='application/json',
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContadoresExactos()
+
+        respuesta = self.client.post(reverse('eliminar_equipo', args=[equipo.id]))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertFalse(Equipo.objects.exists())
+        self.assertContadoresExactos()
+
+    def test_modelo_directo(self):
+        equipo = self.crear_equipo(precio='20.00')
+        equipo.area = Area.objects.create(nombre='Ventas')
+        equipo.precio = None
+        equipo.save()
+        self.crear_equipo(sede=None)
+        self.assertContadoresExactos()
+        equipo.delete()
+        self.assertContadoresExactos()
+
+
+class EditarEquipoTests(InventarioTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.equipo = self.crear_equipo(nombre='Original', marca='ACME', observacion='Nota')
+        self.url = reverse('editar_equipo', args=[self.equipo.id])
+
+    def patch(self, datos):
+        return self.client.generic('PATCH', self.url, json.dumps(datos), content_type='application/json')
+
+    def escrituras(self, capturadas):
+        return [
+            consulta['sql'] for consulta in capturadas.captured_queries
+            if consulta['sql'].startswith(('UPDATE', 'INSERT', 'DELETE'))
+        ]
+
+    def test_patch_cambia_solo_lo_enviado(self):
+        with CaptureQueriesContext(connection) as capturadas:
+            respuesta = self.patch({'nombre': 'Nuevo nombre'})
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['campos_actualizados'], ['nombre'])
+        escrituras = self.escrituras(capturadas)
+        self.assertEqual(len(escrituras), 1)
+        self.assertNotIn('"marca"', escrituras[0])
+        self.equipo.refresh_from_db()
+        self.assertEqual(
+            (self.equipo.nombre, self.equipo.marca, self.equipo.observacion, self.equipo.sede_id),
+            ('Nuevo nombre', 'ACME', 'Nota', self.sede.id),
+        )
+
+    def test_edicion_sin_cambios_no_escribe(self):
+        actualizado_en = self.equipo.actualizado_en
+        with CaptureQueriesContext(connection) as capturadas:
+            respuesta = self.patch({'nombre': 'Original', 'marca': 'ACME'})
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['campos_actualizados'], [])
+        self.assertEqual(self.escrituras(capturadas), [])
+        self.equipo.refresh_from_db()
+        self.assertEqual(self.equipo.actualizado_en, actualizado_en)
+
+    def test_fallo_al_guardar_no_adelanta_la_secuencia(self):
+        SecuenciaSerie.reservar('ABC', 1)
+        with mock.patch.object(Equipo, 'save', side_effect=IntegrityError('fallo simulado')):
+            respuesta = self.patch({'numero_serie': 'ABC-00050'})
+
+        self.assertEqual(respuesta.status_code, 500)
+        self.assertEqual(SecuenciaSerie.objects.get(prefijo='ABC').ultimo, 1)
+
+    def test_post_vacia_los_opcionales_que_faltan(self):
+        respuesta = self.client.post(
+            self.url, json.dumps(self.datos_equipo(nombre='Completo', precio='')), content_type='application/json'
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.equipo.refresh_from_db()
+        self.assertEqual((self.equipo.nombre, self.equipo.marca, self.equipo.precio), ('Completo', '', None))
+
+
+class ListaDataTablesTests(InventarioTestCase):
+    """Las páginas con cursor deben coincidir con las de OFFSET en cada orden"""
+
+    def setUp(self):
+        super().setUp()
+        self.crear_equipos_variados()
+
+    def pagina(self, columna, direccion, inicio, cursor=''):
+        return self.client.get(reverse('equipos_datos'), {
+            'draw': 1, 'start': inicio, 'length': 5, 'cursor': cursor,
+            'order[0][column]': columna, 'order[0][dir]': direccion,
+        }).json()
+
+    def recorrer(self, columna, direccion, con_cursor):
+        ids, inicio, cursor = [], 0, ''
+        while True:
+            respuesta = self.pagina(columna, direccion, inicio, cursor if con_cursor else '')
+            if not respuesta['data']:
+                return ids
+            ids += [fila['id'] for fila in respuesta['data']]
+            inicio += len(respuesta['data'])
+            cursor = respuesta['cursor']
+
+    def test_cursor_coincide_con_offset(self):
+        for columna in COLUMNAS_ORDEN:
+            for direccion in ('asc', 'desc'):
+                with self.subTest(columna=COLUMNAS_ORDEN[columna], direccion=direccion):
+                    con_offset = self.recorrer(columna, direccion, con_cursor=False)
+                    self.assertEqual(self.recorrer(columna, direccion, con_cursor=True), con_offset)
+                    self.assertEqual(sorted(con_offset), sorted(Equipo.objects.values_list('id', flat=True)))
+
+    def test_nombre_con_comillas_se_escapa_en_el_navegador(self):
+        nombre = 'x" onmouseover="alert(1)'
+        self.crear_equipo(nombre=nombre, numero_serie="MOT-'1'")
+        fila = self.pagina(0, 'desc', 0)['data'][0]
+        # El JSON lleva el texto tal cual; lo escapa escaparHtml, que debe cubrir comillas
+        self.assertEqual((fila['nombre'], fila['numero_serie']), (nombre, "MOT-'1'"))
+        respuesta = self.client.get(reverse('equipos_lista'))
+        self.assertContains(respuesta, """'"': '&quot;'""")
+        self.assertContains(respuesta, """"'": '&#39;'""")
+        self.assertNotContains(respuesta, nombre)
+
+
+@override_settings(CAMBIOS_MARGEN_SEGUNDOS=0)
+class FeedDeCambiosTests(InventarioTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.equipos = [self.crear_equipo(nombre=f'Equipo {i}') for i in range(5)]
+        self.url = reverse('cambios_equipos')
+
+    def leer(self, cursor='', limite=100):
+        respuesta = self.client.get(self.url, {'desde': cursor, 'limite': limite})
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def sincronizar(self, cursor='', limite=100):
+        equipos, eliminados = [], []
+        while True:
+            respuesta = self.leer(cursor, limite)
+            equipos += [equipo['id'] for equipo in respuesta['equipos']]
+            eliminados += [baja['id'] for baja in respuesta['eliminados']]
+            cursor = respuesta['cursor']
+            if not respuesta['hay_mas']:
+                return equipos, eliminados, cursor
+
+    def test_carga_inicial_por_paginas(self):
+        equipos, eliminados, _ = self.sincronizar(limite=2)
+        self.assertEqual(equipos, [equipo.id for equipo in self.equipos])
+        self.assertEqual(eliminados, [])
+
+    def test_cambios_y_marcas_de_eliminacion(self):
+        _, _, cursor = self.sincronizar()
+        editado, eliminado = self.equipos[0], self.equipos[1]
+        editado.nombre = 'Editado'
+        editado.save()
+        id_eliminado = eliminado.id
+        eliminado.delete()
+
+        equipos, eliminados, cursor = self.sincronizar(cursor)
+        self.assertEqual(equipos, [editado.id])
+        self.assertEqual(eliminados, [id_eliminado])
+        # Sin cambios nuevos, el cursor no devuelve nada
+        self.assertEqual(self.sincronizar(cursor)[:2], ([], []))
+
+    def test_cursor_vencido_pide_resincronizar(self):
+        viejo = timezone.now() - timedelta(days=400)
+        cursor = cambios.codificar_cursor({'e': (viejo, 0), 'b': (viejo, 0)})
+        respuesta = self.leer(cursor)
+        self.assertTrue(respuesta['resincronizar'])
+        self.assertEqual(respuesta['equipos'], [])
+
+    def test_purga_de_marcas_viejas(self):
+        self.equipos[0].delete()
+        EquipoEliminado.objects.update(eliminado_en=timezone.now() - timedelta(days=400))
+        self.assertEqual(cambios.purgar_eliminados(), 1)
+        self.assertEqual(self.client.get(self.url, {'desde': 'basura'}).status_code, 400)
+
+
+class ApiEquiposTests(InventarioTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.crear_equipos_variados()
+
+    def test_paginas_con_cursor_en_cada_orden(self):
+        # Varios equipos con el mismo actualizado_en
+        Equipo.objects.filter(id__in=Equipo.objects.order_by('id').values('id')[:10]).update(
+            actualizado_en=timezone.now()
+        )
+        for orden in api.ORDENES:
+            with self.subTest(orden=orden):
+                ids, cursor = [], ''
+                while True:
+                    respuesta = self.client.get(
+                        reverse('api_equipos'), {'orden': orden, 'limite': 4, 'fields': 'id', 'cursor': cursor}
+                    ).json()
+                    ids += [equipo['id'] for equipo in respuesta['equipos']]
+                    cursor = respuesta['cursor']
+                    if not respuesta['hay_mas']:
+                        break
+                esperados = list(Equipo.objects.order_by(orden, 'id').values_list('id', flat=True))
+                self.assertEqual(ids, esperados)
+
+    def test_parametros_invalidos(self):
+        url = reverse('api_equipos')
+        cursor = self.client.get(url, {'limite': 2}).json()['cursor']
+        for parametros in ({'fields': 'id,inexistente'}, {'orden': 'precio'}, {'cursor': 'basura'},
+                           {'cursor': cursor, 'orden': 'numero_serie'}, {'limite': 'muchos'}):
+            with self.subTest(parametros=parametros):
+                self.assertEqual(self.client.get(url, parametros).status_code, 400)
+
+
+class ImportacionExcelTests(InventarioTestCase):
+
+    def test_importa_por_lotes_y_crea_catalogos(self):
+        filas = [[f'Importado {i}', 'Bomba', 'Arequipa', 'Sistemas', 'Operativo', 10 * i] for i in range(5)]
+        creados, errores = procesar_importacion_excel(self.archivo_excel(filas), tamano_lote=2)
+
+        self.assertEqual((creados, errores), (5, []))
+        self.assertEqual(Equipo.objects.filter(sede__nombre='Arequipa').count(), 5)
+        self.assertContadoresExactos()
+
+    def test_error_al_preparar_un_lote_conserva_los_guardados(self):
+        filas = [[f'Importado {i}', 'Bomba', 'Lima', 'Sistemas', 'Operativo', 10] for i in range(5)]
+        llamadas = []
+
+        def fallar_en_el_segundo(lote):
+            llamadas.append(len(lote))
+            if len(llamadas) == 2:
+                raise KeyError('sede')
+            asignar_numeros_serie(lote)
+
+        with mock.patch('inventario.utils.asignar_numeros_serie', side_effect=fallar_en_el_segundo):
+            creados, errores = procesar_importacion_excel(self.archivo_excel(filas), tamano_lote=2)
+
+        # Filas 2-3 y 6 se guardan; el bloque de las filas 4-5 se reporta entero
+        self.assertEqual(creados, 3)
+        self.assertEqual(Equipo.objects.count(), 3)
+        self.assertEqual(len(errores), 1)
+        self.assertTrue(errores[0].startswith('Filas 4 a 5:'))
+        self.assertContadoresExactos()
+
+    def test_series_explicitas_sincronizan_una_vez_por_prefijo(self):
+        SecuenciaSerie.reservar('ABC', 5)
+        SecuenciaSerie.reservar('XYZ', 5)
+        filas = [
+            [f'Importado {i}', 'Motor', f'{prefijo}-{i:05d}', 'Lima', 'Sistemas', 'Operativo']
+            for prefijo in ('ABC', 'XYZ') for i in range(1, 21)
+        ]
+        with CaptureQueriesContext(connection) as capturadas:
+            creados, errores = procesar_importacion_excel(
+                self.archivo_excel(filas, ('Nombre', 'Tipo', 'N° Serie', 'Sede', 'Área', 'Estado'))
+            )
+
+        self.assertEqual((creados, errores), (40, []))
+        actualizaciones = [
+            consulta for consulta in capturadas.captured_queries
+            if consulta['sql'].startswith('UPDATE "inventario_secuenciaserie"')
+        ]
+        self.assertEqual(len(actualizaciones), 2)
+        self.assertEqual(
+            dict(SecuenciaSerie.objects.values_list('prefijo', 'ultimo')), {'ABC': 20, 'XYZ': 20}
+        )
+
+
+class BusquedaGlobalTests(InventarioTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.motor = self.crear_equipo(nombre='Motor eléctrico', marca='Siemens', numero_serie='MOT-00042')
+        self.bomba = self.crear_equipo(nombre='Bomba de agua', tipo='Bomba', marca='Pedrollo')
+
+    def buscar(self, texto):
+        return set(aplicar_busqueda_global(Equipo.objects.all(), texto).values_list('id', flat=True))
+
+    def test_palabras_y_prefijos_usan_el_indice(self):
+        self.assertEqual(self.buscar('motor'), {self.motor.id})
+        self.assertEqual(self.buscar('sieme'), {self.motor.id})
+        self.assertEqual(self.buscar('bomba agua'), {self.bomba.id})
+
+    def test_solo_prefijos_sin_depender_de_otros_equipos(self):
+        self.assertEqual(self.buscar('otor'), set())
+        # Otro equipo que sí empieza por "otor" no cambia lo que se encuentra de los demás
+        otro = self.crear_equipo(nombre='Otorgado en comodato')
+        self.assertEqual(self.buscar('otor'), {otro.id})
+        self.assertEqual(self.buscar('drol'), set())
+
+    def test_numero_de_serie_y_tipo(self):
+        self.assertEqual(self.buscar('00042'), {self.motor.id})
+        self.assertEqual(self.buscar('Bomb'), {self.bomba.id})
+
+    def test_no_recorre_la_tabla_con_like(self):
+        with CaptureQueriesContext(connection) as capturadas:
+            list(aplicar_busqueda_global(Equipo.objects.all(), 'bomba'))
+        sql = ' '.join(consulta['sql'] for consulta in capturadas.captured_queries)
+        # Solo el número de serie usa LIKE, y sobre los candidatos de los trigramas
+        for campo in ('nombre', 'tipo', 'marca'):
+            self.assertNotIn(f'"inventario_equipo"."{campo}" LIKE', sql)
+
+
+class ObtenerEquipoCondicionalTests(InventarioTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.equipo = self.crear_equipo()
+        self.url = reverse('obtener_equipo', args=[self.equipo.id])
+
+    def test_304_con_etag_vigente_sin_cargar_la_fila(self):
+        etag = self.client.get(self.url)['ETag']
+        # Sesión, usuario y solo actualizado_en del equipo
+        with self.assertNumQueries(3):
+            respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta['ETag'], etag)
+        self.assertEqual(respuesta.content, b'')
+
+    def test_etag_cambia_al_editar(self):
+        etag = self.client.get(self.url)['ETag']
+        self.equipo.nombre = 'Renombrado'
+        self.equipo.save()
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+        self.assertEqual(respuesta.json()['equipo']['nombre'], 'Renombrado')
+
+    def test_equipo_eliminado_responde_404(self):
+        etag = self.client.get(self.url)['ETag']
+        self.equipo.delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+def _abrir_cache(ruta, max_entradas=10000):
+    return CacheCompartida(ruta, {'TIMEOUT': None, 'OPTIONS': {'MAX_ENTRIES': max_entradas, 'CULL_FREQUENCY': 4}})
+
+
+def _incrementar(ruta, numero, operaciones, barrera):
+    cache = _abrir_cache(ruta)
+    barrera.wait()
+    for _ in range(operaciones):
+        cache.incr('contador')
+    for i in range(operaciones):
+        cache.add(f'unico:{i}', numero)
+
+
+def _escribir_efimera(ruta, segundos):
+    _abrir_cache(ruta).set('efimera', 'valor', timeout=segundos)
+
+
+def _llenar(ruta, max_entradas, numero, cantidad):
+    cache = _abrir_cache(ruta, max_entradas)
+    for i in range(cantidad):
+        cache.set(f'proceso:{numero}:{i}', i)
+
+
+class CatalogosDatosTests(InventarioTestCase):
+
+    def test_la_lista_revalida_sus_catalogos_con_el_endpoint(self):
+        pagina = self.client.get(reverse('equipos_lista'))
+        url = reverse('catalogos_datos')
+        self.assertContains(pagina, url)
+
+        respuesta = self.client.get(url)
+        datos = respuesta.json()
+        self.assertEqual(pagina.context['version_catalogos'], datos['version'])
+        self.assertEqual({sede['nombre'] for sede in datos['sede']}, {'Cusco', 'Lima'})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 304)
+
+        # Una sede nueva (p. ej. creada por una importación) cambia el sello y el ETag
+        Sede.objects.create(nombre='Arequipa')
+        incrementar_version(VERSION_CATALOGOS)
+        obtener_catalogos(forzar=True)
+        nueva = self.client.get(url, HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(nueva.status_code, 200)
+        self.assertNotEqual(nueva.json()['version'], datos['version'])
+        self.assertIn('Arequipa', [sede['nombre'] for sede in nueva.json()['sede']])
+
+
+class ExportacionesTests(InventarioTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.usar_directorios_temporales()
+        self.crear_equipo(
+            nombre='Compresor', tipo='Compresora', numero_serie='COM-00001', precio='1234.50',
+            fecha_compra=date(2024, 3, 1), garantia_hasta=date(2030, 1, 1),
+        )
+        self.crear_equipo(nombre='Motor A', numero_serie='MOT-00001', precio=None, sede=self.otra_sede,
+                          estado=self.otro_estado)
+        self.crear_equipo(nombre='Motor B', numero_serie='MOT-00002', sede=None)
+        self.crear_equipo(nombre='Bomba', tipo='Bomba', numero_serie='BOM-00001', estado=self.otro_estado,
+                          observacion='Con coma, y "comillas"')
+        self.crear_equipo(nombre='Generador', tipo='Generador', numero_serie='GEN-00001', sede=self.otra_sede)
+        self.series = sorted(Equipo.objects.values_list('numero_serie', flat=True))
+
+    def filas_excel(self, contenido):
+        hoja = openpyxl.load_workbook(io.BytesIO(contenido))['Inventario de Activos']
+        filas = list(hoja.iter_rows(min_row=4, values_only=True))
+        self.assertEqual(filas[0][:3], ('Nombre', 'Tipo', 'N° Serie'))
+        return filas[1:]
+
+    def test_excel_en_modo_solo_escritura(self):
+        destino = io.BytesIO()
+        avances = []
+        with mock.patch('inventario.utils.openpyxl.Workbook', wraps=openpyxl.Workbook) as libro:
+            escribir_excel_equipos(
+                Equipo.objects.order_by('numero_serie'), destino, tamano_lote=2,
+                progreso=lambda hechas, total: avances.append((hechas, total)),
+            )
+        libro.assert_called_once_with(write_only=True)
+
+        filas = self.filas_excel(destino.getvalue())
+        self.assertEqual([fila[2] for fila in filas], self.series)
+        compresor = filas[self.series.index('COM-00001')]
+        self.assertEqual(
+            (compresor[0], compresor[5], compresor[7], compresor[8], compresor[9], compresor[10]),
+            ('Compresor', '$1,234.50', '01/03/2024', '01/01/2030', 'Sistemas', 'Operativo'),
+        )
+        self.assertEqual(avances, [(2, 5), (4, 5)])
+        self.assertIn('Estadísticas', openpyxl.load_workbook(destino).sheetnames)
+
+    def contenido_en_flujo(self, nombre_url, **parametros):
+        respuesta = self.client.get(reverse(nombre_url), parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.streaming)
+        return b''.join(respuesta.streaming_content).decode('utf-8')
+
+    def test_csv_en_flujo(self):
+        filas = list(csv.reader(io.StringIO(self.contenido_en_flujo('exportar_equipos_csv'))))
+        self.assertEqual(filas[0], list(COLUMNAS))
+        por_serie = {fila[COLUMNAS.index('numero_serie')]: dict(zip(COLUMNAS, fila)) for fila in filas[1:]}
+        self.assertEqual(sorted(por_serie), self.series)
+        self.assertEqual(por_serie['BOM-00001']['observacion'], 'Con coma, y "comillas"')
+        self.assertEqual(por_serie['MOT-00002']['sede'], '')
+        self.assertEqual(por_serie['COM-00001']['precio'], '1234.50')
+
+        # Encabezado y luego un bloque por lote
+        self.assertEqual(len(list(generar_csv(Equipo.objects.all(), tamano_lote=2))), 4)
+
+    def test_ndjson_en_flujo(self):
+        lineas = self.contenido_en_flujo('exportar_equipos_ndjson', estado='Malo').splitlines()
+        objetos = [json.loads(linea) for linea in lineas]
+        self.assertEqual([list(objeto) for objeto in objetos], [list(COLUMNAS)] * 2)
+        self.assertEqual(
+            {(objeto['numero_serie'], objeto['sede'], objeto['precio']) for objeto in objetos},
+            {('MOT-00001', 'Cusco', None), ('BOM-00001', 'Lima', '100.00')},
+        )
+
+    def series_excel(self, **filtros):
+        respuesta = self.client.get(reverse('exportar_equipos_excel'), filtros)
+        self.assertEqual(respuesta.status_code, 200)
+        return [fila[2] for fila in self.filas_excel(b''.join(respuesta.streaming_content))]
+
+    def test_los_filtros_de_la_lista_llegan_a_excel_y_pdf(self):
+        self.assertEqual(self.series_excel(), self.series)
+        self.assertEqual(self.series_excel(sede='Lima', estado='Malo'), ['BOM-00001'])
+        self.assertEqual(self.series_excel(busqueda='motor'), ['MOT-00001', 'MOT-00002'])
+        self.assertEqual(self.series_excel(garantia='vigente'), ['COM-00001'])
+        self.assertEqual(self.series_excel(codigo='00002'), ['MOT-00002'])
+
+        # El filtro va en el WHERE de la consulta, no se aplica en Python
+        with CaptureQueriesContext(connection) as capturadas:
+            self.series_excel(tipo='Generador')
+        self.assertTrue(any(
+            '"inventario_equipo"."tipo" = \'Generador\'' in consulta['sql']
+            for consulta in capturadas.captured_queries
+        ))
+
+        respuesta = self.client.get(reverse('exportar_equipos_pdf'), {'tipo': 'Generador'})
+        self.assertEqual(respuesta.status_code, 200)
+        if importlib.util.find_spec('pypdf'):
+            from pypdf import PdfReader
+            lector = PdfReader(io.BytesIO(b''.join(respuesta.streaming_content)))
+            texto = ''.join(pagina.extract_text() for pagina in lector.pages)
+            self.assertIn('GEN-00001', texto)
+            self.assertNotIn('MOT-00001', texto)
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'requiere pyarrow')
+    def test_parquet_con_columnas_tipadas(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        respuesta = self.client.get(reverse('exportar_equipos_parquet'))
+        self.assertEqual(respuesta.status_code, 200)
+        tabla = pq.read_table(io.BytesIO(b''.join(respuesta.streaming_content)))
+
+        self.assertEqual(tabla.column_names, list(COLUMNAS))
+        tipos = {campo.name: campo.type for campo in tabla.schema}
+        self.assertEqual(tipos['id'], pa.int64())
+        self.assertEqual(tipos['precio'], pa.decimal128(10, 2))
+        self.assertEqual(tipos['fecha_compra'], pa.date32())
+        self.assertTrue(pa.types.is_dictionary(tipos['sede']))
+        self.assertEqual(tipos['nombre'], pa.string())
+
+        por_serie = {fila['numero_serie']: fila for fila in tabla.to_pylist()}
+        self.assertEqual(sorted(por_serie), self.series)
+        compresor = por_serie['COM-00001']
+        self.assertEqual(
+            (compresor['precio'], compresor['fecha_compra'], compresor['sede']),
+            (Decimal('1234.50'), date(2024, 3, 1), 'Lima'),
+        )
+        self.assertIsNone(por_serie['MOT-00002']['sede'])
+
+    @unittest.skipUnless(importlib.util.find_spec('pypdf'), 'requiere pypdf')
+    def test_pdf_por_bloques_en_paralelo(self):
+        from pypdf import PdfReader
+
+        def escribir(**opciones):
+            destino, avances = io.BytesIO(), []
+            escribir_pdf_equipos(
+                Equipo.objects.order_by('numero_serie'), destino,
+                progreso=lambda hechas, total: avances.append((hechas, total)), **opciones
+            )
+            paginas = PdfReader(destino).pages
+            return len(paginas), ''.join(pagina.extract_text() for pagina in paginas), avances
+
+        paginas_uno, texto_uno, avances_uno = escribir(procesos=1)
+        paginas, texto, avances = escribir(procesos=2, tamano_bloque=2)
+
+        self.assertEqual(avances_uno, [(5, 5)])
+        self.assertEqual(avances, [(2, 5), (4, 5), (5, 5)])
+        # Tres bloques de dos filas y las estadísticas, cada uno en sus páginas
+        self.assertGreaterEqual(paginas, 4)
+        self.assertGreater(paginas, paginas_uno)
+        for contenido in (texto_uno, texto):
+            posiciones = [contenido.index(serie) for serie in self.series]
+            self.assertEqual(posiciones, sorted(posiciones))
+            self.assertIn('INVENTARIO DE ACTIVOS', contenido.upper())
+
+
+class TrabajosFondoTests(InventarioTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.usar_directorios_temporales()
+        self.crear_equipo(nombre='En Lima', numero_serie='MOT-00001')
+        self.crear_equipo(nombre='En Cusco', numero_serie='MOT-00002', sede=self.otra_sede)
+
+    def consultar(self, trabajo, cliente=None):
+        return (cliente or self.client).get(reverse('estado_trabajo', args=[trabajo.pk]))
+
+    def test_exportacion_de_principio_a_fin(self):
+        respuesta = self.client.post(reverse('crear_trabajo_exportacion', args=['excel']), {'sede': 'Lima'})
+        self.assertEqual(respuesta.status_code, 202)
+        trabajo = TrabajoFondo.objects.get(pk=respuesta.json()['trabajo']['id'])
+        self.assertEqual(self.consultar(trabajo).json()['trabajo']['estado'], 'pendiente')
+
+        reclamado = trabajos.reclamar()
+        self.assertEqual(reclamado.pk, trabajo.pk)
+        # Nadie más puede tomarlo
+        self.assertIsNone(trabajos.reclamar(trabajo.pk))
+        self.assertEqual(trabajos.ejecutar(reclamado), 'completado')
+
+        datos = self.consultar(trabajo).json()['trabajo']
+        self.assertEqual((datos['estado'], datos['progreso'], datos['terminado']), ('completado', 100, True))
+        descarga = self.client.get(datos['url_descarga'])
+        hoja = openpyxl.load_workbook(io.BytesIO(b''.join(descarga.streaming_content))).active
+        series = {celda.value for fila in hoja.iter_rows() for celda in fila}
+        self.assertIn('MOT-00001', series)
+        self.assertNotIn('MOT-00002', series)
+
+    def test_solo_el_dueno_ve_el_trabajo(self):
+        trabajo = trabajos.encolar('exportar_pdf', self.usuario)
+        otro = self.client_class()
+        otro.force_login(self.crear_usuario('otro'))
+        self.assertEqual(self.consultar(trabajo, otro).status_code, 404)
+        self.assertEqual(self.client.post(reverse('crear_trabajo_exportacion', args=['docx'])).status_code, 400)
+
+    def test_progreso_y_fallos(self):
+        avances = []
+
+        def manejador(trabajo, progreso):
+            progreso(10, 'empezando')
+            progreso(10.4, 'mismo porcentaje, no se escribe')
+            progreso(60, 'a medio camino')
+            avances.append(TrabajoFondo.objects.values_list('progreso', 'mensaje').get(pk=trabajo.pk))
+            return {'resultado': {'filas': 3}}
+
+        def fallido(trabajo, progreso):
+            raise RuntimeError('sin espacio')
+
+        with mock.patch.dict(trabajos.MANEJADORES, {'exportar_excel': manejador, 'exportar_pdf': fallido}):
+            bien = trabajos.encolar('exportar_excel', self.usuario)
+            mal = trabajos.encolar('exportar_pdf', self.usuario)
+            with self.assertLogs('inventario.trabajos', 'ERROR'):
+                self.assertEqual(trabajos.ejecutar_pendientes(), 2)
+
+        self.assertEqual(avances, [(60, 'a medio camino')])
+        bien.refresh_from_db()
+        mal.refresh_from_db()
+        self.assertEqual((bien.estado, bien.progreso, bien.resultado), ('completado', 100, {'filas': 3}))
+        self.assertEqual((mal.estado, mal.mensaje), ('fallido', 'Error: sin espacio'))
+        with self.assertRaises(ValueError):
+            trabajos.encolar('desconocido', self.usuario)
+
+    def test_importacion_por_el_comando(self):
+        filas = [[f'Importado {i}', 'Bomba', 'Lima', 'Sistemas', 'Operativo', 10] for i in range(3)]
+        respuesta = self.client.post(reverse('crear_trabajo_importacion'), {
+            'archivo': SimpleUploadedFile('equipos.xlsx', self.archivo_excel(filas).getvalue()),
+        })
+        self.assertEqual(respuesta.status_code, 202)
+        trabajo = TrabajoFondo.objects.get(pk=respuesta.json()['trabajo']['id'])
+        entrada = trabajos.ruta_archivo(trabajo.parametros['entrada'])
+        self.assertTrue(os.path.exists(entrada))
+
+        call_command('procesar_trabajos', '--una-vez', stdout=io.StringIO())
+
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.resultado['equipos_creados']), ('completado', 3))
+        self.assertFalse(os.path.exists(entrada))
+        self.assertEqual(Equipo.objects.filter(nombre__startswith='Importado').count(), 3)
+
+    def test_interrumpidos_y_purga(self):
+        ahora = timezone.now()
+        colgado = TrabajoFondo.objects.create(
+            tipo='exportar_excel', usuario=self.usuario, estado='en_proceso', iniciado=ahora - timedelta(hours=2)
+        )
+        reciente = TrabajoFondo.objects.create(
+            tipo='exportar_excel', usuario=self.usuario, estado='en_proceso', iniciado=ahora
+        )
+        self.assertEqual(trabajos.marcar_interrumpidos(60), 1)
+        colgado.refresh_from_db()
+        self.assertEqual((colgado.estado, colgado.mensaje), ('fallido', 'Trabajo interrumpido'))
+        self.assertEqual(TrabajoFondo.objects.get(pk=reciente.pk).estado, 'en_proceso')
+
+        nombre = trabajos.nuevo_nombre('xlsx')
+        open(trabajos.ruta_archivo(nombre), 'wb').close()
+        viejo = TrabajoFondo.objects.create(
+            tipo='exportar_excel', usuario=self.usuario, estado='completado',
+            archivo=nombre, terminado=ahora - timedelta(days=10),
+        )
+        self.assertEqual(trabajos.purgar(7), 1)
+        self.assertFalse(TrabajoFondo.objects.filter(pk=viejo.pk).exists())
+        self.assertFalse(os.path.exists(trabajos.ruta_archivo(nombre)))
+
+
+class ArtefactosTests(InventarioTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.usar_directorios_temporales()
+        self.crear_equipo(nombre='Compresor', numero_serie='COM-00001')
+
+    def test_archivo_podado_antes_de_abrirlo_se_regenera(self):
+        generados = []
+        obtener_artefacto = artefactos.obtener_artefacto
+
+        def podado_por_otro_proceso(*args, **kwargs):
+            ruta = obtener_artefacto(*args, **kwargs)
+            if not generados:
+                os.remove(ruta)
+            generados.append(ruta)
+            return ruta
+
+        with mock.patch('inventario.artefactos.obtener_artefacto', side_effect=podado_por_otro_proceso):
+            respuesta = self.client.get(reverse('exportar_equipos_excel'))
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(generados), 2)
+        hoja = openpyxl.load_workbook(io.BytesIO(b''.join(respuesta.streaming_content))).active
+        self.assertIn('COM-00001', [celda.value for fila in hoja.iter_rows() for celda in fila])
+
+    def test_trabajo_copia_el_archivo_si_no_puede_enlazarlo(self):
+        trabajo = trabajos.encolar('exportar_excel', self.usuario, {'filtros': {}})
+        with mock.patch('inventario.trabajos.os.link', side_effect=FileNotFoundError):
+            self.assertEqual(trabajos.ejecutar(trabajos.reclamar(trabajo.pk)), 'completado')
+        trabajo.refresh_from_db()
+        self.assertTrue(openpyxl.load_workbook(trabajos.ruta_archivo(trabajo.archivo)))
+
+    @override_settings(EXPORTACIONES_PRECALENTAR=['excel'], EXPORTACIONES_PRECALENTAR_MINIMO=1)
+    def test_sin_pool_no_se_precalienta_en_la_peticion(self):
+        with mock.patch('inventario.artefactos.precalentar') as precalentar:
+            trabajos.precalentar_exportaciones(10)
+            precalentar.assert_not_called()
+            trabajos.precalentar_exportaciones(10, en_trabajo=True)
+            precalentar.assert_called_once_with(['excel'])
+
+
+@unittest.skipUnless('fork' in multiprocessing.get_all_start_methods(), 'requiere fork')
+class CacheCompartidaTests(SimpleTestCase):
+    """
+    Consistencia de la caché entre procesos: cada proceso hijo abre su
+    propia conexión al mismo archivo, como los workers de gunicorn.
+    """
+    PROCESOS = 4
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp(prefix='prueba_cache_')
+        self.ruta = os.path.join(self.directorio, 'cache.sqlite3')
+        self.contexto = multiprocessing.get_context('fork')
+
+    def tearDown(self):
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+    def ejecutar(self, objetivo, *argumentos_por_proceso):
+        hijos = [self.contexto.Process(target=objetivo, args=argumentos) for argumentos in argumentos_por_proceso]
+        for hijo in hijos:
+            hijo.start()
+        for hijo in hijos:
+            hijo.join()
+            self.assertEqual(hijo.exitcode, 0)
+
+    def test_incr_y_add_atomicos_entre_procesos(self):
+        operaciones = 200
+        cache = _abrir_cache(self.ruta)
+        cache.set('contador', 0)
+        barrera = self.contexto.Barrier(self.PROCESOS)
+
+        self.ejecutar(_incrementar, *[(self.ruta, numero, operaciones, barrera) for numero in range(self.PROCESOS)])
+
+        self.assertEqual(cache.get('contador'), self.PROCESOS * operaciones)
+        # Cada clave la creó un solo proceso y conserva su valor
+        valores = cache.get_many([f'unico:{i}' for i in range(operaciones)])
+        self.assertEqual(len(valores), operaciones)
+        self.assertTrue(set(valores.values()) <= set(range(self.PROCESOS)))
+
+    def test_ttl_entre_procesos(self):
+        cache = _abrir_cache(self.ruta)
+        self.ejecutar(_escribir_efimera, (self.ruta, 0.5))
+        self.assertEqual(cache.get('efimera'), 'valor')
+        time.sleep(0.6)
+        self.assertIsNone(cache.get('efimera'))
+        self.assertTrue(cache.add('efimera', 'nueva'))
+        self.assertFalse(cache.add('efimera', 'otra'))
+        with self.assertRaises(ValueError):
+            cache.incr('inexistente')
+
+    def test_lru_entre_procesos(self):
+        max_entradas = 200
+        cache = _abrir_cache(self.ruta, max_entradas)
+        cache.set('usada', 'valor')
+        # Sin resolución del último acceso, para que la lectura la renueve
+        with mock.patch.object(cache_compartida, 'RESOLUCION_LRU', 0):
+            # Cada ronda escribe una cuarta parte del máximo entre todos los
+            # procesos; en total, el doble del máximo
+            for ronda in range(8):
+                time.sleep(0.01)
+                cache.get('usada')
+                self.ejecutar(_llenar, *[
+                    (self.ruta, max_entradas, f'{ronda}:{numero}', max_entradas // (4 * self.PROCESOS))
+                    for numero in range(self.PROCESOS)
+                ])
+
+        total = cache._conexion().execute('SELECT COUNT(*) FROM entradas').fetchone()[0]
+        # Se poda cada _podar_cada escrituras: puede pasarse en esas
+        self.assertLessEqual(total, max_entradas + cache._podar_cada)
+        self.assertEqual(cache.get('usada'), 'valor')
+        self.assertIsNone(cache.get('proceso:0:0:0'))
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'con tablas casi vacías MySQL puede preferir un recorrido completo')
+class PlanesDeConsultaTests(TestCase):
+    """verificar_planes como parte de la suite: un índice perdido la hace fallar"""
+
+    def test_consultas_criticas_usan_indices(self):
+        salida = io.StringIO()
+        call_command('verificar_planes', stdout=salida)
+        self.assertNotIn('✗', salida.getvalue())
+
+    def test_recorrido_completo_falla(self):
+        from .management.commands import verificar_planes
+
+        sin_indice = ('observación exacta', lambda: Equipo.objects.filter(observacion='x'))
+        with mock.patch.object(verificar_planes, 'CONSULTAS_CRITICAS', [sin_indice]):
+            with self.assertRaises(CommandError):
+                call_command('verificar_planes', stdout=io.StringIO())
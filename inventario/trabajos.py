@@ -0,0 +1,314 @@
+"""
+Cola de trabajos en segundo plano respaldada por la base de datos.
+
+Las exportaciones e importaciones grandes no se hacen dentro de la petición:
+la vista crea un TrabajoFondo y responde de inmediato; el navegador consulta
+el estado y, al terminar, descarga el archivo generado.
+
+Las exportaciones se resuelven por la caché de inventario.artefactos, la
+misma que usan las descargas directas.
+
+Los trabajos los ejecuta un pool de hilos dentro del propio proceso web
+(settings.TRABAJOS_HILOS, 0 para desactivarlo) y/o el comando
+`manage.py procesar_trabajos`. Un trabajo se reclama con un UPDATE
+condicional sobre su estado, así que nunca lo ejecutan dos a la vez aunque
+haya varios workers y procesos compitiendo.
+"""
+import logging
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import TrabajoFondo
+
+logger = logging.getLogger(__name__)
+
+MANEJADORES = {}
+
+_ejecutor = None
+_bloqueo = threading.Lock()
+
+
+def manejador(tipo):
+    """Registra la función que ejecuta los trabajos de un tipo"""
+    def registrar(funcion):
+        MANEJADORES[tipo] = funcion
+        return funcion
+    return registrar
+
+
+def directorio_trabajos():
+    ruta = getattr(settings, 'TRABAJOS_DIR', None) or os.path.join(settings.MEDIA_ROOT, 'trabajos')
+    os.makedirs(ruta, exist_ok=True)
+    return ruta
+
+
+def ruta_archivo(nombre):
+    return os.path.join(directorio_trabajos(), nombre)
+
+
+def nuevo_nombre(extension):
+    return f'{uuid.uuid4().hex}.{extension}'
+
+
+def guardar_entrada(archivo_subido, extension):
+    """Copia un archivo subido al directorio de trabajos y devuelve su nombre"""
+    nombre = nuevo_nombre(extension)
+    with open(ruta_archivo(nombre), 'wb') as destino:
+        for parte in archivo_subido.chunks():
+            destino.write(parte)
+    return nombre
+
+
+def _obtener_ejecutor():
+    global _ejecutor
+    hilos = getattr(settings, 'TRABAJOS_HILOS', 2)
+    if hilos <= 0:
+        return None
+    with _bloqueo:
+        if _ejecutor is None:
+            _ejecutor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='trabajo')
+    return _ejecutor
+
+
+def encolar(tipo, usuario, parametros=None):
+    """
+    Crea un trabajo pendiente. Si el pool en proceso está activo se le
+    entrega al confirmar la transacción; si no, lo tomará procesar_trabajos.
+    """
+    if tipo not in MANEJADORES:
+        raise ValueError(f'Tipo de trabajo desconocido: {tipo}')
+    trabajo = TrabajoFondo.objects.create(tipo=tipo, usuario=usuario, parametros=parametros or {})
+    ejecutor = _obtener_ejecutor()
+    if ejecutor is not None:
+        transaction.on_commit(lambda: ejecutor.submit(_ejecutar_en_hilo, trabajo.pk))
+    return trabajo
+
+
+def reclamar(trabajo_id=None):
+    """
+    Pasa a en_proceso el trabajo indicado o, sin id, el pendiente más
+    antiguo. Devuelve None si no hay pendientes o si otro proceso lo tomó.
+    """
+    pendientes = TrabajoFondo.objects.filter(estado='pendiente')
+    if trabajo_id is None:
+        trabajo_id = pendientes.order_by('creado', 'id').values_list('id', flat=True).first()
+        if trabajo_id is None:
+            return None
+    tomados = pendientes.filter(pk=trabajo_id).update(
+        estado='en_proceso', iniciado=timezone.now(), mensaje='Iniciando...'
+    )
+    if not tomados:
+        return None
+    return TrabajoFondo.objects.get(pk=trabajo_id)
+
+
+def ejecutar(trabajo):
+    """
+    Ejecuta un trabajo ya reclamado. El manejador recibe el trabajo y una
+    función progreso(porcentaje, mensaje) y devuelve los campos a guardar al
+    terminar (archivo, nombre_archivo, resultado, mensaje y, opcionalmente,
+    estado).
+    """
+    ultimo = {'porcentaje': -1}
+
+    def progreso(porcentaje, mensaje=''):
+        porcentaje = max(0, min(int(porcentaje), 99))
+        # Solo se escribe cuando cambia el porcentaje: a lo sumo 100 UPDATE
+        if porcentaje != ultimo['porcentaje']:
+            ultimo['porcentaje'] = porcentaje
+            TrabajoFondo.objects.filter(pk=trabajo.pk).update(progreso=porcentaje, mensaje=mensaje[:255])
+
+    try:
+        campos = MANEJADORES[trabajo.tipo](trabajo, progreso)
+    except Exception as e:
+        logger.exception('Falló el trabajo %s', trabajo.pk)
+        campos = {'estado': 'fallido', 'mensaje': f'Error: {str(e)}'[:255]}
+    else:
+        campos.setdefault('estado', 'completado')
+        campos.setdefault('mensaje', 'Completado')
+        if campos['estado'] == 'completado':
+            campos['progreso'] = 100
+    finally:
+        entrada = trabajo.parametros.get('entrada')
+        if entrada:
+            _eliminar_archivo(entrada)
+
+    TrabajoFondo.objects.filter(pk=trabajo.pk).update(terminado=timezone.now(), **campos)
+    return campos['estado']
+
+
+def ejecutar_pendientes(limite=None):
+    """Ejecuta trabajos pendientes hasta vaciar la cola. Devuelve cuántos ejecutó."""
+    ejecutados = 0
+    while limite is None or ejecutados < limite:
+        trabajo = reclamar()
+        if trabajo is None:
+            break
+        ejecutar(trabajo)
+        ejecutados += 1
+    return ejecutados
+
+
+def _ejecutar_en_hilo(trabajo_id):
+    # Los hilos del pool usan su propia conexión: se cierra al terminar
+    close_old_connections()
+    try:
+        trabajo = reclamar(trabajo_id)
+        if trabajo is not None:
+            ejecutar(trabajo)
+        # Recoger pendientes que quedaron sin ejecutar (p. ej. tras un reinicio)
+        ejecutar_pendientes()
+    except Exception:
+        logger.exception('Error en el pool de trabajos')
+    finally:
+        connection.close()
+
+
+def precalentar_exportaciones(equipos_creados, en_trabajo=False):
+    """
+    Tras una importación grande (EXPORTACIONES_PRECALENTAR_MINIMO equipos o
+    más) regenera los formatos de EXPORTACIONES_PRECALENTAR, para que la
+    primera descarga posterior ya esté en la caché de exportaciones.
+
+    Nunca se genera dentro de la petición: se entrega al pool de hilos y,
+    sin pool, solo se hace en línea si ya se está dentro de un trabajo
+    (`en_trabajo`, procesar_trabajos); desde una vista se omite.
+    """
+    formatos = getattr(settings, 'EXPORTACIONES_PRECALENTAR', [])
+    if not formatos or equipos_creados < getattr(settings, 'EXPORTACIONES_PRECALENTAR_MINIMO', 1000):
+        return
+    ejecutor = _obtener_ejecutor()
+    if ejecutor is not None:
+        transaction.on_commit(lambda: ejecutor.submit(_precalentar_en_hilo, formatos))
+    elif en_trabajo:
+        _precalentar(formatos)
+
+
+def _precalentar(formatos):
+    from .artefactos import precalentar
+    try:
+        precalentar(formatos)
+    except Exception:
+        logger.exception('No se pudieron precalentar las exportaciones')
+
+
+def _precalentar_en_hilo(formatos):
+    close_old_connections()
+    try:
+        _precalentar(formatos)
+    finally:
+        connection.close()
+
+
+def marcar_interrumpidos(minutos):
+    """Da por fallidos los trabajos en proceso desde hace más de `minutos`"""
+    limite = timezone.now() - timedelta(minutes=minutos)
+    return TrabajoFondo.objects.filter(estado='en_proceso', iniciado__lt=limite).update(
+        estado='fallido', mensaje='Trabajo interrumpido', terminado=timezone.now()
+    )
+
+
+def _eliminar_archivo(nombre):
+    try:
+        os.remove(ruta_archivo(nombre))
+    except FileNotFoundError:
+        pass
+
+
+def purgar(dias):
+    """Elimina los trabajos terminados hace más de `dias` junto con sus archivos"""
+    viejos = TrabajoFondo.objects.filter(terminado__lt=timezone.now() - timedelta(days=dias))
+    for archivo in viejos.exclude(archivo='').values_list('archivo', flat=True):
+        _eliminar_archivo(archivo)
+    return viejos.delete()[0]
+
+
+def serializar(trabajo):
+    datos = {
+        'id': trabajo.pk,
+        'tipo': trabajo.tipo,
+        'estado': trabajo.estado,
+        'progreso': trabajo.progreso,
+        'mensaje': trabajo.mensaje,
+        'resultado': trabajo.resultado,
+        'terminado': trabajo.estado in ('completado', 'fallido'),
+        'url_estado': reverse('estado_trabajo', args=[trabajo.pk]),
+        'url_descarga': '',
+    }
+    if trabajo.estado == 'completado' and trabajo.archivo:
+        datos['url_descarga'] = reverse('descargar_trabajo', args=[trabajo.pk])
+    return datos
+
+
+# Manejadores
+
+def _progreso_por_filas(progreso, desde, hasta, unidad):
+    """Adapta progreso(hechas, total) de utils a un rango de porcentajes"""
+    def reportar(hechas, total):
+        if total:
+            progreso(desde + (hasta - desde) * hechas / total, f'{hechas} de {total} {unidad}')
+    return reportar
+
+
+def _exportar(trabajo, formato, progreso):
+    """
+    Resuelve la exportación por la caché de artefactos (misma clave de
+    formato, filtros y sello que la descarga directa): solo se genera si no
+    está en disco. El trabajo recibe un enlace (o una copia) propio, para que
+    podar la caché no le quite el archivo antes de descargarlo.
+    """
+    from .artefactos import FORMATOS, abrir_artefacto
+
+    extension, _, nombre_descarga = FORMATOS[formato]
+    nombre = nuevo_nombre(extension)
+    with abrir_artefacto(
+        formato, trabajo.parametros.get('filtros', {}),
+        progreso=_progreso_por_filas(progreso, 0, 95, 'equipos'),
+    ) as origen:
+        try:
+            os.link(origen.name, ruta_archivo(nombre))
+        except OSError:
+            # Otro sistema de archivos, sin soporte de enlaces o ya podado:
+            # se copia desde el archivo abierto, que sigue siendo legible
+            with open(ruta_archivo(nombre), 'wb') as destino:
+                shutil.copyfileobj(origen, destino)
+    return {'archivo': nombre, 'nombre_archivo': nombre_descarga}
+
+
+@manejador('exportar_excel')
+def exportar_excel(trabajo, progreso):
+    progreso(0, 'Generando Excel...')
+    return _exportar(trabajo, 'excel', progreso)
+
+
+@manejador('exportar_pdf')
+def exportar_pdf(trabajo, progreso):
+    progreso(0, 'Generando PDF...')
+    return _exportar(trabajo, 'pdf', progreso)
+
+
+@manejador('importar_excel')
+def importar_excel(trabajo, progreso):
+    from .utils import procesar_importacion_excel, resumir_importacion
+
+    progreso(0, 'Leyendo archivo...')
+    equipos_creados, errores = procesar_importacion_excel(
+        ruta_archivo(trabajo.parametros['entrada']),
+        progreso=_progreso_por_filas(progreso, 0, 99, 'filas'),
+    )
+    resumen = resumir_importacion(equipos_creados, errores)
+    precalentar_exportaciones(equipos_creados, en_trabajo=True)
+    return {
+        'estado': 'completado' if resumen['success'] else 'fallido',
+        'mensaje': (resumen.get('message') or resumen.get('error'))[:255],
+        'resultado': resumen,
+    }
@@ -4,12 +4,25 @@ from . import views
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('equipos/', views.equipos_lista, name='equipos_lista'),
+    path('equipos/datos/', views.equipos_datos, name='equipos_datos'),
+    path('equipos/buscar/', views.buscar_equipos, name='buscar_equipos'),
     path('equipos/crear/', views.crear_equipo, name='crear_equipo'),
+    path('equipos/cambios/', views.cambios_equipos, name='cambios_equipos'),
+    path('equipos/lote/', views.operar_equipos_lote, name='operar_equipos_lote'),
     path('equipos/<int:equipo_id>/', views.obtener_equipo, name='obtener_equipo'),
     path('equipos/<int:equipo_id>/editar/', views.editar_equipo, name='editar_equipo'),
     path('equipos/<int:equipo_id>/eliminar/', views.eliminar_equipo, name='eliminar_equipo'),
     path('equipos/exportar-pdf/', views.exportar_equipos_pdf, name='exportar_equipos_pdf'),
     path('equipos/exportar-excel/', views.exportar_equipos_excel, name='exportar_equipos_excel'),
+    path('equipos/exportar-csv/', views.exportar_equipos_csv, name='exportar_equipos_csv'),
+    path('equipos/exportar-ndjson/', views.exportar_equipos_ndjson, name='exportar_equipos_ndjson'),
+    path('equipos/exportar-parquet/', views.exportar_equipos_parquet, name='exportar_equipos_parquet'),
     path('equipos/importar-excel/', views.importar_equipos_excel, name='importar_equipos_excel'),
     path('equipos/plantilla-excel/', views.descargar_plantilla_excel, name='descargar_plantilla_excel'),
+    path('catalogos/', views.catalogos_datos, name='catalogos_datos'),
+    path('api/equipos/', views.api_equipos, name='api_equipos'),
+    path('trabajos/exportar/<str:formato>/', views.crear_trabajo_exportacion, name='crear_trabajo_exportacion'),
+    path('trabajos/importar/', views.crear_trabajo_importacion, name='crear_trabajo_importacion'),
+    path('trabajos/<int:trabajo_id>/', views.estado_trabajo, name='estado_trabajo'),
+    path('trabajos/<int:trabajo_id>/descargar/', views.descargar_trabajo, name='descargar_trabajo'),
 ] 
\ No newline at end of file
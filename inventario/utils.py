@@ -1,283 +1,185 @@
 from io import BytesIO
 from datetime import datetime
+from django.db import transaction
 from django.db.models import Count
-from .models import Equipo, Area, Estado, Sede
+from .models import Equipo, Area, Estado, Sede, SecuenciaSerie
+from .versiones import VERSION_CATALOGOS, incrementar_version
+from .catalogos import obtener_catalogos
+from .contadores import registrar_altas
+from .busqueda import indexar_series
+from .proyecciones import EXCEL
 # import pandas as pd  # Comentado temporalmente para Render
 import re
 import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
 
-def generar_pdf_equipos(equipos):
+# Tamaño de lote con el que se recorren los querysets en las exportaciones
+TAMANO_LOTE_EXPORTACION = 2000
+
+def contar_por_estado(equipos):
     """
-    Genera un PDF profesional con la lista de equipos
+    Cantidad de equipos por estado calculada con un GROUP BY, como lista de
+    (nombre del estado, cantidad) ordenada por nombre.
     """
-    # Importar reportlab solo cuando se necesita
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-    
-    # Crear buffer para el PDF
-    buffer = BytesIO()
-    
-    # Crear documento
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    
-    # Estilos
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        textColor=colors.darkblue
+    estados = obtener_catalogos()['estado']
+    return sorted(
+        (estados.nombre(fila['estado_id']), fila['cantidad'])
+        for fila in equipos.order_by().values('estado_id').annotate(cantidad=Count('id'))
     )
-    
-    subtitle_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Normal'],
-        fontSize=12,
-        spaceAfter=20,
-        alignment=TA_CENTER,
-        textColor=colors.grey
+
+# Situación -> texto de las estadísticas de las exportaciones
+ETIQUETAS_SITUACION = {
+    'garantia': {
+        'vigente': 'Garantía vigente',
+        'vencida': 'Garantía vencida',
+        'sin_garantia': 'Sin garantía',
+    },
+    'mantenimiento': {
+        'vencido': 'Mantenimiento vencido',
+        'proximo': 'Mantenimiento próximo',
+        'programado': 'Mantenimiento programado',
+        'sin_fecha': 'Sin fecha de mantenimiento',
+    },
+}
+
+def contar_por_situacion(equipos):
+    """
+    Cantidad de equipos por situación de garantía y de mantenimiento, como
+    lista de (texto, cantidad). Una sola consulta de agregación.
+    """
+    resumen = equipos.resumen_situacion()
+    return [
+        (etiqueta, resumen[grupo][nombre])
+        for grupo, etiquetas in ETIQUETAS_SITUACION.items()
+        for nombre, etiqueta in etiquetas.items()
+    ]
+
+def _registrar_estilos_excel(wb):
+    """
+    Registra los estilos con nombre de la exportación. Cada celda referencia
+    el estilo por nombre en lugar de crear sus propios Font/Alignment/Border.
+    """
+    borde = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
     )
     
-    # Título del documento
-    title = Paragraph("INVENTARIO DE ACTIVOS", title_style)
-    elements.append(title)
-    
-    # Subtítulo con fecha
-    fecha = datetime.now().strftime("%d/%m/%Y %H:%M")
-    subtitle = Paragraph(f"Reporte generado el {fecha}", subtitle_style)
-    elements.append(subtitle)
-    
-    elements.append(Spacer(1, 20))
-    
-    # Datos de la tabla
-    data = [['Nombre', 'Tipo', 'N° Serie', 'Marca/Modelo', 'Precio', 'Área', 'Estado', 'Garantía']]
-    
-    for equipo in equipos:
-        # Formatear precio
-        precio_str = f"${equipo.precio:,.2f}" if equipo.precio else "N/A"
-        
-        # Formatear marca/modelo
-        marca_modelo = f"{equipo.marca} {equipo.modelo}".strip()
-        if not marca_modelo:
-            marca_modelo = "N/A"
-        
-        # Estado de garantía
-        garantia_status = "Vigente" if equipo.garantia_vigente else "Vencida" if equipo.garantia_hasta else "N/A"
-        
-        data.append([
-            equipo.nombre,
-            equipo.tipo,
-            equipo.numero_serie,
-            marca_modelo,
-            precio_str,
-            equipo.area.nombre,
-            equipo.estado.nombre,
-            garantia_status
-        ])
-    
-    # Crear tabla
-    table = Table(data, colWidths=[1.5*inch, 0.8*inch, 1*inch, 1.2*inch, 0.8*inch, 0.8*inch, 0.8*inch, 0.8*inch])
-    
-    # Estilo de la tabla
-    style = TableStyle([
-        # Encabezados
-        ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        
-        # Datos
-        ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-        
-        # Alineación específica para columnas
-        ('ALIGN', (4, 1), (4, -1), 'RIGHT'),  # Precio
-        ('ALIGN', (2, 1), (2, -1), 'CENTER'),  # N° Serie
-        ('ALIGN', (6, 1), (6, -1), 'CENTER'),  # Estado
-        ('ALIGN', (7, 1), (7, -1), 'CENTER'),  # Garantía
-    ])
-    
-    table.setStyle(style)
-    elements.append(table)
+    titulo = NamedStyle(name='inv_titulo')
+    titulo.font = Font(bold=True, size=16, color="366092")
     
-    # Estadísticas
-    elements.append(Spacer(1, 30))
+    subtitulo = NamedStyle(name='inv_subtitulo')
+    subtitulo.font = Font(size=10, color="666666")
     
-    # Contar equipos por estado
-    estados_count = {}
-    for equipo in equipos:
-        estado = equipo.estado.nombre
-        estados_count[estado] = estados_count.get(estado, 0) + 1
+    encabezado = NamedStyle(name='inv_encabezado')
+    encabezado.font = Font(bold=True, color="FFFFFF", size=12)
+    encabezado.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    encabezado.alignment = Alignment(horizontal="center", vertical="center")
+    encabezado.border = borde
     
-    # Crear tabla de estadísticas
-    stats_data = [['Estadísticas del Inventario']]
-    stats_data.append(['Estado', 'Cantidad'])
+    dato = NamedStyle(name='inv_dato')
+    dato.font = Font(size=10)
+    dato.alignment = Alignment(horizontal="left", vertical="center")
+    dato.border = borde
     
-    for estado, cantidad in estados_count.items():
-        stats_data.append([estado, str(cantidad)])
+    estadistica = NamedStyle(name='inv_estadistica')
+    estadistica.font = Font(bold=True, size=14, color="366092")
     
-    stats_table = Table(stats_data, colWidths=[2*inch, 1*inch])
-    stats_style = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.darkgreen),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgreen]),
-        ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 10),
-    ])
-    
-    stats_table.setStyle(stats_style)
-    elements.append(stats_table)
-    
-    # Construir PDF
-    doc.build(elements)
-    
-    # Obtener PDF
-    pdf = buffer.getvalue()
-    buffer.close()
-    
-    return pdf
+    for estilo in (titulo, subtitulo, encabezado, dato, estadistica):
+        wb.add_named_style(estilo)
 
-def generar_excel_equipos(equipos):
+def _celda(ws, valor, estilo):
+    cell = WriteOnlyCell(ws, value=valor)
+    cell.style = estilo
+    return cell
+
+def escribir_excel_equipos(equipos, destino, tamano_lote=TAMANO_LOTE_EXPORTACION, progreso=None):
     """
-    Genera un archivo Excel profesional con la lista de equipos
+    Escribe el Excel de equipos en `destino` (ruta o archivo binario) usando
+    el modo write-only de openpyxl: las filas se leen del queryset por lotes
+    y se vuelcan al archivo sin mantener la hoja en memoria.
+
+    `progreso(filas_escritas, total)` se llama después de cada lote.
     """
-    # Crear workbook
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Inventario de Activos"
+    total = equipos.count() if progreso else None
+    wb = openpyxl.Workbook(write_only=True)
+    _registrar_estilos_excel(wb)
+    ws = wb.create_sheet("Inventario de Activos")
     
-    # Estilos
-    header_font = Font(bold=True, color="FFFFFF", size=12)
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    
-    data_font = Font(size=10)
-    data_alignment = Alignment(horizontal="left", vertical="center")
-    
-    # Bordes
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    # Título
-    ws.merge_cells('A1:H1')
-    ws['A1'] = "INVENTARIO DE ACTIVOS"
-    ws['A1'].font = Font(bold=True, size=16, color="366092")
-    ws['A1'].alignment = Alignment(horizontal="center")
+    # Ajustar ancho de columnas (en modo write-only debe hacerse antes de escribir filas)
+    column_widths = [25, 15, 15, 15, 15, 12, 20, 12, 12, 15, 15, 30]
+    for col, width in enumerate(column_widths, 1):
+        ws.column_dimensions[get_column_letter(col)].width = width
     
-    # Fecha
-    ws.merge_cells('A2:H2')
+    # Título y fecha
     fecha = datetime.now().strftime("%d/%m/%Y %H:%M")
-    ws['A2'] = f"Reporte generado el {fecha}"
-    ws['A2'].font = Font(size=10, color="666666")
-    ws['A2'].alignment = Alignment(horizontal="center")
+    ws.append([_celda(ws, "INVENTARIO DE ACTIVOS", 'inv_titulo')])
+    ws.append([_celda(ws, f"Reporte generado el {fecha}", 'inv_subtitulo')])
+    ws.append([])
     
     # Encabezados
     headers = [
         'Nombre', 'Tipo', 'N° Serie', 'Marca', 'Modelo', 'Precio', 
         'Proveedor', 'Fecha Compra', 'Garantía Hasta', 'Área', 'Estado', 'Observación'
     ]
+    ws.append([_celda(ws, header, 'inv_encabezado') for header in headers])
     
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=4, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-        cell.border = thin_border
-    
-    # Datos
-    for row, equipo in enumerate(equipos, 5):
-        # Formatear fecha de compra
-        fecha_compra = equipo.fecha_compra.strftime("%d/%m/%Y") if equipo.fecha_compra else ""
-        
-        # Formatear garantía
-        garantia_hasta = equipo.garantia_hasta.strftime("%d/%m/%Y") if equipo.garantia_hasta else ""
-        
-        # Formatear precio
-        precio = f"${equipo.precio:,.2f}" if equipo.precio else ""
-        
-        # Datos de la fila
+    # Datos: proyección EXCEL (área y estado salen del caché de catálogos, sin JOIN)
+    escritas = 0
+    for equipo in EXCEL.registros(equipos, tamano_lote):
         row_data = [
             equipo.nombre,
             equipo.tipo,
             equipo.numero_serie,
             equipo.marca or "",
             equipo.modelo or "",
-            precio,
+            f"${equipo.precio:,.2f}" if equipo.precio else "",
             equipo.proveedor or "",
-            fecha_compra,
-            garantia_hasta,
-            equipo.area.nombre,
-            equipo.estado.nombre,
+            equipo.fecha_compra.strftime("%d/%m/%Y") if equipo.fecha_compra else "",
+            equipo.garantia_hasta.strftime("%d/%m/%Y") if equipo.garantia_hasta else "",
+            equipo.area or "",
+            equipo.estado or "",
             equipo.observacion or ""
         ]
-        
-        for col, value in enumerate(row_data, 1):
-            cell = ws.cell(row=row, column=col, value=value)
-            cell.font = data_font
-            cell.alignment = data_alignment
-            cell.border = thin_border
+        ws.append([_celda(ws, value, 'inv_dato') for value in row_data])
+        escritas += 1
+        if progreso and escritas % tamano_lote == 0:
+            progreso(escritas, total)
     
-    # Ajustar ancho de columnas
-    column_widths = [25, 15, 15, 15, 15, 12, 20, 12, 12, 15, 15, 30]
-    for col, width in enumerate(column_widths, 1):
-        ws.column_dimensions[get_column_letter(col)].width = width
-    
-    # Crear hoja de estadísticas
+    # Hoja de estadísticas calculada en la base de datos
     ws_stats = wb.create_sheet("Estadísticas")
+    ws_stats.column_dimensions['A'].width = 30
+    ws_stats.column_dimensions['B'].width = 10
     
-    # Estadísticas por estado
-    estados_count = {}
-    for equipo in equipos:
-        estado = equipo.estado.nombre
-        estados_count[estado] = estados_count.get(estado, 0) + 1
-    
-    ws_stats['A1'] = "Estadísticas del Inventario"
-    ws_stats['A1'].font = Font(bold=True, size=14, color="366092")
-    
-    ws_stats['A3'] = "Estado"
-    ws_stats['B3'] = "Cantidad"
-    ws_stats['A3'].font = header_font
-    ws_stats['B3'].font = header_font
-    ws_stats['A3'].fill = header_fill
-    ws_stats['B3'].fill = header_fill
+    ws_stats.append([_celda(ws_stats, "Estadísticas del Inventario", 'inv_estadistica')])
+    ws_stats.append([])
+    ws_stats.append([
+        _celda(ws_stats, "Estado", 'inv_encabezado'),
+        _celda(ws_stats, "Cantidad", 'inv_encabezado'),
+    ])
     
-    row = 4
-    for estado, cantidad in estados_count.items():
-        ws_stats[f'A{row}'] = estado
-        ws_stats[f'B{row}'] = cantidad
-        row += 1
+    for nombre_estado, cantidad in contar_por_estado(equipos):
+        ws_stats.append([nombre_estado, cantidad])
     
-    # Ajustar ancho de columnas en estadísticas
-    ws_stats.column_dimensions['A'].width = 20
-    ws_stats.column_dimensions['B'].width = 10
+    ws_stats.append([])
+    ws_stats.append([
+        _celda(ws_stats, "Situación", 'inv_encabezado'),
+        _celda(ws_stats, "Cantidad", 'inv_encabezado'),
+    ])
+    for etiqueta, cantidad in contar_por_situacion(equipos):
+        ws_stats.append([etiqueta, cantidad])
     
-    # Guardar en buffer
+    wb.save(destino)
+
+def generar_excel_equipos(equipos):
+    """
+    Genera un archivo Excel profesional con la lista de equipos
+    """
     buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-    
+    escribir_excel_equipos(equipos, buffer)
     return buffer.getvalue()
 
 def generar_plantilla_excel():
@@ -325,38 +227,62 @@ def generar_plantilla_excel():
     
     return buffer.getvalue()
 
+# Mapeo flexible de encabezados del archivo a campos del equipo
+COLUMNAS_REQUERIDAS_IMPORTACION = {
+    'nombre': ['nombre', 'name', 'equipo', 'equipment'],
+    'tipo': ['tipo', 'type', 'categoria', 'category'],
+    'sede': ['sede', 'location', 'ubicacion', 'site'],
+    'area': ['area', 'área', 'departamento', 'department'],
+    'estado': ['estado', 'status', 'condition'],
+}
+
+COLUMNAS_OPCIONALES_IMPORTACION = {
+    'marca': ['marca', 'brand', 'fabricante', 'manufacturer'],
+    'modelo': ['modelo', 'model'],
+    'precio': ['precio', 'price', 'cost', 'costo', 'valor', 'value'],
+    'proveedor': ['proveedor', 'supplier', 'vendor'],
+    'observacion': ['observacion', 'observación', 'descripcion', 'descripción', 'description', 'notes', 'notas'],
+    'fecha_compra': ['fecha_compra', 'fecha compra', 'purchase_date', 'date_purchased', 'compra'],
+    'garantia_hasta': ['garantia_hasta', 'garantía hasta', 'warranty_until', 'garantia', 'garantía'],
+    'numero_serie': ['numero_serie', 'número de serie', 'serial', 'serie', 'n° serie', 'n serie']
+}
+
+# Filas que se guardan por transacción durante la importación
+TAMANO_LOTE_IMPORTACION = 500
+
+def _limpiar_encabezados(valores):
+    headers = []
+    for valor in valores:
+        header_value = str(valor).strip() if valor else ''
+        # Limpiar asteriscos y caracteres especiales
+        header_value = header_value.replace('*', '').replace('(', '').replace(')', '').strip()
+        headers.append(header_value)
+    return headers
+
 def validar_archivo_excel(archivo):
     """
-    Valida que el archivo Excel tenga el formato correcto
+    Valida que el archivo Excel tenga el formato correcto.
+    Solo lee el encabezado y la primera fila de datos (modo read-only).
     """
     try:
-        wb = openpyxl.load_workbook(archivo)
-        ws = wb.active
+        wb = openpyxl.load_workbook(archivo, read_only=True)
+        try:
+            ws = wb.active
+            encabezado = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), None)
+            primera_fila = next(ws.iter_rows(min_row=2, max_row=2, values_only=True), None)
+        finally:
+            wb.close()
         
         # Verificar que tenga al menos una fila de datos
-        if ws.max_row < 2:
+        if encabezado is None or primera_fila is None:
             return False, "El archivo no contiene datos"
         
         # Obtener headers y limpiarlos
-        headers = []
-        for cell in ws[1]:
-            header_value = str(cell.value).strip() if cell.value else ''
-            # Limpiar asteriscos y caracteres especiales
-            header_value = header_value.replace('*', '').replace('(', '').replace(')', '').strip()
-            headers.append(header_value)
-        
-        # Verificar columnas requeridas con mapeo flexible
-        columnas_requeridas = {
-            'nombre': ['nombre', 'name', 'equipo', 'equipment'],
-            'tipo': ['tipo', 'type', 'categoria', 'category'],
-            'sede': ['sede', 'location', 'ubicacion', 'site'],
-            'area': ['area', 'área', 'departamento', 'department'],
-            'estado': ['estado', 'status', 'condition'],
-        }
-        
+        headers = _limpiar_encabezados(encabezado)
         headers_lower = [h.lower() for h in headers]
         
-        for campo, posibles_nombres in columnas_requeridas.items():
+        # Verificar columnas requeridas con mapeo flexible
+        for campo, posibles_nombres in COLUMNAS_REQUERIDAS_IMPORTACION.items():
             encontrada = False
             for header_lower in headers_lower:
                 if any(nombre in header_lower for nombre in posibles_nombres):
@@ -371,48 +297,131 @@ def validar_archivo_excel(archivo):
     except Exception as e:
         return False, f"Error al leer el archivo: {str(e)}"
 
-def procesar_importacion_excel(archivo):
+def _leer_fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    return datetime.strptime(str(valor), '%d/%m/%Y').date()
+
+def _mensaje_error_fila(row_num, error):
+    error_msg = str(error)
+    if "DoesNotExist" in error_msg:
+        return f"Fila {row_num}: Error de referencia - verifica que los datos existan"
+    if "ValidationError" in error_msg:
+        return f"Fila {row_num}: Error de validación - verifica el formato de los datos"
+    return f"Fila {row_num}: Error - {error_msg}"
+
+def _resolver_catalogos(lote, catalogos):
+    """
+    Asigna sede_id/area_id/estado_id a las filas del lote creando, en un solo
+    INSERT por catálogo, los nombres que todavía no existen.
+    """
+    for campo, modelo in (('sede', Sede), ('area', Area), ('estado', Estado)):
+        mapa = catalogos[campo]
+        nuevos = {}
+        for _, datos in lote:
+            nombre = datos[campo]
+            if nombre.lower() not in mapa:
+                nuevos.setdefault(nombre.lower(), nombre)
+        if nuevos:
+            modelo.objects.bulk_create(
+                [modelo(nombre=nombre) for nombre in nuevos.values()],
+                ignore_conflicts=True
+            )
+            incrementar_version()
+            incrementar_version(VERSION_CATALOGOS)
+            mapa.update(
+                (nombre.lower(), pk)
+                for nombre, pk in modelo.objects.filter(nombre__in=list(nuevos.values())).values_list('nombre', 'id')
+            )
+        for _, datos in lote:
+            datos[f'{campo}_id'] = mapa[datos.pop(campo).lower()]
+
+def asignar_numeros_serie(lote):
+    """
+    Genera los números de serie faltantes con el mismo prefijo que
+    Equipo.save, reservando en un solo UPDATE el bloque de cada prefijo. Los
+    números que ya traen las filas adelantan su secuencia, también con un
+    UPDATE por prefijo.
+    """
+    pendientes = {}
+    for _, datos in lote:
+        if not datos['numero_serie']:
+            prefijo = Equipo(tipo=datos['tipo'])._generar_prefijo()
+            pendientes.setdefault(prefijo, []).append(datos)
+    SecuenciaSerie.sincronizar_varios(datos['numero_serie'] for _, datos in lote)
+    
+    for prefijo, filas in pendientes.items():
+        primero = SecuenciaSerie.reservar(prefijo, len(filas))
+        for numero, datos in enumerate(filas, primero):
+            datos['numero_serie'] = SecuenciaSerie.formatear(prefijo, numero)
+
+def _guardar_lote(lote, catalogos, errores):
+    """
+    Guarda un lote de filas válidas con bulk_create en una transacción. Si el
+    lote falla (p. ej. un número de serie repetido) se reintenta fila por fila
+    para reportar el error en la fila que lo causó. Si no se pueden resolver
+    los catálogos o los números de serie no se guarda ninguna fila del lote
+    y se reporta un error para todo el lote; los lotes anteriores ya están
+    guardados y la importación sigue con el siguiente.
+    """
+    try:
+        _resolver_catalogos(lote, catalogos)
+        asignar_numeros_serie(lote)
+    except Exception as e:
+        primera, ultima = lote[0][0], lote[-1][0]
+        errores.append((primera, f"Filas {primera} a {ultima}: Error - {str(e)}. No se importó ninguna fila de este bloque"))
+        return 0
+    
+    try:
+        with transaction.atomic():
+            equipos = Equipo.objects.bulk_create([Equipo(**datos) for _, datos in lote])
+            registrar_altas(equipos)
+            indexar_series(equipos)
+        # bulk_create no emite señales: invalidar el caché del inventario aquí
+        incrementar_version()
+        return len(lote)
+    except Exception:
+        pass
+    
+    creados = 0
+    for row_num, datos in lote:
+        try:
+            with transaction.atomic():
+                Equipo.objects.create(**datos)
+            creados += 1
+        except Exception as e:
+            errores.append((row_num, _mensaje_error_fila(row_num, e)))
+    if creados:
+        incrementar_version()
+    return creados
+
+def procesar_importacion_excel(archivo, tamano_lote=TAMANO_LOTE_IMPORTACION, progreso=None):
     """
-    Procesa la importación masiva desde Excel usando openpyxl
+    Procesa la importación masiva desde Excel usando openpyxl.
+
+    El archivo se recorre una sola vez en modo read-only; las filas válidas se
+    acumulan y se guardan por lotes de `tamano_lote` con bulk_create.
+    `progreso(filas_leidas, total)` se llama después de guardar cada lote.
+    Si el archivo falla a mitad de camino se devuelven los equipos de los
+    lotes ya guardados junto con el error.
     """
+    equipos_creados = 0
+    errores = []
     try:
         # Cargar archivo Excel
-        wb = openpyxl.load_workbook(archivo)
+        wb = openpyxl.load_workbook(archivo, read_only=True, data_only=True)
         ws = wb.active
+        total_filas = (ws.max_row or 1) - 1
+        filas = ws.iter_rows(values_only=True)
         
         # Obtener encabezados de la primera fila y limpiarlos
-        headers = []
-        for cell in ws[1]:
-            header_value = str(cell.value).strip() if cell.value else ''
-            # Limpiar asteriscos y caracteres especiales
-            header_value = header_value.replace('*', '').replace('(', '').replace(')', '').strip()
-            headers.append(header_value)
-        
-        # Mapeo de columnas esperadas
-        columnas_requeridas = {
-            'nombre': ['nombre', 'name', 'equipo', 'equipment'],
-            'tipo': ['tipo', 'type', 'categoria', 'category'],
-            'sede': ['sede', 'location', 'ubicacion', 'site'],
-            'area': ['area', 'área', 'departamento', 'department'],
-            'estado': ['estado', 'status', 'condition'],
-        }
-        
-        columnas_opcionales = {
-            'marca': ['marca', 'brand', 'fabricante', 'manufacturer'],
-            'modelo': ['modelo', 'model'],
-            'precio': ['precio', 'price', 'cost', 'costo', 'valor', 'value'],
-            'proveedor': ['proveedor', 'supplier', 'vendor'],
-            'observacion': ['observacion', 'observación', 'descripcion', 'descripción', 'description', 'notes', 'notas'],
-            'fecha_compra': ['fecha_compra', 'fecha compra', 'purchase_date', 'date_purchased', 'compra'],
-            'garantia_hasta': ['garantia_hasta', 'garantía hasta', 'warranty_until', 'garantia', 'garantía'],
-            'numero_serie': ['numero_serie', 'número de serie', 'serial', 'serie', 'n° serie', 'n serie']
-        }
+        headers = _limpiar_encabezados(next(filas, None) or [])
         
         # Mapear columnas del archivo a nuestros campos
         mapeo_columnas = {}
         
         # Buscar columnas requeridas
-        for campo, posibles_nombres in columnas_requeridas.items():
+        for campo, posibles_nombres in COLUMNAS_REQUERIDAS_IMPORTACION.items():
             encontrada = False
             for i, header in enumerate(headers):
                 if any(nombre.lower() in header.lower() for nombre in posibles_nombres):
@@ -421,154 +430,145 @@ def procesar_importacion_excel(archivo):
                     break
             
             if not encontrada:
+                wb.close()
                 return 0, [f"Columna requerida '{campo}' no encontrada. Busque: {', '.join(posibles_nombres)}"]
         
         # Buscar columnas opcionales
-        for campo, posibles_nombres in columnas_opcionales.items():
+        for campo, posibles_nombres in COLUMNAS_OPCIONALES_IMPORTACION.items():
             for i, header in enumerate(headers):
                 if any(nombre.lower() in header.lower() for nombre in posibles_nombres):
                     mapeo_columnas[campo] = i
                     break
         
+        def valor(fila, campo):
+            indice = mapeo_columnas.get(campo)
+            if indice is None or indice >= len(fila):
+                return None
+            return fila[indice]
+        
+        def texto(fila, campo):
+            return str(valor(fila, campo) or '').strip()
+        
+        # Copias de los mapas nombre -> id: la importación les agrega los nombres nuevos
+        catalogos = {
+            campo: dict(catalogo.por_nombre)
+            for campo, catalogo in obtener_catalogos().items()
+        }
+        
         # Procesar datos
-        equipos_creados = 0
-        errores = []
+        lote = []
         
-        for row_num in range(2, ws.max_row + 1):  # Empezar desde fila 2 (después de headers)
+        for row_num, fila in enumerate(filas, start=2):  # Fila 1 son los encabezados
             try:
                 # Extraer datos requeridos
-                nombre = str(ws.cell(row=row_num, column=mapeo_columnas['nombre'] + 1).value or '').strip()
-                tipo = str(ws.cell(row=row_num, column=mapeo_columnas['tipo'] + 1).value or '').strip()
-                sede_nombre = str(ws.cell(row=row_num, column=mapeo_columnas['sede'] + 1).value or '').strip()
-                area_nombre = str(ws.cell(row=row_num, column=mapeo_columnas['area'] + 1).value or '').strip()
-                estado_nombre = str(ws.cell(row=row_num, column=mapeo_columnas['estado'] + 1).value or '').strip()
+                nombre = texto(fila, 'nombre')
+                tipo = texto(fila, 'tipo')
+                sede_nombre = texto(fila, 'sede')
+                area_nombre = texto(fila, 'area')
+                estado_nombre = texto(fila, 'estado')
                 
                 # Validar datos requeridos
                 if not nombre or nombre == 'None':
-                    errores.append(f"Fila {row_num}: Nombre es requerido")
+                    errores.append((row_num, f"Fila {row_num}: Nombre es requerido"))
                     continue
                 
                 if not tipo or tipo == 'None':
-                    errores.append(f"Fila {row_num}: Tipo es requerido")
+                    errores.append((row_num, f"Fila {row_num}: Tipo es requerido"))
                     continue
                 
                 if not sede_nombre or sede_nombre == 'None':
-                    errores.append(f"Fila {row_num}: Sede es requerida")
+                    errores.append((row_num, f"Fila {row_num}: Sede es requerida"))
                     continue
                 
-                # Buscar o crear sede
-                try:
-                    sede = Sede.objects.get(nombre__iexact=sede_nombre)
-                except Sede.DoesNotExist:
-                    sede = Sede.objects.create(nombre=sede_nombre)
-                
-                # Buscar o crear área
-                try:
-                    area = Area.objects.get(nombre__iexact=area_nombre)
-                except Area.DoesNotExist:
-                    area = Area.objects.create(nombre=area_nombre)
-                
-                # Buscar o crear estado
-                try:
-                    estado = Estado.objects.get(nombre__iexact=estado_nombre)
-                except Estado.DoesNotExist:
-                    estado = Estado.objects.create(nombre=estado_nombre)
-                
-                # Datos opcionales
-                marca = str(ws.cell(row=row_num, column=mapeo_columnas.get('marca', 0) + 1).value or '').strip()
-                modelo = str(ws.cell(row=row_num, column=mapeo_columnas.get('modelo', 0) + 1).value or '').strip()
-                proveedor = str(ws.cell(row=row_num, column=mapeo_columnas.get('proveedor', 0) + 1).value or '').strip()
-                observacion = str(ws.cell(row=row_num, column=mapeo_columnas.get('observacion', 0) + 1).value or '').strip()
-                
                 # Procesar precio
-                precio_cell = ws.cell(row=row_num, column=mapeo_columnas.get('precio', 0) + 1)
                 precio = None
-                if precio_cell.value:
+                precio_valor = valor(fila, 'precio')
+                if precio_valor:
                     try:
-                        precio = float(str(precio_cell.value).replace(',', '').replace('$', ''))
+                        precio = float(str(precio_valor).replace(',', '').replace('$', ''))
                     except (ValueError, TypeError):
-                        errores.append(f"Fila {row_num}: Precio inválido")
+                        errores.append((row_num, f"Fila {row_num}: Precio inválido"))
                         continue
                 
                 # Procesar fechas
                 fecha_compra = None
                 garantia_hasta = None
                 
-                fecha_compra_cell = ws.cell(row=row_num, column=mapeo_columnas.get('fecha_compra', 0) + 1)
-                if fecha_compra_cell.value:
+                fecha_compra_valor = valor(fila, 'fecha_compra')
+                if fecha_compra_valor:
                     try:
-                        if isinstance(fecha_compra_cell.value, datetime):
-                            fecha_compra = fecha_compra_cell.value.date()
-                        else:
-                            fecha_compra = datetime.strptime(str(fecha_compra_cell.value), '%d/%m/%Y').date()
+                        fecha_compra = _leer_fecha(fecha_compra_valor)
                     except (ValueError, TypeError):
-                        errores.append(f"Fila {row_num}: Fecha de compra inválida")
+                        errores.append((row_num, f"Fila {row_num}: Fecha de compra inválida"))
                         continue
                 
-                garantia_cell = ws.cell(row=row_num, column=mapeo_columnas.get('garantia_hasta', 0) + 1)
-                if garantia_cell.value:
+                garantia_valor = valor(fila, 'garantia_hasta')
+                if garantia_valor:
                     try:
-                        if isinstance(garantia_cell.value, datetime):
-                            garantia_hasta = garantia_cell.value.date()
-                        else:
-                            garantia_hasta = datetime.strptime(str(garantia_cell.value), '%d/%m/%Y').date()
+                        garantia_hasta = _leer_fecha(garantia_valor)
                     except (ValueError, TypeError):
-                        errores.append(f"Fila {row_num}: Fecha de garantía inválida")
+                        errores.append((row_num, f"Fila {row_num}: Fecha de garantía inválida"))
                         continue
                 
-                # Generar número de serie si no existe
-                numero_serie = ''
-                if 'numero_serie' in mapeo_columnas:
-                    numero_serie = str(ws.cell(row=row_num, column=mapeo_columnas['numero_serie'] + 1).value or '').strip()
-                
-                if not numero_serie:
-                    # Generar número de serie automático
-                    prefijo = tipo[:3].upper() if len(tipo) >= 3 else tipo.upper()
-                    ultimo_equipo = Equipo.objects.filter(numero_serie__startswith=f"{prefijo}-").order_by('-numero_serie').first()
-                    
-                    if ultimo_equipo:
-                        try:
-                            ultimo_numero = int(ultimo_equipo.numero_serie.split('-')[-1])
-                            numero_serie = f"{prefijo}-{ultimo_numero + 1:05d}"
-                        except (ValueError, IndexError):
-                            numero_serie = f"{prefijo}-00001"
-                    else:
-                        numero_serie = f"{prefijo}-00001"
-                
-                # Crear equipo
-                equipo = Equipo.objects.create(
-                    nombre=nombre,
-                    tipo=tipo,
-                    numero_serie=numero_serie,
-                    marca=marca,
-                    modelo=modelo,
-                    precio=precio,
-                    proveedor=proveedor,
-                    fecha_compra=fecha_compra,
-                    garantia_hasta=garantia_hasta,
-                    observacion=observacion,
-                    sede=sede,
-                    area=area,
-                    estado=estado
-                )
-                
-                equipos_creados += 1
+                lote.append((row_num, {
+                    'nombre': nombre,
+                    'tipo': tipo,
+                    'numero_serie': texto(fila, 'numero_serie'),
+                    'marca': texto(fila, 'marca'),
+                    'modelo': texto(fila, 'modelo'),
+                    'precio': precio,
+                    'proveedor': texto(fila, 'proveedor'),
+                    'fecha_compra': fecha_compra,
+                    'garantia_hasta': garantia_hasta,
+                    'observacion': texto(fila, 'observacion'),
+                    'sede': sede_nombre,
+                    'area': area_nombre,
+                    'estado': estado_nombre,
+                }))
                 
             except Exception as e:
-                # Error más específico
-                error_msg = str(e)
-                if "DoesNotExist" in error_msg:
-                    errores.append(f"Fila {row_num}: Error de referencia - verifica que los datos existan")
-                elif "ValidationError" in error_msg:
-                    errores.append(f"Fila {row_num}: Error de validación - verifica el formato de los datos")
-                else:
-                    errores.append(f"Fila {row_num}: Error - {error_msg}")
+                errores.append((row_num, _mensaje_error_fila(row_num, e)))
                 continue
+            
+            if len(lote) >= tamano_lote:
+                equipos_creados += _guardar_lote(lote, catalogos, errores)
+                lote = []
+                if progreso:
+                    progreso(row_num - 1, total_filas)
+        
+        if lote:
+            equipos_creados += _guardar_lote(lote, catalogos, errores)
+        
+        wb.close()
         
-        return equipos_creados, errores
+        # Los errores de los lotes se detectan al guardar; se reportan en orden de fila
+        errores.sort(key=lambda error: error[0])
+        return equipos_creados, [mensaje for _, mensaje in errores]
         
     except Exception as e:
-        return 0, [f"Error al procesar archivo: {str(e)}"]
+        errores.sort(key=lambda error: error[0])
+        return equipos_creados, [mensaje for _, mensaje in errores] + [f"Error al procesar archivo: {str(e)}"]
+
+def resumir_importacion(equipos_creados, errores):
+    """
+    Respuesta de una importación: éxito si se creó al menos un equipo,
+    aunque otras filas tengan errores.
+    """
+    if equipos_creados > 0:
+        mensaje = f'✅ Se importaron {equipos_creados} equipos exitosamente'
+        if errores:
+            mensaje += f'\n⚠️ Se encontraron {len(errores)} errores en algunas filas'
+        return {
+            'success': True,
+            'message': mensaje,
+            'equipos_creados': equipos_creados,
+            'errores': errores
+        }
+    return {
+        'success': False,
+        'error': '❌ No se pudo importar ningún equipo. Verifica el formato del archivo.',
+        'errores': errores
+    }
 
 def crear_equipos_masivo(equipos_data):
     """
@@ -0,0 +1,44 @@
+import time
+
+from django.core.cache import cache
+
+# Sello que cambia con cualquier alta, edición o baja de equipos y catálogos
+VERSION_INVENTARIO = 'inventario'
+
+# Sello que cambia solo con altas, ediciones o bajas de Sede, Área y Estado
+VERSION_CATALOGOS = 'catalogos'
+
+
+def _clave(nombre):
+    return f'inventario:version:{nombre}'
+
+
+def _valor_inicial():
+    # Se parte de la hora actual para que, si el caché se vacía, el sello
+    # nunca vuelva a un valor ya usado por entradas anteriores
+    return int(time.time() * 1000)
+
+
+def obtener_version(nombre=VERSION_INVENTARIO):
+    """
+    Devuelve el sello de versión actual. Las entradas de caché que dependen
+    del inventario incluyen este valor en su clave.
+    """
+    clave = _clave(nombre)
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, _valor_inicial(), timeout=None)
+        version = cache.get(clave)
+    return version
+
+
+def incrementar_version(nombre=VERSION_INVENTARIO):
+    """
+    Cambia el sello de versión, invalidando todo lo cacheado con el anterior.
+    """
+    clave = _clave(nombre)
+    try:
+        return cache.incr(clave)
+    except ValueError:
+        cache.add(clave, _valor_inicial(), timeout=None)
+        return cache.get(clave)
@@ -1,126 +1,204 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, FileResponse, StreamingHttpResponse, Http404
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 import json
-from datetime import date, timedelta
-from .models import Equipo, Estado, Area, Sede, PerfilUsuario
-from django.db.models import Count
-from .decorators import requiere_permiso, requiere_rol
-# from .utils import generar_pdf_equipos  # Comentado temporalmente para evitar errores de reportlab
+from datetime import date
+from .models import Equipo, Estado, Area, Sede, SecuenciaSerie, TrabajoFondo, condiciones_mantenimiento
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.utils.cache import get_conditional_response
+from .decorators import requiere_permiso, requiere_rol, verificar_permisos
+from .permisos import obtener_permisos
+from .catalogos import obtener_catalogos, buscar_en_catalogo, catalogos_para_cliente, color_estado, icono_estado
+from .versiones import VERSION_CATALOGOS, obtener_version
+from .datatables import leer_parametros, ordenar, filtro_keyset, generar_cursor
+from .filtros import aplicar_filtros, aplicar_busqueda_global, filtrar_equipos, parametros_filtro
+from .artefactos import respuesta_exportacion
+from .busqueda import buscar_texto
+from .proyecciones import LISTA
+from . import api, cambios, lotes, trabajos
 
 # Create your views here.
 
-# Funciones para asignar colores e iconos según el estado
-def get_estado_color(estado_nombre):
-    estado_colors = {
-        'Operativo': 'success',      # Verde
-        'Bueno': 'success',          # Verde
-        'Nuevo': 'info',             # Azul
-        'Regular': 'warning',        # Amarillo
-        'Mantenimiento': 'warning',  # Amarillo
-        'En Reparación': 'warning',  # Amarillo
-        'Malo': 'danger',            # Rojo
-        'Inoperativo': 'danger',     # Rojo
-        'Fuera de Servicio': 'danger', # Rojo
-        'Dado de Baja': 'secondary', # Gris
-        'En Almacén': 'info',        # Azul
-    }
-    return estado_colors.get(estado_nombre, 'primary')
-
-def get_estado_icon(estado_nombre):
-    estado_icons = {
-        'Operativo': 'fa-check-circle',
-        'Bueno': 'fa-check-circle',
-        'Nuevo': 'fa-star',
-        'Regular': 'fa-exclamation-triangle',
-        'Mantenimiento': 'fa-tools',
-        'En Reparación': 'fa-wrench',
-        'Malo': 'fa-times-circle',
-        'Inoperativo': 'fa-times-circle',
-        'Fuera de Servicio': 'fa-ban',
-        'Dado de Baja': 'fa-trash',
-        'En Almacén': 'fa-box',
-    }
-    return estado_icons.get(estado_nombre, 'fa-question-circle')
+# Segundos que se conserva el contexto del dashboard (también se invalida por versión)
+DASHBOARD_CACHE_TIMEOUT = 3600
 
-@login_required
-def dashboard(request):
+# Segundos que el navegador guarda los catálogos pedidos con su sello (?v=)
+CATALOGOS_MAX_AGE = 365 * 24 * 3600
+
+def _contexto_dashboard():
+    hoy = date.today()
     
-    # Totales por estado con colores e iconos
-    estados = Estado.objects.all()
-    total_por_estado = []
-    for estado in estados:
-        total_por_estado.append({
+    # Totales por estado desde los contadores; el total general es su suma
+    total_por_estado = [
+        {
             'nombre': estado.nombre,
-            'total': Equipo.objects.filter(estado=estado).count(),
-            'color': get_estado_color(estado.nombre),
-            'icon': get_estado_icon(estado.nombre)
-        })
+            'total': estado.total_equipos,
+            'color': color_estado(estado.nombre),
+            'icon': icono_estado(estado.nombre)
+        }
+        for estado in Estado.objects.order_by('id')
+    ]
+    total_equipos = sum(estado['total'] for estado in total_por_estado)
 
     # Áreas con más equipos
-    areas = Area.objects.annotate(total_equipos=Count('equipos')).order_by('-total_equipos')[:5]
+    areas = list(Area.objects.order_by('-total_equipos')[:5])
 
-    # Equipos con próximo mantenimiento (próximos 30 días)
-    equipos_mantenimiento_proximo = Equipo.objects.filter(
-        fecha_mantenimiento__gte=date.today(),
-        fecha_mantenimiento__lte=date.today() + timedelta(days=30)
-    ).select_related('sede', 'area', 'estado').order_by('fecha_mantenimiento')[:10]
+    # Equipos con próximo mantenimiento (próximos 30 días); los días
+    # restantes o vencidos se calculan en la consulta
+    mantenimiento = condiciones_mantenimiento(hoy)
+    equipos_mantenimiento_proximo = list(Equipo.objects.filter(
+        mantenimiento['proximo']
+    ).with_status(hoy).select_related('sede', 'area', 'estado').order_by('fecha_mantenimiento')[:10])
 
     # Equipos con mantenimiento vencido
-    equipos_mantenimiento_vencido = Equipo.objects.filter(
-        fecha_mantenimiento__lt=date.today()
-    ).select_related('sede', 'area', 'estado').order_by('fecha_mantenimiento')[:5]
-
-    # Calcular días restantes para equipos con próximo mantenimiento
-    for equipo in equipos_mantenimiento_proximo:
-        equipo.dias_restantes = (equipo.fecha_mantenimiento - date.today()).days
-
-    # Calcular días vencidos para equipos con mantenimiento vencido
-    for equipo in equipos_mantenimiento_vencido:
-        equipo.dias_vencidos = (date.today() - equipo.fecha_mantenimiento).days
+    equipos_mantenimiento_vencido = list(Equipo.objects.filter(
+        mantenimiento['vencido']
+    ).with_status(hoy).annotate(
+        dias_vencidos=Value(0) - F('dias_mantenimiento')
+    ).select_related('sede', 'area', 'estado').order_by('fecha_mantenimiento')[:5])
 
-    context = {
+    return {
         'total_por_estado': total_por_estado,
         'areas': areas,
-        'total_equipos': Equipo.objects.count(),
+        'total_equipos': total_equipos,
         'equipos_mantenimiento_proximo': equipos_mantenimiento_proximo,
         'equipos_mantenimiento_vencido': equipos_mantenimiento_vencido,
     }
+
+@login_required
+def dashboard(request):
+    # El contexto se cachea por versión del inventario y por día (los
+    # días restantes de mantenimiento cambian con la fecha)
+    clave = f'dashboard:{obtener_version()}:{date.today().isoformat()}'
+    context = cache.get(clave)
+    if context is None:
+        context = _contexto_dashboard()
+        cache.set(clave, context, DASHBOARD_CACHE_TIMEOUT)
     return render(request, 'inventario/dashboard.html', context)
 
 @login_required
 def equipos_lista(request):
-    equipos = Equipo.objects.all().select_related('sede', 'area', 'estado')
-    
-    # Filtro por código (número de serie)
+    # Las filas se cargan por página desde equipos_datos (DataTables server-side)
     codigo_busqueda = request.GET.get('codigo', '').strip()
-    if codigo_busqueda:
-        equipos = equipos.filter(numero_serie__icontains=codigo_busqueda)
-    
-    # Obtener el perfil del usuario
-    try:
-        perfil = request.user.perfil
-    except:
-        # Si no existe perfil, crear uno por defecto
-        perfil = PerfilUsuario.objects.create(usuario=request.user)
-    
-    # Agregar colores e iconos a cada equipo
-    for equipo in equipos:
-        equipo.estado_color = get_estado_color(equipo.estado.nombre)
-        equipo.estado_icon = get_estado_icon(equipo.estado.nombre)
     
+    # El sello se lee antes: los catálogos nunca son más viejos que él
+    version_catalogos = obtener_version(VERSION_CATALOGOS)
+    catalogos = obtener_catalogos()
     context = {
-        'equipos': equipos,
-        'sedes': Sede.objects.all(),
-        'areas': Area.objects.all(),
-        'estados': Estado.objects.all(),
-        'perfil_usuario': perfil,
+        'sedes': catalogos['sede'],
+        'areas': catalogos['area'],
+        'estados': catalogos['estado'],
+        'version_catalogos': version_catalogos,
+        'perfil_usuario': obtener_permisos(request),
         'codigo_busqueda': codigo_busqueda,  # Pasar el código de búsqueda al template
     }
     return render(request, 'inventario/equipos_lista.html', context)
 
+@require_http_methods(["GET"])
+@login_required
+def equipos_datos(request):
+    """
+    Endpoint JSON del protocolo server-side de DataTables para la lista de equipos
+    """
+    parametros = leer_parametros(request.GET)
+    
+    total = Equipo.objects.count()
+    equipos = aplicar_filtros(Equipo.objects.all(), parametros['filtros'])
+    equipos = aplicar_busqueda_global(equipos, parametros['busqueda'])
+    filtrados = equipos.count() if (parametros['filtros'] or parametros['busqueda']) else total
+    
+    equipos = LISTA.consulta(ordenar(equipos, parametros['orden']))
+    
+    # Continuar desde el cursor de la página anterior o, si no aplica, usar OFFSET
+    condicion = filtro_keyset(parametros)
+    if condicion is not None:
+        filas = list(equipos.filter(condicion)[:parametros['longitud']])
+    else:
+        filas = list(equipos[parametros['inicio']:parametros['inicio'] + parametros['longitud']])
+    
+    convertir = LISTA.convertidor()
+    data = []
+    for equipo in map(convertir, filas):
+        observacion = equipo.observacion_corta or ''
+        if len(observacion) > 50:
+            observacion = observacion[:49] + '…'
+        data.append({
+            'id': equipo.id,
+            'nombre': equipo.nombre,
+            'observacion': observacion,
+            'tipo': equipo.tipo,
+            'numero_serie': equipo.numero_serie,
+            'marca': equipo.marca,
+            'modelo': equipo.modelo,
+            'precio': str(equipo.precio) if equipo.precio else '',
+            'sede': equipo.sede or '',
+            'area': equipo.area,
+            'estado': equipo.estado,
+            'estado_color': color_estado(equipo.estado),
+            'estado_icon': icono_estado(equipo.estado),
+            'garantia_hasta': equipo.garantia_hasta.strftime('%d/%m/%Y') if equipo.garantia_hasta else '',
+            'garantia_vigente': equipo.garantia_vigente,
+            'fecha_registro': equipo.fecha_registro.strftime('%d/%m/%Y'),
+        })
+    
+    return JsonResponse({
+        'draw': parametros['draw'],
+        'recordsTotal': total,
+        'recordsFiltered': filtrados,
+        'data': data,
+        'cursor': generar_cursor(
+            parametros,
+            LISTA.por_rutas(filas[-1]) if filas else None,
+            parametros['inicio'] + len(filas)
+        ),
+    })
+
+@require_http_methods(["GET"])
+@login_required
+def buscar_equipos(request):
+    """
+    Búsqueda de texto completo por nombre, marca, modelo, proveedor y
+    observación, ordenada por relevancia
+    """
+    texto = (request.GET.get('q') or '').strip()
+    if not texto:
+        return JsonResponse({'success': False, 'error': 'El parámetro q es requerido'}, status=400)
+    
+    try:
+        limite = int(request.GET.get('limite', 20))
+    except ValueError:
+        limite = 20
+    limite = min(max(limite, 1), 100)
+    
+    equipos = buscar_texto(Equipo.objects.all(), texto).values(
+        'id', 'nombre', 'tipo', 'numero_serie', 'marca', 'modelo', 'proveedor',
+        'sede__nombre', 'area__nombre', 'estado__nombre', 'relevancia'
+    )[:limite]
+    
+    return JsonResponse({
+        'success': True,
+        'resultados': [
+            {
+                'id': fila['id'],
+                'nombre': fila['nombre'],
+                'tipo': fila['tipo'],
+                'numero_serie': fila['numero_serie'],
+                'marca': fila['marca'],
+                'modelo': fila['modelo'],
+                'proveedor': fila['proveedor'],
+                'sede': fila['sede__nombre'] or '',
+                'area': fila['area__nombre'],
+                'estado': fila['estado__nombre'],
+                'relevancia': round(fila['relevancia'] or 0, 4),
+            }
+            for fila in equipos
+        ],
+    })
+
 @csrf_exempt
 @require_http_methods(["POST"])
 @login_required
@@ -129,9 +207,6 @@ def crear_equipo(request):
     try:
         data = json.loads(request.body)
         
-        # Debug: Imprimir los datos recibidos
-        print("Datos recibidos:", data)
-        
         # Validar campos requeridos
         required_fields = ['nombre', 'tipo', 'sede', 'area', 'estado']
         for field in required_fields:
@@ -173,6 +248,17 @@ def crear_equipo(request):
             except (ValueError, TypeError):
                 vida_util = None
         
+        # Validar sede, área y estado contra el caché de catálogos
+        sede = buscar_en_catalogo('sede', data['sede'])
+        if sede is None:
+            raise Sede.DoesNotExist
+        area = buscar_en_catalogo('area', data['area'])
+        if area is None:
+            raise Area.DoesNotExist
+        estado = buscar_en_catalogo('estado', data['estado'])
+        if estado is None:
+            raise Estado.DoesNotExist
+        
         # Crear el equipo
         equipo = Equipo.objects.create(
             nombre=data['nombre'],
@@ -187,9 +273,9 @@ def crear_equipo(request):
             fecha_mantenimiento=fecha_mantenimiento,
             vida_util=vida_util,
             observacion=data.get('observacion', ''),
-            sede_id=data['sede'],
-            area_id=data['area'],
-            estado_id=data['estado']
+            sede_id=sede.id,
+            area_id=area.id,
+            estado_id=estado.id
         )
         
         return JsonResponse({
@@ -200,9 +286,9 @@ def crear_equipo(request):
                 'nombre': equipo.nombre,
                 'numero_serie': equipo.numero_serie,
                 'tipo': equipo.tipo,
-                'sede': equipo.sede.nombre,
-                'area': equipo.area.nombre,
-                'estado': equipo.estado.nombre
+                'sede': sede.nombre,
+                'area': area.nombre,
+                'estado': estado.nombre
             }
         })
         
@@ -236,13 +322,92 @@ def crear_equipo(request):
             'error': f'Error interno: {str(e)}'
         }, status=500)
 
+@require_http_methods(["GET"])
+@login_required
+def cambios_equipos(request):
+    """
+    Feed de cambios para sincronización incremental (ver cambios.py).
+    Parámetros: desde (cursor de la respuesta anterior; vacío para empezar)
+    y limite (filas por tipo, hasta cambios.LIMITE_MAXIMO).
+    """
+    try:
+        try:
+            limite = int(request.GET.get('limite', cambios.LIMITE_POR_DEFECTO))
+        except ValueError:
+            limite = cambios.LIMITE_POR_DEFECTO
+        limite = min(max(limite, 1), cambios.LIMITE_MAXIMO)
+        
+        return JsonResponse({
+            'success': True,
+            **cambios.leer_cambios(request.GET.get('desde', ''), limite)
+        })
+        
+    except ValueError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Error al leer los cambios: {str(e)}'
+        }, status=500)
+
+@require_http_methods(["GET"])
+@login_required
+def api_equipos(request):
+    """
+    Lista JSON de equipos paginada por cursor, con selección de columnas
+    (fields=) y los filtros de la lista (ver api.py)
+    """
+    try:
+        return JsonResponse({
+            'success': True,
+            **api.listar_equipos(request.GET)
+        })
+        
+    except ValueError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Error al listar los equipos: {str(e)}'
+        }, status=500)
+
+def etag_equipo(equipo_id, actualizado_en):
+    """ETag débil de un equipo: cambia con cada escritura (actualizado_en)"""
+    return f'W/"equipo-{equipo_id}-{actualizado_en.timestamp():.6f}"'
+
 @require_http_methods(["GET"])
 @login_required
 def obtener_equipo(request, equipo_id):
+    """
+    Datos de un equipo para los modales de ver y editar. Va con un ETag
+    débil y Cache-Control no-cache: el navegador guarda la respuesta y al
+    volver a abrir el modal pregunta con If-None-Match. Si el equipo no
+    cambió se responde 304 tras leer solo actualizado_en por clave primaria,
+    sin cargar ni serializar la fila.
+    """
     try:
+        if request.META.get('HTTP_IF_NONE_MATCH'):
+            actualizado_en = Equipo.objects.filter(id=equipo_id).values_list('actualizado_en', flat=True).first()
+            if actualizado_en is None:
+                raise Http404
+            etag = etag_equipo(equipo_id, actualizado_en)
+            no_modificado = get_conditional_response(request, etag=etag)
+            if no_modificado is not None:
+                no_modificado['ETag'] = etag
+                no_modificado['Cache-Control'] = 'private, no-cache'
+                return no_modificado
+        
         equipo = get_object_or_404(Equipo, id=equipo_id)
         
-        return JsonResponse({
+        response = JsonResponse({
             'success': True,
             'equipo': {
                 'id': equipo.id,
@@ -250,9 +415,9 @@ def obtener_equipo(request, equipo_id):
                 'tipo': equipo.tipo,
                 'numero_serie': equipo.numero_serie,
                 'observacion': equipo.observacion,
-                'sede': equipo.sede.id,
-                'area': equipo.area.id,
-                'estado': equipo.estado.id,
+                'sede': equipo.sede_id,
+                'area': equipo.area_id,
+                'estado': equipo.estado_id,
                 'marca': getattr(equipo, 'marca', ''),
                 'modelo': getattr(equipo, 'modelo', ''),
                 'precio': str(equipo.precio) if equipo.precio else '',
@@ -263,6 +428,13 @@ def obtener_equipo(request, equipo_id):
                 'vida_util': str(equipo.vida_util) if equipo.vida_util else '',
             }
         })
+        response['ETag'] = etag_equipo(equipo.id, equipo.actualizado_en)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+        
+    except Http404:
+        # Un modal cacheado de un equipo ya eliminado debe recibir 404, no 500
+        raise
         
     except Exception as e:
         return JsonResponse({
@@ -270,116 +442,100 @@ def obtener_equipo(request, equipo_id):
             'error': f'Error al obtener el equipo: {str(e)}'
         }, status=500)
 
+@require_http_methods(["GET"])
+@login_required
+def catalogos_datos(request):
+    """
+    Sedes, áreas y estados en JSON, con el sello de catálogos en `version`.
+    Pedida con ?v=<ese sello> la respuesta se cachea CATALOGOS_MAX_AGE:
+    cualquier cambio en un catálogo cambia el sello y con él la URL. Sin
+    sello o con uno viejo se responde con no-cache y el ETag del sello
+    actual, así que revalidar cuesta solo leer el sello.
+    """
+    try:
+        version = obtener_version(VERSION_CATALOGOS)
+        etag = f'W/"catalogos-{version}"'
+        if request.GET.get('v') == str(version):
+            cache_control = f'private, max-age={CATALOGOS_MAX_AGE}, immutable'
+        else:
+            cache_control = 'private, no-cache'
+        
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = JsonResponse({'success': True, 'version': version, **catalogos_para_cliente()})
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Error al obtener los catálogos: {str(e)}'
+        }, status=500)
+
 @csrf_exempt
-@require_http_methods(["POST"])
+@require_http_methods(["POST", "PATCH"])
 @login_required
 @requiere_permiso('editar')
 def editar_equipo(request, equipo_id):
+    """
+    Edita un equipo. Con POST se envían todos los campos (los opcionales que
+    falten quedan vacíos); con PATCH solo los que se quieren cambiar. En
+    ambos casos se comparan con la fila guardada y se escriben únicamente
+    las columnas que cambiaron: una edición sin cambios no escribe nada.
+    """
     try:
         equipo = get_object_or_404(Equipo, id=equipo_id)
         data = json.loads(request.body)
         
-        # Validar campos requeridos
-        required_fields = ['nombre', 'tipo', 'sede', 'area', 'estado']
-        for field in required_fields:
-            if not data.get(field):
-                return JsonResponse({
-                    'success': False,
-                    'error': f'El campo {field} es requerido'
-                }, status=400)
-        
-        # Procesar campos opcionales
-        precio = data.get('precio')
-        if precio == '' or precio is None:
-            precio = None
-        elif precio:
-            try:
-                precio = float(precio)
-            except (ValueError, TypeError):
-                precio = None
-        
-        fecha_compra = data.get('fecha_compra')
-        if fecha_compra == '' or fecha_compra is None:
-            fecha_compra = None
-            
-        garantia_hasta = data.get('garantia_hasta')
-        if garantia_hasta == '' or garantia_hasta is None:
-            garantia_hasta = None
-        
-        # Procesar campos de mantenimiento
-        fecha_mantenimiento = data.get('fecha_mantenimiento')
-        if fecha_mantenimiento == '' or fecha_mantenimiento is None:
-            fecha_mantenimiento = None
-            
-        vida_util = data.get('vida_util')
-        if vida_util == '' or vida_util is None:
-            vida_util = None
-        elif vida_util:
-            try:
-                vida_util = int(vida_util)
-            except (ValueError, TypeError):
-                vida_util = None
-        
-        # Actualizar el equipo
-        equipo.nombre = data['nombre']
-        equipo.tipo = data['tipo']
-        equipo.marca = data.get('marca', '')
-        equipo.modelo = data.get('modelo', '')
-        equipo.precio = precio
-        equipo.proveedor = data.get('proveedor', '')
-        equipo.fecha_compra = fecha_compra
-        equipo.garantia_hasta = garantia_hasta
-        equipo.fecha_mantenimiento = fecha_mantenimiento
-        equipo.vida_util = vida_util
-        equipo.observacion = data.get('observacion', '')
-        equipo.sede_id = data['sede']
-        equipo.area_id = data['area']
-        equipo.estado_id = data['estado']
+        # Validar y convertir los campos (sede, área y estado contra el caché)
+        try:
+            campos, _ = lotes.leer_equipo(data, parcial=request.method == 'PATCH')
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
         
         # Solo actualizar número de serie si se proporciona uno diferente
-        if data.get('numero_serie') and data['numero_serie'] != equipo.numero_serie:
+        numero_serie = campos.pop('numero_serie', '')
+        if numero_serie and numero_serie != equipo.numero_serie:
             # Validar que el nuevo número de serie no exista
-            if Equipo.objects.filter(numero_serie=data['numero_serie']).exclude(id=equipo.id).exists():
+            if Equipo.objects.filter(numero_serie=numero_serie).exclude(id=equipo.id).exists():
                 return JsonResponse({
                     'success': False,
                     'error': 'El número de serie ya existe'
                 }, status=400)
-            equipo.numero_serie = data['numero_serie']
-        
-        equipo.save()
-        
+            campos['numero_serie'] = numero_serie
+        
+        # Diferencias con la fila guardada
+        cambiados = [campo for campo, valor in campos.items() if getattr(equipo, campo) != valor]
+        if cambiados:
+            for campo in cambiados:
+                setattr(equipo, campo, campos[campo])
+            # Un UPDATE solo con esas columnas; la secuencia solo se adelanta
+            # si el equipo se guarda
+            with transaction.atomic():
+                if 'numero_serie' in cambiados:
+                    SecuenciaSerie.sincronizar(equipo.numero_serie)
+                equipo.save(update_fields=cambiados)
+        
+        catalogos = obtener_catalogos()
         return JsonResponse({
             'success': True,
-            'message': 'Equipo actualizado exitosamente',
+            'message': 'Equipo actualizado exitosamente' if cambiados else 'El equipo no tenía cambios',
+            'campos_actualizados': [campo[:-3] if campo.endswith('_id') else campo for campo in cambiados],
             'equipo': {
                 'id': equipo.id,
                 'nombre': equipo.nombre,
                 'numero_serie': equipo.numero_serie,
                 'tipo': equipo.tipo,
-                'sede': equipo.sede.nombre,
-                'area': equipo.area.nombre,
-                'estado': equipo.estado.nombre
+                'sede': catalogos['sede'].nombre(equipo.sede_id),
+                'area': catalogos['area'].nombre(equipo.area_id),
+                'estado': catalogos['estado'].nombre(equipo.estado_id)
             }
         })
         
-    except Sede.DoesNotExist:
-        return JsonResponse({
-            'success': False,
-            'error': 'La sede seleccionada no existe'
-        }, status=400)
-        
-    except Area.DoesNotExist:
-        return JsonResponse({
-            'success': False,
-            'error': 'El área seleccionada no existe'
-        }, status=400)
-        
-    except Estado.DoesNotExist:
-        return JsonResponse({
-            'success': False,
-            'error': 'El estado seleccionado no existe'
-        }, status=400)
-        
     except json.JSONDecodeError:
         return JsonResponse({
             'success': False,
@@ -415,25 +571,75 @@ def eliminar_equipo(request, equipo_id):
             'error': f'Error al eliminar el equipo: {str(e)}'
         }, status=500)
 
+@csrf_exempt
+@require_http_methods(["POST"])
 @login_required
-@requiere_permiso('exportar')
-def exportar_equipos_pdf(request):
+def operar_equipos_lote(request):
     """
-    Vista para exportar equipos a PDF
+    Crea, edita y elimina varios equipos en una sola petición (ver lotes.py).
+    Cada operación presente exige el mismo permiso que su vista de un equipo.
+    Si alguna operación es inválida no se aplica ninguna.
     """
     try:
-        # Obtener todos los equipos con sus relaciones
-        equipos = Equipo.objects.all().select_related('area', 'estado').order_by('numero_serie')
+        operaciones = lotes.leer_lote(json.loads(request.body))
         
-        # Generar PDF
-        from .utils import generar_pdf_equipos
-        pdf_content = generar_pdf_equipos(equipos)
+        denegado = verificar_permisos(request, [op for op in lotes.OPERACIONES if operaciones[op]])
+        if denegado is not None:
+            return denegado
         
-        # Crear respuesta HTTP
-        response = HttpResponse(pdf_content, content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="inventario_activos.pdf"'
+        resultados, errores = lotes.aplicar_lote(operaciones)
+        if errores:
+            return JsonResponse({
+                'success': False,
+                'error': 'Hay operaciones inválidas; no se aplicó ningún cambio',
+                'errores': errores
+            }, status=400)
         
-        return response
+        trabajos.precalentar_exportaciones(len(resultados))
+        totales = {op: len(operaciones[op]) for op in lotes.OPERACIONES}
+        return JsonResponse({
+            'success': True,
+            'message': (
+                f"Lote aplicado: {totales['crear']} creados, {totales['editar']} "
+                f"actualizados, {totales['eliminar']} eliminados"
+            ),
+            'resultados': resultados
+        })
+        
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'error': 'Datos JSON inválidos'
+        }, status=400)
+        
+    except ValueError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+        
+    except IntegrityError as e:
+        # Otro proceso tomó un número de serie mientras se aplicaba el lote
+        return JsonResponse({
+            'success': False,
+            'error': f'No se pudo aplicar el lote; no se aplicó ningún cambio: {str(e)}'
+        }, status=409)
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Error interno: {str(e)}'
+        }, status=500)
+
+@login_required
+@requiere_permiso('exportar')
+def exportar_equipos_pdf(request):
+    """
+    Vista para exportar equipos a PDF. Acepta los filtros de la lista en la
+    query string (ver filtros.PARAMETROS_FILTRO)
+    """
+    try:
+        return respuesta_exportacion(request, 'pdf', parametros_filtro(request.GET))
         
     except Exception as e:
         return JsonResponse({
@@ -445,21 +651,11 @@ def exportar_equipos_pdf(request):
 @requiere_permiso('exportar')
 def exportar_equipos_excel(request):
     """
-    Vista para exportar equipos a Excel
+    Vista para exportar equipos a Excel. Acepta los filtros de la lista en la
+    query string (ver filtros.PARAMETROS_FILTRO)
     """
     try:
-        # Obtener todos los equipos con sus relaciones
-        equipos = Equipo.objects.all().select_related('area', 'estado').order_by('numero_serie')
-        
-        # Generar Excel
-        from .utils import generar_excel_equipos
-        excel_content = generar_excel_equipos(equipos)
-        
-        # Crear respuesta HTTP
-        response = HttpResponse(excel_content, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename="inventario_activos.xlsx"'
-        
-        return response
+        return respuesta_exportacion(request, 'excel', parametros_filtro(request.GET))
         
     except Exception as e:
         return JsonResponse({
@@ -467,6 +663,61 @@ def exportar_equipos_excel(request):
             'error': f'Error al generar Excel: {str(e)}'
         }, status=500)
 
+def _exportacion_en_flujo(request, generar, content_type, nombre_archivo):
+    """
+    Respuesta en flujo con los equipos que cumplen los filtros de la lista
+    (filtros.PARAMETROS_FILTRO en la query string).
+    """
+    equipos = filtrar_equipos(Equipo.objects.all(), request.GET)
+    response = StreamingHttpResponse(generar(equipos), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    return response
+
+@require_http_methods(["GET"])
+@login_required
+@requiere_permiso('exportar')
+def exportar_equipos_csv(request):
+    """
+    Vista para exportar equipos a CSV sin formato (para herramientas de BI)
+    """
+    from .exportacion import generar_csv
+    return _exportacion_en_flujo(request, generar_csv, 'text/csv; charset=utf-8', 'inventario_activos.csv')
+
+@require_http_methods(["GET"])
+@login_required
+@requiere_permiso('exportar')
+def exportar_equipos_ndjson(request):
+    """
+    Vista para exportar equipos como JSON delimitado por líneas
+    """
+    from .exportacion import generar_ndjson
+    return _exportacion_en_flujo(
+        request, generar_ndjson, 'application/x-ndjson; charset=utf-8', 'inventario_activos.ndjson'
+    )
+
+@require_http_methods(["GET"])
+@login_required
+@requiere_permiso('exportar')
+def exportar_equipos_parquet(request):
+    """
+    Vista para exportar equipos a Parquet (columnas tipadas, para análisis)
+    """
+    from .exportacion import pyarrow_disponible
+    if not pyarrow_disponible():
+        return JsonResponse({
+            'success': False,
+            'error': 'La exportación Parquet no está disponible: falta instalar pyarrow'
+        }, status=501)
+    
+    try:
+        return respuesta_exportacion(request, 'parquet', parametros_filtro(request.GET))
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Error al generar Parquet: {str(e)}'
+        }, status=500)
+
 @login_required
 @requiere_permiso('importar')
 def descargar_plantilla_excel(request):
@@ -506,7 +757,7 @@ def importar_equipos_excel(request):
         archivo = request.FILES['archivo']
         
         # Validar archivo
-        from .utils import validar_archivo_excel, procesar_importacion_excel
+        from .utils import validar_archivo_excel, procesar_importacion_excel, resumir_importacion
         es_valido, mensaje = validar_archivo_excel(archivo)
         
         if not es_valido:
@@ -517,30 +768,111 @@ def importar_equipos_excel(request):
         
         # Procesar importación
         equipos_creados, errores = procesar_importacion_excel(archivo)
+        trabajos.precalentar_exportaciones(equipos_creados)
         
-        # Preparar respuesta
-        if equipos_creados > 0:
-            # Si se crearon equipos, es un éxito (aunque haya errores)
-            mensaje = f'✅ Se importaron {equipos_creados} equipos exitosamente'
-            if errores:
-                mensaje += f'\n⚠️ Se encontraron {len(errores)} errores en algunas filas'
-            
+        # Solo es error si no se creó ningún equipo
+        resumen = resumir_importacion(equipos_creados, errores)
+        return JsonResponse(resumen, status=200 if resumen['success'] else 400)
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Error al procesar el archivo: {str(e)}'
+        }, status=500)
+
+# Trabajos en segundo plano (exportaciones e importaciones grandes)
+
+TIPOS_EXPORTACION = {
+    'excel': 'exportar_excel',
+    'pdf': 'exportar_pdf',
+}
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@login_required
+@requiere_permiso('exportar')
+def crear_trabajo_exportacion(request, formato):
+    """
+    Encola una exportación y responde de inmediato con la URL para consultar su estado.
+    Los filtros de la lista llegan en el cuerpo del POST.
+    """
+    tipo = TIPOS_EXPORTACION.get(formato)
+    if tipo is None:
+        return JsonResponse({
+            'success': False,
+            'error': f'Formato de exportación no soportado: {formato}'
+        }, status=400)
+    
+    try:
+        trabajo = trabajos.encolar(tipo, request.user, {'filtros': parametros_filtro(request.POST)})
+        return JsonResponse({'success': True, 'trabajo': trabajos.serializar(trabajo)}, status=202)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'Error al iniciar la exportación: {str(e)}'
+        }, status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@login_required
+@requiere_permiso('importar')
+def crear_trabajo_importacion(request):
+    """
+    Valida el archivo, lo guarda en disco y encola su importación
+    """
+    try:
+        if 'archivo' not in request.FILES:
             return JsonResponse({
-                'success': True,
-                'message': mensaje,
-                'equipos_creados': equipos_creados,
-                'errores': errores
-            })
-        else:
-            # Solo error si no se creó ningún equipo
+                'success': False,
+                'error': 'No se ha seleccionado ningún archivo'
+            }, status=400)
+        
+        archivo = request.FILES['archivo']
+        
+        from .utils import validar_archivo_excel
+        es_valido, mensaje = validar_archivo_excel(archivo)
+        if not es_valido:
             return JsonResponse({
                 'success': False,
-                'error': '❌ No se pudo importar ningún equipo. Verifica el formato del archivo.',
-                'errores': errores
+                'error': mensaje
             }, status=400)
         
+        archivo.seek(0)
+        entrada = trabajos.guardar_entrada(archivo, 'xlsx')
+        trabajo = trabajos.encolar('importar_excel', request.user, {
+            'entrada': entrada,
+            'nombre_original': archivo.name,
+        })
+        return JsonResponse({'success': True, 'trabajo': trabajos.serializar(trabajo)}, status=202)
+        
     except Exception as e:
         return JsonResponse({
             'success': False,
             'error': f'Error al procesar el archivo: {str(e)}'
         }, status=500)
+
+@require_http_methods(["GET"])
+@login_required
+def estado_trabajo(request, trabajo_id):
+    """
+    Estado y progreso de un trabajo del usuario (lo consultan los modales periódicamente)
+    """
+    trabajo = get_object_or_404(TrabajoFondo, pk=trabajo_id, usuario=request.user)
+    return JsonResponse({'success': True, 'trabajo': trabajos.serializar(trabajo)})
+
+@require_http_methods(["GET"])
+@login_required
+def descargar_trabajo(request, trabajo_id):
+    """
+    Descarga el archivo generado por un trabajo completado
+    """
+    trabajo = get_object_or_404(
+        TrabajoFondo, pk=trabajo_id, usuario=request.user, estado='completado'
+    )
+    if not trabajo.archivo:
+        raise Http404('El trabajo no generó ningún archivo')
+    try:
+        archivo = open(trabajos.ruta_archivo(trabajo.archivo), 'rb')
+    except FileNotFoundError:
+        raise Http404('El archivo ya no está disponible')
+    return FileResponse(archivo, as_attachment=True, filename=trabajo.nombre_archivo)
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 import pymysql
 pymysql.install_as_MySQLdb()
 
@@ -73,6 +74,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'inventario.permisos.contexto_permisos',
             ],
         },
     },
@@ -102,6 +104,22 @@ DATABASES = {
 }
 
 
+# Caché compartida por todos los workers del servidor (archivo SQLite en modo
+# WAL, ver inventario/cache.py); no requiere Redis ni Memcached
+CACHES = {
+    'default': {
+        'BACKEND': 'inventario.cache.CacheCompartida',
+        'LOCATION': os.environ.get(
+            'INVENTARIO_CACHE_PATH',
+            os.path.join(tempfile.gettempdir(), 'inventario_cache.sqlite3')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+            'CULL_FREQUENCY': 4,
+        },
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -146,6 +164,28 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Trabajos en segundo plano (ver inventario/trabajos.py): archivos generados
+# e hilos del pool en proceso (0 = solo el comando procesar_trabajos)
+TRABAJOS_DIR = os.environ.get('TRABAJOS_DIR', os.path.join(MEDIA_ROOT, 'trabajos'))
+TRABAJOS_HILOS = int(os.environ.get('TRABAJOS_HILOS', '2'))
+
+# Procesos que maquetan en paralelo los bloques del PDF de equipos
+# (ver inventario/pdf.py; 1 = en el mismo proceso)
+PDF_PROCESOS = int(os.environ.get('PDF_PROCESOS', str(min(os.cpu_count() or 1, 4))))
+
+# Caché en disco de las exportaciones (ver inventario/artefactos.py) y
+# formatos que se regeneran en segundo plano tras importaciones grandes
+EXPORTACIONES_CACHE_DIR = os.environ.get('EXPORTACIONES_CACHE_DIR', os.path.join(MEDIA_ROOT, 'exportaciones'))
+EXPORTACIONES_CACHE_MAX_MB = int(os.environ.get('EXPORTACIONES_CACHE_MAX_MB', '500'))
+EXPORTACIONES_CACHE_MAX_HORAS = int(os.environ.get('EXPORTACIONES_CACHE_MAX_HORAS', '48'))
+EXPORTACIONES_PRECALENTAR = ['excel']
+EXPORTACIONES_PRECALENTAR_MINIMO = 1000
+
+# Feed de cambios (ver inventario/cambios.py): antigüedad mínima de lo que se
+# entrega y días que se conservan las marcas de equipos eliminados
+CAMBIOS_MARGEN_SEGUNDOS = int(os.environ.get('CAMBIOS_MARGEN_SEGUNDOS', '5'))
+CAMBIOS_RETENCION_DIAS = int(os.environ.get('CAMBIOS_RETENCION_DIAS', '90'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -6,6 +6,7 @@ This file is used when MySQL is not available or has connection issues.
 
 from pathlib import Path
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -62,6 +63,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'inventario.permisos.contexto_permisos',
             ],
         },
     },
@@ -77,6 +79,22 @@ DATABASES = {
     }
 }
 
+# Caché compartida por todos los workers del servidor (archivo SQLite en modo
+# WAL, ver inventario/cache.py); no requiere Redis ni Memcached
+CACHES = {
+    'default': {
+        'BACKEND': 'inventario.cache.CacheCompartida',
+        'LOCATION': os.environ.get(
+            'INVENTARIO_CACHE_PATH',
+            os.path.join(tempfile.gettempdir(), 'inventario_cache_sqlite.sqlite3')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+            'CULL_FREQUENCY': 4,
+        },
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -116,6 +134,23 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Trabajos en segundo plano (ver inventario/trabajos.py): archivos generados
+# e hilos del pool en proceso (0 = solo el comando procesar_trabajos)
+TRABAJOS_DIR = os.environ.get('TRABAJOS_DIR', os.path.join(MEDIA_ROOT, 'trabajos'))
+TRABAJOS_HILOS = int(os.environ.get('TRABAJOS_HILOS', '2'))
+
+# Procesos que maquetan en paralelo los bloques del PDF de equipos
+# (ver inventario/pdf.py; 1 = en el mismo proceso)
+PDF_PROCESOS = int(os.environ.get('PDF_PROCESOS', str(min(os.cpu_count() or 1, 4))))
+
+# Caché en disco de las exportaciones (ver inventario/artefactos.py) y
+# formatos que se regeneran en segundo plano tras importaciones grandes
+EXPORTACIONES_CACHE_DIR = os.environ.get('EXPORTACIONES_CACHE_DIR', os.path.join(MEDIA_ROOT, 'exportaciones'))
+EXPORTACIONES_CACHE_MAX_MB = int(os.environ.get('EXPORTACIONES_CACHE_MAX_MB', '500'))
+EXPORTACIONES_CACHE_MAX_HORAS = int(os.environ.get('EXPORTACIONES_CACHE_MAX_HORAS', '48'))
+EXPORTACIONES_PRECALENTAR = ['excel']
+EXPORTACIONES_PRECALENTAR_MINIMO = 1000
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 